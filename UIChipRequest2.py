@@ -1,29 +1,28 @@
 #!/usr/bin/env python3
 import tkinter as tk
-import subprocess
-import speech_recognition as sr
-from difflib import SequenceMatcher
 import os
 import re
 import threading
+import queue
 import time
-import collections
-import numpy as np
-import librosa
-import sounddevice as sd
+import request_queue
 
-try:
-    from tflite_runtime.interpreter import Interpreter
-except ImportError:
-    import tensorflow as tf
-    Interpreter = tf.lite.Interpreter
+# Audio / ML stack (numpy, scipy, tflite or TensorFlow, vosk, sounddevice) takes
+# seconds to import on the Pi, so it is loaded by load_audio_stack() on a background
+# thread after the window is up. Check with: python3 -X importtime UIChipRequest2.py
+np = None
+audio_stream = None
+wake_model = None
+vosk_capture = None
+_stack_lock = threading.Lock()
 
 # Paths
 SAVE_FOLDER    = "/home/scalepi/Desktop/savephototest"
-VOSK_FILE      = "/home/scalepi/hailo-rpi5-examples/basic_pipelines/Final/vosk_voice_detection.py"
 DETECTION_FILE = os.path.join(SAVE_FOLDER, "latest_detection.txt")
-SPEECH_FILE    = os.path.join(SAVE_FOLDER, "speech_input.txt")
-REQUEST_FILE   = os.path.join(SAVE_FOLDER, "chip_request_input.txt")
+
+# UI_STAY_OPEN=1: keep the window up after a submit and queue further requests
+# (master2 daemon mode); otherwise close after one request like before.
+STAY_OPEN = os.environ.get("UI_STAY_OPEN", "0") == "1"
 
 # Known parts and circuits for STT matching
 KNOWN_PARTS = [
@@ -39,10 +38,71 @@ DURATION = 2.0
 N_MFCC = 32
 HOP_LENGTH = 512
 N_FFT = 2048
-WAKE_MODEL_PATH = "/home/scalepi/Desktop/tflite_model/hey_dan_model.tflite" # Change this to the path on the Pi
+# Model file, int8/float variant, threads and XNNPACK are set in wake_model.py (WAKE_* env vars)
 STOP_LISTENING = False
 
+# Shared microphone: the wake-word listener and Vosk both read this one stream
+# (created by background_startup once the audio stack is loaded)
+AUDIO = None
+COMMAND_PREROLL_SEC = 0.3   # audio before the wake-word decision that Vosk also gets
+VOSK_BLOCK = 1600           # samples per AcceptWaveform call (100 ms)
+wake_enabled = threading.Event()    # cleared while a command is being recognized
+wake_enabled.set()
+wake_position = None                # end sample of the audio that triggered the wake word
+
+# Worker threads never touch Tk; they post (event, value) here and poll_events() applies them
+ui_events = queue.Queue()
+UI_POLL_MS = 50
+speech_thread = None
+listener_ready = threading.Event()  # set once the listener reads audio (testing/replay_audio.py waits on it)
+LISTENER_READY_TIMEOUT = 10         # seconds background_startup waits for listener_ready
+VOICE_UNAVAILABLE = ("Voice unavailable (type the request)", "gray")
+
+def load_audio_stack():
+    """Imports the audio / ML modules once (safe to call from any thread)."""
+    global np, audio_stream, wake_model, vosk_capture
+    with _stack_lock:
+        if vosk_capture is None:
+            import numpy as np
+            import audio_stream
+            import wake_model
+            import vosk_voice_detection as vosk_capture
+
+def background_startup():
+    """Runs after the window is shown: imports, mic stream, wake listener, Vosk model."""
+    global AUDIO, listener_thread
+    start = time.perf_counter()
+    try:
+        load_audio_stack()
+        AUDIO = audio_stream.AudioCaptureService(samplerate=FS, blocksize=HOP_LENGTH)
+        AUDIO.start()
+    except Exception as e:
+        print(f"❌ Audio stack failed to start: {e}")
+        ui_events.put(("ready", VOICE_UNAVAILABLE))
+        return
+    listener_thread = threading.Thread(target=wake_word_listener, daemon=True)
+    listener_thread.start()
+    # Load the Vosk model now so the first command does not wait for it
+    if not vosk_capture.preload():
+        wake_enabled.clear()  # no recognizer for the command; park the listener
+        ui_events.put(("ready", VOICE_UNAVAILABLE))
+        return
+    deadline = time.perf_counter() + LISTENER_READY_TIMEOUT
+    while (not listener_ready.wait(timeout=0.1) and listener_thread.is_alive()
+           and time.perf_counter() < deadline):
+        pass
+    if not listener_ready.is_set():
+        if listener_thread.is_alive():
+            print(f"❌ Wake listener not ready after {LISTENER_READY_TIMEOUT}s")
+            ui_events.put(("ready", VOICE_UNAVAILABLE))
+        return  # otherwise the listener failed and already reported "Voice unavailable"
+    print(f"🎧 Voice ready {time.perf_counter() - start:.1f}s after the window opened")
+    ui_events.put(("ready", ("Listening for Hey Dan", "red")))
+
+# Batch version of the wake-word features (the listener uses audio_stream.StreamingMFCC)
 def process_audio(audio_data):
+    import numpy as np
+    import librosa
     audio_data = audio_data.flatten()
     target_len = int(FS * DURATION)
     if len(audio_data) < target_len:
@@ -59,128 +119,167 @@ def process_audio(audio_data):
         mfccs = mfccs[:, :63]
     return mfccs.reshape(1, N_MFCC, 63, 1).astype(np.float32)
 
-def wake_word_listener(gui_root):
+def wake_word_listener():
     print("Loading TFLite Wake Word model...")
     try:
-        interpreter = Interpreter(model_path=WAKE_MODEL_PATH)
-        interpreter.allocate_tensors()
-        input_details = interpreter.get_input_details()
-        output_details = interpreter.get_output_details()
+        model = wake_model.WakeWordModel(wake_model.model_path())
+        print(f"Wake model: {model.describe()}")
     except Exception as e:
-        print(f"Error loading TFLite model (Path: {WAKE_MODEL_PATH}): {e}")
+        print(f"Error loading TFLite model (Path: {wake_model.model_path()}): {e}")
+        ui_events.put(("ready", VOICE_UNAVAILABLE))
         return
 
-    buffer_len = int(FS * DURATION)
-    audio_buffer = collections.deque(maxlen=buffer_len)
-    audio_buffer.extend(np.zeros(buffer_len))
-    
-    def audio_callback(indata, frames, time_info, status):
-        if status:
-            pass # Ignore status spam
-        audio_buffer.extend(indata[:, 0])
+    mfcc = audio_stream.StreamingMFCC(AUDIO.ring, n_mfcc=N_MFCC, n_fft=N_FFT, hop_length=HOP_LENGTH)
+    # VAD sees every hop; MFCC and invoke() only run while it reports speech
+    vad = audio_stream.EnergyVAD(FS, HOP_LENGTH)
+    vad_reader = AUDIO.reader()
+    mfcc.reset(vad_reader.cursor)
 
-    print("Warming up audio processing...")
-    _ = process_audio(np.zeros(buffer_len))
-    
     print("Listening for wake word...")
-    with sd.InputStream(samplerate=FS, channels=1, dtype='float32', callback=audio_callback):
-        while True:
-            global STOP_LISTENING
-            if STOP_LISTENING:
-                print("GUI closed. Stopping wake word listener cleanly...")
-                break
-                
-            try:
-                current_audio = np.array(audio_buffer)
-                features = process_audio(current_audio)
-                
-                interpreter.set_tensor(input_details[0]['index'], features)
-                interpreter.invoke()
-                prediction = interpreter.get_tensor(output_details[0]['index'])
-                
-                prob_wake_word = prediction[0][1]
-                
-                if prob_wake_word >= 0.70:
-                    print(f"\n>>> WAKE WORD DETECTED <<< (Confidence: {prob_wake_word:.2f})")
-                    # Trigger the GUI event
-                    try:
-                        gui_root.event_generate("<<WakeWordDetected>>", when="tail")
-                    except Exception:
-                        pass
-                    break # Exit loop, release mic!
-                else:
-                    # Provide visual proof that the thread is looping ~10x a second
-                    print(f"\r... (Listening | Confidence: {prob_wake_word:.2f})    ", end="", flush=True)
-                
-                time.sleep(0.1)
-            except Exception as e:
-                print(f"Listener error: {e}")
-                break
-    print("Wake word thread dying, mic released.")
-
-r = sr.Recognizer()
-
-def _write_request(kind: str, value: str):
-    os.makedirs(SAVE_FOLDER, exist_ok=True)
-    with open(REQUEST_FILE, "w") as f:
-        f.write(f"Requested {kind}: {value}")
-    print(f"Saved -> Requested {kind}: {value}")
+    listener_ready.set()
+    hops = 0
+    while True:
+        global STOP_LISTENING, wake_position
+        if STOP_LISTENING:
+            print("GUI closed. Stopping wake word listener cleanly...")
+            break
+        if not wake_enabled.is_set():
+            # Paused while Vosk has the command; resume on fresh audio afterwards
+            wake_enabled.wait()
+            vad.reset()
+            vad_reader = AUDIO.reader()
+            mfcc.reset(vad_reader.cursor)
+            print("Listening for wake word...")
+
+        try:
+            hop = vad_reader.read(HOP_LENGTH, timeout=0.5)
+            if hop is None:
+                continue
+            hops += 1
+            if not vad.is_speech(hop):
+                if hops % 31 == 0:
+                    print(f"\r... (Idle | noise floor {vad.noise_floor:.0f} dB, "
+                          f"inference on {100 * vad.duty_cycle():.0f}% of hops)    ", end="", flush=True)
+                continue
+            # Only the new hop(s) get an FFT (after a quiet spell, just the 2 s window), up to
+            # the hop the VAD just passed; detection runs once per hop (32 ms)
+            if not mfcc.update(vad_reader.cursor):
+                continue
+            features = mfcc.features()
+
+            prob_wake_word = model.predict(features)
+
+            if prob_wake_word >= 0.70:
+                print(f"\n>>> WAKE WORD DETECTED <<< (Confidence: {prob_wake_word:.2f})")
+                # Vosk starts right after the audio that triggered (the listener's cursor, not the
+                # mic's write position), so a lagging listener does not drop the start of the command
+                wake_position = vad_reader.cursor
+                wake_enabled.clear()
+                # Tell the GUI (picked up by poll_events on the Tk thread)
+                ui_events.put(("wake", prob_wake_word))
+            elif hops % 3 == 0:
+                # Visual proof that the thread is looping (printed ~10x a second)
+                print(f"\r... (Listening | Confidence: {prob_wake_word:.2f})    ", end="", flush=True)
+        except Exception as e:
+            print(f"Listener error: {e}")
+            break
+    print("Wake word thread stopped.")
+
+def _submit_request(kind: str, value: str):
+    if STAY_OPEN:
+        # master2 --daemon picks it up from the queue, even mid-cycle
+        request = request_queue.enqueue(kind, value)
+        chip_id.delete(0, tk.END)
+        status.config(text=f"Request #{request['id']} queued: {value}")
+    else:
+        request_queue.write_request_file(kind, value)
+        close_gui()
 
 def close_gui():
     global STOP_LISTENING
     STOP_LISTENING = True
+    wake_enabled.set()
     chip_request.destroy()
 
 def save_input():
     txt = chip_id.get().strip()
     if txt:
-        _write_request("Part", txt)
-        close_gui()
+        _submit_request("Part", txt)
     else:
         print("Chip Request Failed (empty)")
 
 def save_circuit_input():
     txt = chip_id.get().strip()
     if txt:
-        _write_request("Circuit", txt)
-        close_gui()
+        _submit_request("Circuit", txt)
     else:
         print("Circuit Request Failed (empty)")
 
 def save_no_input():
-    _write_request("Part", "None")
-    close_gui()
+    _submit_request("Part", "None")
+
 
+def _speech_worker(reader):
+    """Runs one Vosk capture off the Tk thread; results come back through ui_events."""
+    try:
+        # Vosk model stays loaded in this process; audio comes from the shared stream
+        recognized = vosk_capture.run_voice_capture(
+            save_to_file=False,
+            source=lambda timeout: reader.read_int16(VOSK_BLOCK, timeout),
+            on_update=lambda text: ui_events.put(("partial", text))).strip()
+        ui_events.put(("result", recognized))
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        ui_events.put(("result", ""))
+    finally:
+        # Back to wake-word listening automatically
+        wake_enabled.set()
 
 def speech_to_text():
- 
+    """Starts recognition in the background; the GUI keeps running meanwhile."""
+    global wake_position, speech_thread
+    if AUDIO is None or vosk_capture is None:
+        print("Speech models still loading.")
+        return
+    if speech_thread is not None and speech_thread.is_alive():
+        print("Speech recognition already running.")
+        return
     print("🎙️ Running Vosk voice recognition...")
+    wake_enabled.clear()
+    if wake_position is not None:
+        reader = AUDIO.reader(start=wake_position, preroll_sec=COMMAND_PREROLL_SEC)
+        wake_position = None
+    else:
+        reader = AUDIO.reader()
+    dan_listen.config(text="Listening for command...", background="Green")
+    speech_thread = threading.Thread(target=_speech_worker, args=(reader,), daemon=True)
+    speech_thread.start()
 
-    if 'listener_thread' in globals() and listener_thread.is_alive():
-        listener_thread.join(timeout=1)
+def poll_events():
+    """Applies worker events to the widgets, then re-arms itself."""
     try:
-        # Run the Vosk script and wait for it to finish
-        subprocess.run(["python3", VOSK_FILE], check=True)
-
-        # Now read the recognized text from the shared file
-        with open(SPEECH_FILE, 'r') as f:
-            recognized = f.read().strip()
-
-        if recognized:
-            chip_id.delete(0, tk.END)
-            chip_id.insert(0, recognized)
-            print(f"✅ Loaded recognized chips: {recognized}")
-        else:
-            print("⚠️ No recognized text found in speech file.")
-            
-    except FileNotFoundError:
-        print(f"Speech file not found at {SPEECH_FILE}")
-    except subprocess.CalledProcessError as e:
-        print(f"Vosk script exited with an error: {e}")
-    except Exception as e:
-        print(f"Unexpected error: {e}")
+        while True:
+            event, value = ui_events.get_nowait()
+            if event == "wake":
+                on_wakeword_detected(value)
+            elif event == "ready":
+                text, color = value
+                dan_listen.config(text=text, background=color)
+            elif event == "partial":
+                chip_id.delete(0, tk.END)
+                chip_id.insert(0, value)
+            elif event == "result":
+                if value:
+                    chip_id.delete(0, tk.END)
+                    chip_id.insert(0, value)
+                    print(f"✅ Loaded recognized chips: {value}")
+                else:
+                    print("⚠️ No chips recognized.")
+                dan_listen.config(text="Listening for Hey Dan", background="red")
+    except queue.Empty:
+        pass
+    chip_request.after(UI_POLL_MS, poll_events)
 
-    
 
 def load_previous_request():
     try:
@@ -199,12 +298,10 @@ def load_previous_request():
         print(f"Error loading previous request: {e}")
 
 
-def on_wakeword_detected(event):
+def on_wakeword_detected(confidence):
     dan_listen.config(text="Hello, waiting for command", background="Green")
-    dan_listen.update()
 
-    print("GUI received wake-word signal. Launching Vosk...")
-   #
+    print(f"GUI received wake-word signal ({confidence:.2f}). Launching Vosk...")
     speech_to_text()
 
 # --- GUI ---
@@ -214,25 +311,27 @@ if __name__ == "__main__":
     chip_request.minsize(360, 240)
     
     chip_request.protocol("WM_DELETE_WINDOW", close_gui)
-    chip_request.bind("<<WakeWordDetected>>", on_wakeword_detected)
-    
-    # Start the listening thread automatically
-    listener_thread = threading.Thread(target=wake_word_listener, args=(chip_request,), daemon=True)
-    listener_thread.start()
     
+
     tk.Label(text="Chip / Circuit Input").pack(pady=(8,2))
     chip_id = tk.Entry()
     chip_id.pack(fill="x", padx=10)
-    dan_listen = tk.Label(text="Listening for Hey Dan",background="red")
+    dan_listen = tk.Label(text="Loading speech models...",background="gray")
     dan_listen.pack(pady= 3)
     tk.Button(chip_request, text="Speech to Text (Vosk)",   command=speech_to_text).pack(pady=3)
     tk.Button(chip_request, text="Submit Part Request",   command=save_input).pack(pady=3)
     tk.Button(chip_request, text="Submit Circuit Request",command=save_circuit_input).pack(pady=3)
     tk.Button(chip_request, text="Submit No Request",     command=save_no_input).pack(pady=3)
     tk.Button(chip_request, text="Load Previous Request", command=load_previous_request).pack(pady=3)
+    status = tk.Label(text="Requests close this window" if not STAY_OPEN else "Requests are queued for the pipeline")
+    status.pack(pady=3)
 
-
+    chip_request.after(UI_POLL_MS, poll_events)
+    # Window first; mic stream, wake listener and Vosk load behind it (started once)
+    chip_request.after_idle(lambda: threading.Thread(target=background_startup, daemon=True).start())
 
     chip_request.mainloop()
     if 'listener_thread' in globals() and listener_thread.is_alive():
-        listener_thread.join(timeout=1)
\ No newline at end of file
+        listener_thread.join(timeout=1)
+    if AUDIO is not None:
+        AUDIO.stop()
\ No newline at end of file
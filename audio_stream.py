@@ -0,0 +1,348 @@
+# Streaming audio helpers for the wake-word listener and the command recognizer.
+# - RingBuffer: fixed NumPy ring the sounddevice callback writes into. Readers keep
+#   their own cursor (absolute sample count) so nothing is copied per tick.
+# - AudioCaptureService: the one microphone stream; every consumer reads the same
+#   ring through its own RingReader, so the wake word and Vosk never hand the mic over.
+# - StreamingMFCC: MFCC features matching librosa.feature.mfcc(n_mfcc=32, n_fft=2048,
+#   hop_length=512) over a 2 s window, but only the newest hop is transformed.
+#   The rolling log-mel matrix is shifted one column per hop; the top_db clip and the
+#   DCT are re-applied over the window (cheap: 32x128 @ 128x63).
+# - load_wav / stream_features: recorded clips through the same path, for benchmarks.
+# Note: frames are taken from the continuous stream, so the two frames at each edge
+# of the window see neighbouring audio instead of librosa's zero padding, and the
+# newest frame is centred 1024 samples (64 ms) behind the newest sample.
+import time
+import bisect
+import threading
+import wave
+from math import gcd
+import numpy as np
+
+FS = 16000
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MELS = 128
+N_MFCC = 32
+N_FRAMES = 63           # 1 + 2 s * 16 kHz // 512, same as the batch features
+AMIN = 1e-10
+TOP_DB = 80.0
+
+# Voice activity gate (per 512-sample hop)
+VAD_MARGIN_DB = 9.0         # speech = this far above the noise floor...
+VAD_MIN_DB = -65.0          # ...and above this absolute level (dBFS)
+VAD_ZCR_MAX = 0.45          # hiss / fan noise crosses zero on nearly every other sample
+VAD_HANGOVER_SEC = 0.6      # keep the gate open this long after the last speech hop
+VAD_FLOOR_FALL = 0.3        # noise floor follows quieter input quickly...
+VAD_FLOOR_RISE = 0.005      # ...and louder input slowly (~6 s time constant)
+
+
+class RingBuffer:
+    """ Single-producer float32 sample ring. Positions are absolute sample counts.
+    The data path takes no lock: the producer announces `writing_to` before copying and
+    publishes `total` after, and a reader re-checks `writing_to` after its copy to
+    detect samples overwritten meanwhile.
+    The condition is only used to wake up waiting readers."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = np.zeros(capacity, dtype=np.float32)
+        self.total = 0                      # samples written since start
+        self.writing_to = 0                 # total once the write in progress is done
+        self.written = threading.Condition()
+
+    def write(self, samples):
+        samples = np.asarray(samples, dtype=np.float32).ravel()
+        n = len(samples)
+        if n >= self.capacity:
+            samples = samples[-self.capacity:]
+        self.writing_to = self.total + n
+        start = (self.total + n - len(samples)) % self.capacity
+        first = min(len(samples), self.capacity - start)
+        self.data[start:start + first] = samples[:first]
+        self.data[:len(samples) - first] = samples[first:]
+        self.total = self.writing_to
+        with self.written:
+            self.written.notify_all()
+
+    def oldest(self):
+        return max(0, self.total - self.capacity)
+
+    def read(self, start, end):
+        """Copy of samples [start, end). Raises ValueError if they are not (or no longer) in the ring."""
+        if start < self.oldest() or end > self.total:
+            raise ValueError(f"Samples {start}-{end} not in ring (have {self.oldest()}-{self.total})")
+        a, b = start % self.capacity, end % self.capacity
+        if end - start == 0:
+            out = self.data[:0].copy()
+        elif a < b:
+            out = self.data[a:b].copy()
+        else:
+            out = np.concatenate((self.data[a:], self.data[:b]))
+        if start < self.writing_to - self.capacity:
+            raise ValueError(f"Samples {start}-{end} overwritten while reading")
+        return out
+
+    def latest(self, n):
+        end = self.total
+        return self.read(max(0, end - n), end)
+
+    def wait_for(self, position, timeout=None):
+        """Blocks until `position` samples have been written. Returns False on timeout."""
+        with self.written:
+            return self.written.wait_for(lambda: self.total >= position, timeout)
+
+
+class RingReader:
+    """ One consumer's cursor into a RingBuffer."""
+
+    def __init__(self, ring, start=None):
+        self.ring = ring
+        self.cursor = ring.total if start is None else max(ring.oldest(), start)
+        self.overruns = 0
+
+    def read(self, n, timeout=None):
+        """Next n samples, or None if they did not arrive within timeout.
+        A reader that fell behind skips to the oldest sample still in the ring."""
+        if not self.ring.wait_for(self.cursor + n, timeout):
+            return None
+        if self.cursor < self.ring.oldest():
+            self.overruns += 1
+            self.cursor = self.ring.oldest()
+        samples = self.ring.read(self.cursor, self.cursor + n)
+        self.cursor += n
+        return samples
+
+    def read_int16(self, n, timeout=None):
+        """Like read(), as 16-bit PCM bytes (what Vosk AcceptWaveform expects)."""
+        samples = self.read(n, timeout)
+        if samples is None:
+            return None
+        return (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+
+
+class AudioCaptureService:
+    """ The single 16 kHz mono input stream, kept open for the life of the UI."""
+
+    def __init__(self, samplerate=FS, blocksize=HOP_LENGTH, history_sec=10.0):
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.ring = RingBuffer(int(samplerate * history_sec))
+        self.stream = None
+
+    def _callback(self, indata, frames, time_info, status):
+        self.ring.write(indata[:, 0])
+
+    def start(self):
+        import sounddevice as sd
+        self.stream = sd.InputStream(samplerate=self.samplerate, channels=1, dtype='float32',
+                                     blocksize=self.blocksize, callback=self._callback)
+        self.stream.start()
+
+    def stop(self):
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+
+    def start_replay(self, samples, speed=1.0):
+        """Plays a recording into the same callback as the mic, blocksize samples at a time.
+        speed 1.0 = real time, 4.0 = four times faster, 0 = as fast as possible.
+        replay_done is set after the last block; written_at() maps positions to wall time."""
+        self.block_positions, self.block_times = [], []
+        self.replay_done = threading.Event()
+
+        def run():
+            start = time.perf_counter()
+            for n in range(0, len(samples), self.blocksize):
+                block = np.asarray(samples[n:n + self.blocksize], dtype=np.float32)
+                if speed > 0:
+                    delay = start + (n + len(block)) / self.samplerate / speed - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                self._callback(block.reshape(-1, 1), len(block), None, None)
+                self.block_positions.append(self.ring.total)
+                self.block_times.append(time.perf_counter())
+            self.replay_done.set()
+
+        self.replay_thread = threading.Thread(target=run, daemon=True)
+        self.replay_thread.start()
+
+    def written_at(self, position):
+        """perf_counter() time the replay wrote sample `position` (None if not yet written)."""
+        i = bisect.bisect_left(self.block_positions, position)
+        return self.block_times[i] if i < len(self.block_times) else None
+
+    def position(self):
+        return self.ring.total
+
+    def reader(self, start=None, preroll_sec=0.0):
+        """Cursor from `start` (default: now), moved back by preroll_sec of history."""
+        start = self.ring.total if start is None else start
+        return RingReader(self.ring, start - int(preroll_sec * self.samplerate))
+
+
+class EnergyVAD:
+    """ Energy + zero-crossing voice activity detector with an adaptive noise floor.
+    is_speech() is called once per hop and stays True for the hangover after speech."""
+
+    def __init__(self, sr=FS, hop_length=HOP_LENGTH):
+        self.hangover_hops = int(VAD_HANGOVER_SEC * sr / hop_length)
+        self.reset()
+
+    def reset(self):
+        self.noise_floor = None
+        self.hangover = 0
+        self.active_hops = 0
+        self.total_hops = 0
+
+    def is_speech(self, hop):
+        energy_db = 10 * np.log10(np.mean(np.square(hop, dtype=np.float64)) + AMIN)
+        zcr = np.count_nonzero(np.signbit(hop[1:]) != np.signbit(hop[:-1])) / len(hop)
+        if self.noise_floor is None:
+            self.noise_floor = energy_db
+        speech = (energy_db > self.noise_floor + VAD_MARGIN_DB and energy_db > VAD_MIN_DB
+                  and zcr < VAD_ZCR_MAX)
+        if speech:
+            self.hangover = self.hangover_hops
+        else:
+            rate = VAD_FLOOR_FALL if energy_db < self.noise_floor else VAD_FLOOR_RISE
+            self.noise_floor += (energy_db - self.noise_floor) * rate
+        active = speech or self.hangover > 0
+        if not speech and self.hangover > 0:
+            self.hangover -= 1
+        self.total_hops += 1
+        self.active_hops += active
+        return active
+
+    def duty_cycle(self):
+        """Fraction of hops the gate was open (i.e. inference ran)."""
+        return self.active_hops / self.total_hops if self.total_hops else 0.0
+
+
+def hz_to_mel(f):
+    """Slaney mel scale (librosa default, htk=False)."""
+    f = np.asarray(f, dtype=np.float64)
+    f_sp = 200.0 / 3
+    min_log_hz = 1000.0
+    min_log_mel = min_log_hz / f_sp
+    logstep = np.log(6.4) / 27.0
+    return np.where(f >= min_log_hz, min_log_mel + np.log(np.maximum(f, min_log_hz) / min_log_hz) / logstep, f / f_sp)
+
+
+def mel_to_hz(m):
+    m = np.asarray(m, dtype=np.float64)
+    f_sp = 200.0 / 3
+    min_log_hz = 1000.0
+    min_log_mel = min_log_hz / f_sp
+    logstep = np.log(6.4) / 27.0
+    return np.where(m >= min_log_mel, min_log_hz * np.exp(logstep * (m - min_log_mel)), f_sp * m)
+
+
+def mel_filterbank(sr=FS, n_fft=N_FFT, n_mels=N_MELS):
+    """Same weights as librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels) (slaney norm)."""
+    fftfreqs = np.linspace(0, sr / 2, 1 + n_fft // 2)
+    mel_f = mel_to_hz(np.linspace(hz_to_mel(0.0), hz_to_mel(sr / 2), n_mels + 2))
+    fdiff = np.diff(mel_f)
+    ramps = np.subtract.outer(mel_f, fftfreqs)
+    lower = -ramps[:-2] / fdiff[:-1, None]
+    upper = ramps[2:] / fdiff[1:, None]
+    weights = np.maximum(0, np.minimum(lower, upper))
+    weights *= (2.0 / (mel_f[2:n_mels + 2] - mel_f[:n_mels]))[:, None]
+    return weights.astype(np.float32)
+
+
+def dct_matrix(n_out, n_in):
+    """DCT-II with norm='ortho' as a matrix (first n_out rows), like scipy.fft.dct."""
+    k = np.arange(n_out)[:, None]
+    n = np.arange(n_in)[None, :]
+    basis = np.cos(np.pi * k * (2 * n + 1) / (2 * n_in)) * np.sqrt(2.0 / n_in)
+    basis[0] /= np.sqrt(2.0)
+    return basis.astype(np.float32)
+
+
+class StreamingMFCC:
+    """ Rolling (n_mfcc x n_frames) MFCC matrix updated one hop at a time from a RingBuffer."""
+
+    def __init__(self, ring, n_mfcc=N_MFCC, n_frames=N_FRAMES, sr=FS, n_fft=N_FFT, hop_length=HOP_LENGTH):
+        self.ring = ring
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        # Periodic Hann, as scipy.signal.get_window('hann', n_fft) / librosa
+        self.window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(n_fft) / n_fft)).astype(np.float32)
+        self.mel_basis = mel_filterbank(sr, n_fft)
+        self.dct = dct_matrix(n_mfcc, self.mel_basis.shape[0])
+        # Silence = amin in every bin, same as the old zero-filled warm-up buffer
+        self.log_mel = np.empty((self.mel_basis.shape[0], n_frames), dtype=np.float32)
+        self.reset()
+
+    def reset(self, start=None):
+        """Back to a silent window, first frame made only of audio from start on
+        (the consumer's cursor; default: the ring's write position)."""
+        self.log_mel[:] = 10 * np.log10(AMIN)
+        # Next frame ends at this absolute sample
+        self.next_end = (self.ring.total if start is None else start) + self.n_fft
+
+    def update(self, end=None):
+        """Transforms every complete hop up to absolute sample end (the consumer's cursor,
+        so the window lines up with the audio it has actually read; default: the ring's
+        write position). Returns the number of new frames.
+        After a pause (VAD gate closed) only the frames still inside the window are computed."""
+        end = self.ring.total if end is None else end
+        new_frames = 0
+        pending = (end - self.next_end) // self.hop_length + 1
+        if pending > self.log_mel.shape[1]:
+            self.next_end += (pending - self.log_mel.shape[1]) * self.hop_length
+        # Audio already overwritten in the ring cannot be transformed any more
+        oldest_end = self.ring.oldest() + self.n_fft
+        if self.next_end < oldest_end:
+            self.next_end += -(-(oldest_end - self.next_end) // self.hop_length) * self.hop_length
+        while self.next_end <= end:
+            frame = self.ring.read(self.next_end - self.n_fft, self.next_end)
+            spectrum = np.fft.rfft(frame * self.window)
+            power = spectrum.real ** 2 + spectrum.imag ** 2
+            mel = self.mel_basis @ power.astype(np.float32)
+            self.log_mel[:, :-1] = self.log_mel[:, 1:]
+            self.log_mel[:, -1] = 10 * np.log10(np.maximum(AMIN, mel))
+            self.next_end += self.hop_length
+            new_frames += 1
+        return new_frames
+
+    def features(self):
+        """Current MFCC matrix shaped (1, n_mfcc, n_frames, 1) for the TFLite model."""
+        log_mel = np.maximum(self.log_mel, self.log_mel.max() - TOP_DB)
+        mfcc = self.dct @ log_mel
+        return mfcc.reshape(1, mfcc.shape[0], mfcc.shape[1], 1)
+
+
+def load_wav(path, sr=FS):
+    """Mono float32 samples in [-1, 1] at sr. Handles 8/16/32-bit PCM
+    (UIRequestRecord.wav is 8 kHz unsigned 8-bit, so it is resampled to 16 kHz)."""
+    with wave.open(path, "rb") as w:
+        rate, width, channels = w.getframerate(), w.getsampwidth(), w.getnchannels()
+        raw = w.readframes(w.getnframes())
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2 ** 31
+    else:
+        raise ValueError(f"Unsupported sample width {width} in {path}")
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    if rate != sr:
+        from scipy.signal import resample_poly
+        g = gcd(sr, rate)
+        samples = np.clip(resample_poly(samples, sr // g, rate // g), -1.0, 1.0).astype(np.float32)
+    return samples
+
+
+def stream_features(samples, chunk=HOP_LENGTH, sr=FS):
+    """Feeds samples through a RingBuffer + StreamingMFCC in mic-sized chunks.
+    Yields (samples_written, features) after every chunk that completed a frame."""
+    ring = RingBuffer(max(len(samples), 1) + N_FFT)
+    mfcc = StreamingMFCC(ring, sr=sr)
+    for start in range(0, len(samples), chunk):
+        ring.write(samples[start:start + chunk])
+        if mfcc.update():
+            yield ring.total, mfcc.features()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# Belt calibration for chipvision3's trigger logic.
+# Calibration run (CHIPVISION_CALIBRATE=1 python3 chipvision3.py, chips on the belt):
+#   1. belt runs, chips are tracked frame to frame (nearest x), velocity = dy1/dt
+#   2. motor stops; the tracked chip's y1 is followed until it is still, giving the
+#      overshoot = distance travelled after the frame that caused the stop
+#      (detector latency + probe + GPIO + mechanical spin-down)
+#   repeated CALIBRATION_STOPS times, medians saved to CALIBRATION_FILE.
+# derive_thresholds() turns velocity, frame interval, latency and stop distance into
+# the trigger band, capture zone, blind period and timeout; without a calibration
+# file the hand-tuned values are used unchanged.
+# Latency compensation: the frame age (pipeline clock minus buffer PTS) is measured
+# per buffer, so the overshoot splits into latency travel and mechanical stop distance.
+# StopPredictor then triggers on where a chip will come to rest rather than where it
+# was when the frame was captured.
+import os
+import json
+import time
+import statistics
+from collections import deque
+
+SAVE_FOLDER      = "/home/scalepi/Desktop/savephototest"
+CALIBRATION_FILE = os.path.join(SAVE_FOLDER, "belt_calibration.json")
+
+CALIBRATE            = os.environ.get("CHIPVISION_CALIBRATE", "0") == "1"
+CALIBRATION_STOPS    = 3
+RUN_SEC              = 2.0      # belt running per calibration stop
+SETTLE_TIMEOUT_SEC   = 2.0
+STILL_TOLERANCE      = 0.003    # y1 change per frame that counts as stopped
+STILL_FRAMES         = 3
+MATCH_DX             = 0.05     # max x drift for "same chip" between frames
+DETECTOR_LATENCY_SEC = float(os.environ.get("DETECTOR_LATENCY_SEC", "0.10"))  # if frame ages are not available
+LATENCY_COMPENSATION = os.environ.get("LATENCY_COMPENSATION", "1") == "1"
+LATENCY_WINDOW       = 60       # frames in the rolling latency estimate
+
+# Geometry that does not depend on belt speed
+CAPTURE_ZONE_CENTER = 0.45      # middle of the original 0.35-0.55 zone
+MIN_ZONE_HALF       = 0.10
+MIN_BAND_HALF       = 0.02
+SPINUP_SEC          = 0.10
+TIMEOUT_MARGIN_SEC  = 0.30
+
+
+class TriggerThresholds:
+    """ The numbers app_callback uses to trigger and accept captures."""
+
+    def __init__(self, first_trigger_y, band, zone, blind_sec, timeout_sec, source):
+        self.first_trigger_y = first_trigger_y
+        self.band = band                # (low, high) on y1 for frames > 1
+        self.zone = zone                # (low, high) on y1 at capture time
+        self.blind_sec = blind_sec
+        self.timeout_sec = timeout_sec
+        self.source = source
+
+    def describe(self):
+        return (f"{self.source}: first y1 > {self.first_trigger_y:.3f}, band {self.band[0]:.3f}-{self.band[1]:.3f}, "
+                f"zone {self.zone[0]:.3f}-{self.zone[1]:.3f}, blind {self.blind_sec:.2f}s, timeout {self.timeout_sec:.2f}s")
+
+
+DEFAULT_THRESHOLDS = TriggerThresholds(0.40, (0.38, 0.45), (0.35, 0.55), 0.5, 2.5, "hand-tuned defaults")
+
+
+def derive_thresholds(cal):
+    """TriggerThresholds from a calibration dict (velocity in normalized y per second)."""
+    v = cal["velocity"]
+    frame_dt = cal["frame_interval"]
+    latency = cal.get("latency", DETECTOR_LATENCY_SEC)
+    travel_after_trigger = v * latency + cal["stop_distance"]
+
+    # Trigger so the chip comes to rest in the middle of the zone. A chip is first seen
+    # past the threshold somewhere within one frame of travel, on average half a frame.
+    first_trigger_y = CAPTURE_ZONE_CENTER - travel_after_trigger - v * frame_dt / 2
+    band_half = max(MIN_BAND_HALF, v * frame_dt)        # at least one frame always lands in the band
+    band = (first_trigger_y, first_trigger_y + 2 * band_half)
+    # Landing spread: anywhere in the band, plus stop-distance scatter
+    zone_half = max(MIN_ZONE_HALF, band_half + cal.get("stop_spread", 0.0) + v * frame_dt)
+    zone = (CAPTURE_ZONE_CENTER - zone_half, CAPTURE_ZONE_CENTER + zone_half)
+    # The chip just captured must clear the band before we look again
+    blind = max(0.0, band[1] - zone[0]) / v + SPINUP_SEC
+    # A chip entering at the top of the frame reaches the band by then
+    timeout = blind + band[1] / v + TIMEOUT_MARGIN_SEC
+    return TriggerThresholds(first_trigger_y, band, zone, blind, timeout,
+                             f"calibrated at {v:.3f}/s")
+
+
+def load_thresholds(path=CALIBRATION_FILE):
+    try:
+        with open(path, "r") as f:
+            return derive_thresholds(json.load(f))
+    except FileNotFoundError:
+        return DEFAULT_THRESHOLDS
+    except (ValueError, KeyError, ZeroDivisionError) as e:
+        print(f"⚠️ Ignoring bad calibration file {path}: {e}")
+        return DEFAULT_THRESHOLDS
+
+
+def _match(prev, boxes):
+    """Pairs (prev_box, box) of the same chip: nearest x1 within MATCH_DX, moving down the belt."""
+    pairs = []
+    for box in boxes:
+        candidates = [p for p in prev if abs(p[0] - box[0]) < MATCH_DX and box[1] >= p[1] - STILL_TOLERANCE]
+        if candidates:
+            pairs.append((min(candidates, key=lambda p: abs(p[0] - box[0])), box))
+    return pairs
+
+
+class BeltCalibrator:
+    """ Frame-driven calibration run; update() every frame with the detection boxes.
+    start_motor / stop_motor are the GPIO functions. Returns True when finished."""
+
+    def __init__(self, start_motor, stop_motor, path=CALIBRATION_FILE, stops=CALIBRATION_STOPS):
+        self.start_motor = start_motor
+        self.stop_motor = stop_motor
+        self.path = path
+        self.stops = stops
+        self.velocities = []
+        self.intervals = []
+        self.overshoots = []
+        self.state = "RUNNING"
+        self.phase_start = None
+        self.prev = None            # (time, boxes) of the previous frame
+        self.tracked = None         # (x1, y1 at the stop frame, last y1, still frame count)
+        self.stop_ages = []         # age of the stop frame when the motor was told to stop
+
+    def update(self, boxes, now, frame_age=None):
+        """frame_age: seconds between capture of this frame and now (None if unknown)."""
+        if self.phase_start is None:
+            self.phase_start = now
+        if self.prev is not None:
+            self.intervals.append(now - self.prev[0])
+
+        if self.state == "RUNNING":
+            if self.prev is not None:
+                dt = now - self.prev[0]
+                for p, b in _match(self.prev[1], boxes):
+                    if dt > 0 and b[1] - p[1] > STILL_TOLERANCE:
+                        self.velocities.append((b[1] - p[1]) / dt)
+            if now - self.phase_start >= RUN_SEC and boxes:
+                # Stop on the chip nearest the zone, remember where it was in this frame
+                box = min(boxes, key=lambda b: abs(b[1] - CAPTURE_ZONE_CENTER))
+                self.stop_motor()
+                age = frame_age if frame_age is not None else DETECTOR_LATENCY_SEC
+                self.stop_ages.append(age + (time.time() - now))
+                self.tracked = (box[0], box[1], box[1], 0)
+                self.state = "SETTLING"
+                self.phase_start = now
+
+        elif self.state == "SETTLING":
+            x1, y_stop, y_last, still = self.tracked
+            same = [b for b in boxes if abs(b[0] - x1) < MATCH_DX]
+            if same:
+                y = min(same, key=lambda b: abs(b[1] - y_last))[1]
+                still = still + 1 if abs(y - y_last) <= STILL_TOLERANCE else 0
+                self.tracked = (x1, y_stop, y, still)
+            if still >= STILL_FRAMES or now - self.phase_start >= SETTLE_TIMEOUT_SEC:
+                overshoot = self.tracked[2] - y_stop
+                self.overshoots.append(overshoot)
+                print(f"📏 Calibration stop {len(self.overshoots)}/{self.stops}: overshoot {overshoot:.3f} "
+                      f"({'settled' if still >= STILL_FRAMES else 'settle timeout'})")
+                if len(self.overshoots) >= self.stops:
+                    self.save()
+                    self.prev = (now, list(boxes))
+                    return True
+                self.start_motor()
+                self.state = "RUNNING"
+                self.phase_start = now
+
+        self.prev = (now, list(boxes))
+        return False
+
+    def result(self):
+        if not self.velocities or not self.overshoots:
+            raise ValueError("no chip motion observed; put chips on the belt and retry")
+        velocity = statistics.median(self.velocities)
+        overshoot = statistics.median(self.overshoots)
+        latency = statistics.median(self.stop_ages)
+        # Travel after the stop command is purely mechanical
+        stop_distances = [max(0.0, o - velocity * a) for o, a in zip(self.overshoots, self.stop_ages)]
+        return {
+            "velocity": velocity,
+            "frame_interval": statistics.median(self.intervals),
+            "latency": latency,
+            "overshoot": overshoot,
+            "stop_distance": statistics.median(stop_distances),
+            "stop_spread": (max(stop_distances) - min(stop_distances)) / 2,
+            "velocity_samples": len(self.velocities),
+            "time": time.time(),
+        }
+
+    def save(self):
+        try:
+            cal = self.result()
+        except ValueError as e:
+            print(f"❌ Calibration failed: {e}")
+            return None
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "w") as f:
+            json.dump(cal, f, indent=2)
+        print(f"✅ Calibration saved to {self.path}: velocity {cal['velocity']:.3f}/s, "
+              f"overshoot {cal['overshoot']:.3f}")
+        print(f"   {derive_thresholds(cal).describe()}")
+        return cal
+
+
+def load_calibration(path=CALIBRATION_FILE):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+class StopPredictor:
+    """ Where a chip seen in a frame comes to rest if the motor is stopped now:
+    y1 + velocity * (frame age + time to issue the stop) + mechanical stop distance."""
+
+    def __init__(self, cal):
+        self.velocity = cal["velocity"]
+        self.stop_distance = cal["stop_distance"]
+        self.frame_interval = cal["frame_interval"]
+        self.ages = deque(maxlen=LATENCY_WINDOW)
+        self.actuation = deque([0.0], maxlen=LATENCY_WINDOW)   # probe entry -> stop_motor() returned
+
+    def observe(self, frame_age):
+        if frame_age is not None:
+            self.ages.append(frame_age)
+
+    def observe_actuation(self, seconds):
+        self.actuation.append(seconds)
+
+    def latency(self):
+        """Typical frame age at the probe (rolling median)."""
+        return statistics.median(self.ages) if self.ages else DETECTOR_LATENCY_SEC
+
+    def rest_position(self, y1, frame_age=None):
+        age = frame_age if frame_age is not None else self.latency()
+        return y1 + self.velocity * (age + statistics.median(self.actuation)) + self.stop_distance
+
+    def should_stop(self, y1, frame_age, zone, first_chip):
+        """Stop when the chip would land at or just past the zone centre (within half a
+        frame of travel); later chips must also not land beyond the zone."""
+        rest = self.rest_position(y1, frame_age)
+        if rest < CAPTURE_ZONE_CENTER - self.velocity * self.frame_interval / 2:
+            return False
+        return first_chip or rest <= zone[1]
+
+
+def load_predictor(path=CALIBRATION_FILE):
+    """StopPredictor from the calibration file, or None (no calibration / compensation off)."""
+    cal = load_calibration(path) if LATENCY_COMPENSATION else None
+    try:
+        return StopPredictor(cal) if cal else None
+    except KeyError as e:
+        print(f"⚠️ Calibration file lacks {e}; latency compensation off")
+        return None
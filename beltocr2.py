@@ -6,6 +6,8 @@ import easyocr
 from difflib import SequenceMatcher
 import re
 from typing import Dict, List, Tuple
+import request_queue
+import superres
 
 # --- Paths & Files ---
 SAVE_FOLDER        = "/home/scalepi/Desktop/savephototest"
@@ -15,6 +17,8 @@ PART_FILE          = os.path.join(SAVE_FOLDER, "Parts.txt")  # (unused here; lef
 FINAL_MASKED_IMAGE = os.path.join(SAVE_FOLDER, "masked_blob.png")
 ROTATED_OUTPUT     = os.path.join(SAVE_FOLDER, "rotated_blob.png")
 ROTATED_OUTPUT_180 = os.path.join(SAVE_FOLDER, "rotated_blob_180.png")
+SR_OUTPUT          = os.path.join(SAVE_FOLDER, "text_band_sr.png")
+SR_OUTPUT_180      = os.path.join(SAVE_FOLDER, "text_band_sr_180.png")
 FINAL_OCR_OUTPUT   = os.path.join(SAVE_FOLDER, "final_oriented_chip.png")
 REQUEST_FILE       = os.path.join(SAVE_FOLDER, "chip_request_input.txt")
 
@@ -171,33 +175,36 @@ def mask_and_rotate(original_image):
     cv2.imwrite(ROTATED_OUTPUT_180, rotated_180)
     return angle
 
+def prepare_ocr_images():
+    """(0°, 180°) images to OCR: the FSRCNN-upscaled text band when superres applies
+    to this chip, otherwise the rotated crops from mask_and_rotate()."""
+    band = superres.enhance(cv2.imread(ROTATED_OUTPUT))
+    if band is None:
+        return ROTATED_OUTPUT, ROTATED_OUTPUT_180
+    cv2.imwrite(SR_OUTPUT, band)
+    cv2.imwrite(SR_OUTPUT_180, cv2.rotate(band, cv2.ROTATE_180))
+    return SR_OUTPUT, SR_OUTPUT_180
+
 def run_ocr_and_select(reader):
-    text0, _ = run_ocr_once(reader, ROTATED_OUTPUT)
-    text180, _ = run_ocr_once(reader, ROTATED_OUTPUT_180)
+    image0, image180 = prepare_ocr_images()
+    text0, _ = run_ocr_once(reader, image0)
+    text180, _ = run_ocr_once(reader, image180)
     _, r0 = best_part_match(text0)
     _, r180 = best_part_match(text180)
-    return (ROTATED_OUTPUT_180 if r180 > r0 else ROTATED_OUTPUT)
+    return (image180 if r180 > r0 else image0)
 
 def is_duplicate_point(pt, seen, threshold=0.01):
     return any(abs(pt[0]-x)<threshold and abs(pt[1]-y)<threshold for x,y in seen)
 
-# ===== Updated: append with Frame line (unchanged logic, now gets frame_no robustly) =====
-def update_detection_file(angle, crop_index, chip_middle, frame_no, time_offset=0.0):
-    # Read the user’s request (circuit or manual parts)
-    circuit_name = None
-    manual_parts = []
-    if os.path.exists(REQUEST_FILE):
+# ===== The user's request, read once per OCR run =====
+def load_request():
+    """(parts_list, source_desc) for this cycle.
+    master2 --daemon passes the queued request in CHIP_REQUEST; otherwise chip_request_input.txt."""
+    text = os.environ.get("CHIP_REQUEST")
+    if text is None and os.path.exists(REQUEST_FILE):
         with open(REQUEST_FILE, 'r') as rf:
-            for line in rf:
-                line = line.strip()
-                if line.upper().startswith("REQUESTED CIRCUIT:"):
-                    circuit_name = line.split(":", 1)[1].strip().upper()
-                elif line.upper().startswith("REQUESTED PART:"):
-                    manual_parts = [
-                        p.strip().upper()
-                        for p in line.split(":", 1)[1].split(",")
-                        if p.strip()
-                    ]
+            text = rf.read()
+    circuit_name, manual_parts = request_queue.parse_request(text)
 
     # Choose parts list
     if circuit_name:
@@ -206,9 +213,16 @@ def update_detection_file(angle, crop_index, chip_middle, frame_no, time_offset=
     else:
         parts_list = manual_parts
         source_desc = ", ".join(manual_parts) if manual_parts else "None"
+    return parts_list, source_desc
+
+# ===== Updated: append with Frame line (unchanged logic, now gets frame_no robustly) =====
+def update_detection_file(angle, crop_index, chip_middle, frame_no, time_offset=0.0, request=None, reader=None):
+    # The user's request (circuit or manual parts) and the OCR reader are shared by all crops
+    parts_list, source_desc = request if request is not None else load_request()
+    if reader is None:
+        reader = easyocr.Reader(['en'], gpu=False)
 
     # OCR and best-match against KNOWN_PARTS (as before)
-    reader = easyocr.Reader(['en'], gpu=False)
     raw_text, _ = run_ocr_once(reader, FINAL_OCR_OUTPUT)
     best_part, score = best_part_match(raw_text)
 
@@ -245,6 +259,8 @@ def main():
     open(DETECTION_FILE, "w").close()
 
     reader = easyocr.Reader(['en'], gpu=False)
+    request = load_request()
+    print(f"Requested Part(s) for this cycle: {request[1]}")
 
     # Write the global maximum time offset at the top of the file so the motor script
     # knows how long the belt ran during vision, even if the final frame timed out with no crops.
@@ -268,7 +284,7 @@ def main():
             cv2.imwrite(FINAL_OCR_OUTPUT, cv2.imread(best_img))
 
             t_offset = frame_time_offsets.get(frame_no, 0.0)
-            update_detection_file(angle, idx, mid, frame_no, t_offset)
+            update_detection_file(angle, idx, mid, frame_no, t_offset, request=request, reader=reader)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# Sharpness-gated capture for chipvision3.
+# After stop_motor() every frame is scored instead of waiting a fixed 500 ms:
+# - sharpness: variance of the Laplacian over the detection ROI (union of the boxes),
+#   so belt texture outside the chips does not count
+# - stability: the detection boxes moved less than STABLE_TOLERANCE (normalized)
+#   since the previous frame, for STABLE_FRAMES frames in a row
+# The first frame that is stable, whose sharpness has stopped rising (within
+# SHARPNESS_RATIO of the previous frame and of the sharpest frame seen so far) and
+# is above MIN_SHARPNESS, if set, is captured. If the belt is still wobbling
+# at CAPTURE_MAX_WAIT_SEC, the sharpest frame seen is used.
+import os
+import cv2
+import numpy as np
+
+CAPTURE_MIN_WAIT_SEC = float(os.environ.get("CAPTURE_MIN_WAIT_SEC", "0.10"))  # stop command -> belt actually decelerating
+CAPTURE_MAX_WAIT_SEC = float(os.environ.get("CAPTURE_MAX_WAIT_SEC", "0.80"))
+MIN_SHARPNESS    = float(os.environ.get("CAPTURE_MIN_SHARPNESS", "0"))      # absolute floor, 0 = relative only
+SHARPNESS_RATIO  = 0.90
+STABLE_TOLERANCE = 0.003    # max corner movement between frames (fraction of the frame)
+STABLE_FRAMES    = 2
+
+
+def roi_sharpness(frame, boxes):
+    """Laplacian variance over the union of the normalized boxes (whole frame if none)."""
+    h, w = frame.shape[:2]
+    if boxes:
+        x1 = max(0, int(min(b[0] for b in boxes) * w))
+        y1 = max(0, int(min(b[1] for b in boxes) * h))
+        x2 = min(w, int(max(b[2] for b in boxes) * w))
+        y2 = min(h, int(max(b[3] for b in boxes) * h))
+        if x2 > x1 and y2 > y1:
+            frame = frame[y1:y2, x1:x2]
+    gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY) if frame.ndim == 3 else frame
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+def box_motion(prev_boxes, boxes):
+    """Largest corner movement between two detection lists (inf if the chips differ)."""
+    if prev_boxes is None or len(prev_boxes) != len(boxes):
+        return float("inf")
+    if not boxes:
+        return 0.0
+    a = np.array(sorted(prev_boxes), dtype=np.float32)
+    b = np.array(sorted(boxes), dtype=np.float32)
+    return float(np.abs(a - b).max())
+
+
+class CaptureGate:
+    """ Picks the capture frame after a stop command. start() at stop time, then
+    update() every frame until it returns (frame, boxes)."""
+
+    def __init__(self, min_wait=CAPTURE_MIN_WAIT_SEC, max_wait=CAPTURE_MAX_WAIT_SEC,
+                 min_sharpness=MIN_SHARPNESS):
+        self.min_wait = min_wait
+        self.max_wait = max_wait
+        self.min_sharpness = min_sharpness
+        self.start(0.0)
+
+    def start(self, now):
+        self.stop_time = now
+        self.prev_boxes = None
+        self.stable_count = 0
+        self.peak = 0.0
+        self.prev_sharpness = None
+        self.best = None        # (sharpness, frame copy, boxes)
+        self.frames = 0
+        self.last_reason = None
+
+    def update(self, frame, boxes, now):
+        waited = now - self.stop_time
+        self.frames += 1
+        motion = box_motion(self.prev_boxes, boxes)
+        self.prev_boxes = list(boxes)
+        self.stable_count = self.stable_count + 1 if motion <= STABLE_TOLERANCE else 0
+        if waited < self.min_wait:
+            return None
+
+        sharpness = roi_sharpness(frame, boxes)
+        settled = (self.prev_sharpness is not None
+                   and sharpness * SHARPNESS_RATIO <= self.prev_sharpness)
+        self.prev_sharpness = sharpness
+        self.peak = max(self.peak, sharpness)
+        if self.best is None or sharpness > self.best[0]:
+            self.best = (sharpness, frame.copy(), list(boxes))
+
+        if (self.stable_count >= STABLE_FRAMES and settled
+                and sharpness >= SHARPNESS_RATIO * self.peak
+                and sharpness >= self.min_sharpness):
+            self.last_reason = f"sharp+stable after {waited:.2f}s ({self.frames} frames, sharpness {sharpness:.0f})"
+            return frame, list(boxes)
+        if waited >= self.max_wait:
+            sharpness, best_frame, best_boxes = self.best
+            self.last_reason = f"max wait {self.max_wait:.2f}s, sharpest of {self.frames} frames ({sharpness:.0f})"
+            return best_frame, best_boxes
+        return None
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# Detection pipeline for chipvision3 with a selectable display branch.
+# CHIPVISION_DISPLAY:
+#   window   (default) GStreamerDetectionApp's own branch: overlay + X window every frame
+#   headless no overlay, no window: fpsdisplaysink with a fakesink video sink
+#   preview  overlay + window at CHIPVISION_PREVIEW_FPS only (videorate drops the rest
+#            before hailooverlay/videoconvert, so detection still sees every frame)
+# pipeline_metrics logs fps, CPU and latencies every CHIPVISION_PERF_LOG_SEC so the modes can be compared:
+#   CHIPVISION_DISPLAY=window   python3 chipvision3.py   -> '📊 {"fps": ..., "cpu_pct": ...}'
+#   CHIPVISION_DISPLAY=headless python3 chipvision3.py
+# CHIPVISION_DUAL_STREAM=1 swaps the camera source for dual_stream's appsrc (lores
+# frames at the HEF input size); app.camera.snapshot() gives the full-resolution frame.
+import os
+from detection_pipeline import GStreamerDetectionApp
+import dual_stream
+
+DISPLAY_MODE = os.environ.get("CHIPVISION_DISPLAY", "window")
+PREVIEW_FPS  = int(os.environ.get("CHIPVISION_PREVIEW_FPS", "2"))
+
+# The display branch DISPLAY_PIPELINE() appends after the user callback
+DISPLAY_BRANCH_START = "hailooverlay"
+# Where SOURCE_PIPELINE() ends and the inference part begins (first match wins)
+SOURCE_END_MARKERS = ("queue name=inference_wrapper_input_q", "hailocropper", "hailonet")
+
+
+def display_branch(mode, video_sink="xvimagesink"):
+    """Pipeline tail replacing the default display branch (None = keep the default)."""
+    if mode == "headless":
+        return ("queue name=headless_q leaky=downstream max-size-buffers=3 max-size-bytes=0 max-size-time=0 ! "
+                "fpsdisplaysink name=hailo_display video-sink=fakesink sync=false "
+                "text-overlay=false signal-fps-measurements=true")
+    if mode == "preview":
+        return (f"videorate drop-only=true ! video/x-raw,framerate={PREVIEW_FPS}/1 ! "
+                "queue name=preview_q leaky=downstream max-size-buffers=1 max-size-bytes=0 max-size-time=0 ! "
+                "hailooverlay name=hailo_display_overlay ! "
+                "videoconvert name=hailo_display_videoconvert n-threads=2 qos=false ! "
+                f"fpsdisplaysink name=hailo_display video-sink={video_sink} sync=false "
+                "text-overlay=false signal-fps-measurements=true")
+    return None
+
+
+class ChipDetectionApp(GStreamerDetectionApp):
+    """ GStreamerDetectionApp with the display branch chosen by CHIPVISION_DISPLAY."""
+
+    def __init__(self, app_callback, user_data, display_mode=DISPLAY_MODE, dual=dual_stream.DUAL_STREAM):
+        self.display_mode = display_mode
+        self.dual = dual
+        self.lores_size = None
+        self.camera = None
+        super().__init__(app_callback, user_data)
+        if self.lores_size is not None:
+            self.camera = dual_stream.DualStreamCamera(self.pipeline, self.lores_size, dual_stream.MAIN_SIZE)
+
+    def _replace_source(self, pipeline):
+        for marker in SOURCE_END_MARKERS:
+            start = pipeline.find(marker)
+            if start >= 0:
+                self.lores_size = dual_stream.hef_input_size(getattr(self, "hef_path", None))
+                return dual_stream.source_pipeline(*self.lores_size) + pipeline[start:]
+        print("⚠️ Could not find the inference stage; dual stream disabled")
+        return pipeline
+
+    def get_pipeline_string(self):
+        pipeline = super().get_pipeline_string()
+        if self.dual:
+            pipeline = self._replace_source(pipeline)
+        tail = display_branch(self.display_mode, getattr(self, "video_sink", "xvimagesink"))
+        if tail is None:
+            return pipeline
+        start = pipeline.rfind(DISPLAY_BRANCH_START)
+        if start < 0:
+            print(f"⚠️ No display branch found; running '{self.display_mode}' mode with the default sink")
+            return pipeline
+        print(f"🖥️ Display mode: {self.display_mode}")
+        return pipeline[:start] + tail
+
+    def run(self):
+        if self.camera is None:
+            return super().run()
+        # Our thread feeds app_source; keep the base class from starting its own camera thread
+        self.source_type = "dual_stream"
+        self.camera.start()
+        try:
+            return super().run()
+        finally:
+            self.camera.stop()
+
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# Record and replay for chipvision3's trigger state machine (chip_trigger.py).
+# Record (live run):  CHIPVISION_RECORD=/home/scalepi/Desktop/recordings/run1 python3 chipvision3.py
+#   events.jsonl  one line per frame (probe time, frame age, Hailo detections, image file)
+#                 and per motor command (start / stop with time)
+#   frames/       the raw RGB frames as PNG, written by a background thread so the
+#                 probe is not slowed down (frames are skipped, not queued, if it falls behind)
+# Replay (offline, faster than real time):
+#   python3 chip_replay.py /home/scalepi/Desktop/recordings/run1
+#   python3 chip_replay.py run1 --calibration belt_calibration.json --no-images
+# Frames and detections go back through chip_trigger.process_frame() with a simulated
+# clock, scheduler (GLib.timeout_add) and motor. The belt itself is not simulated: frames
+# are replayed as recorded, so once the replayed motor commands diverge from the
+# recorded ones, later positions no longer follow the new commands.
+import os
+import sys
+import json
+import time
+import heapq
+import queue
+import argparse
+import threading
+import cv2
+import numpy as np
+import belt_calibration
+import chip_trigger
+
+RECORD_DIR       = os.environ.get("CHIPVISION_RECORD", "")
+EVENTS_FILE      = "events.jsonl"
+FRAMES_DIR       = "frames"
+WRITER_QUEUE_MAX = 64
+REPLAY_OUTPUT    = "/tmp/chip_replay"
+
+
+class Recorder:
+    """ Writes frames, detections and motor commands of a live run to RECORD_DIR."""
+
+    def __init__(self, path=None, save_images=True):
+        self.path = path or RECORD_DIR
+        os.makedirs(os.path.join(self.path, FRAMES_DIR), exist_ok=True)
+        self.events = open(os.path.join(self.path, EVENTS_FILE), "w")
+        self.lock = threading.Lock()
+        self.index = 0
+        self.dropped = 0
+        self.save_images = save_images
+        self.images = queue.Queue(maxsize=WRITER_QUEUE_MAX)
+        self.writer = threading.Thread(target=self._write_images, daemon=True)
+        self.writer.start()
+        print(f"⏺️ Recording to {self.path}")
+
+    def _log(self, event):
+        with self.lock:
+            self.events.write(json.dumps(event) + "\n")
+
+    def frame(self, t, frame_age, detections, frame):
+        """detections: hailo detections (or anything with get_label/get_bbox/get_confidence)."""
+        dets = []
+        for det in detections:
+            bbox = det.get_bbox()
+            dets.append({"label": det.get_label(), "confidence": round(float(det.get_confidence()), 4),
+                         "bbox": [bbox.xmin(), bbox.ymin(), bbox.xmax(), bbox.ymax()]})
+        image = None
+        if self.save_images and frame is not None:
+            image = os.path.join(FRAMES_DIR, f"{self.index:06d}.png")
+            try:
+                self.images.put_nowait((image, frame.copy()))
+            except queue.Full:
+                image = None
+                self.dropped += 1
+        self._log({"type": "frame", "i": self.index, "t": t, "age": frame_age,
+                   "shape": list(frame.shape) if frame is not None else None,
+                   "detections": dets, "image": image})
+        self.index += 1
+
+    def motor(self, command, t):
+        self._log({"type": "motor", "cmd": command, "t": t})
+
+    def _write_images(self):
+        while True:
+            item = self.images.get()
+            if item is None:
+                break
+            name, frame = item
+            cv2.imwrite(os.path.join(self.path, name), cv2.cvtColor(frame, cv2.COLOR_RGB2BGR),
+                        [cv2.IMWRITE_PNG_COMPRESSION, 1])
+
+    def close(self):
+        self.images.put(None)
+        self.writer.join(timeout=30)
+        with self.lock:
+            self.events.close()
+        print(f"⏺️ Recorded {self.index} frames to {self.path}"
+              + (f" ({self.dropped} images skipped, writer too slow)" if self.dropped else ""))
+
+
+class SimClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class SimScheduler:
+    """ GLib.timeout_add stand-in on simulated time; callbacks returning True repeat."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.pending = []
+        self.seq = 0
+
+    def schedule(self, ms, fn):
+        heapq.heappush(self.pending, (self.clock() + ms / 1000.0, self.seq, ms, fn))
+        self.seq += 1
+        return self.seq
+
+    def run_due(self, now):
+        while self.pending and self.pending[0][0] <= now:
+            due, _, ms, fn = heapq.heappop(self.pending)
+            saved, self.clock.now = self.clock.now, due
+            if fn():
+                self.schedule(ms, fn)
+            self.clock.now = saved
+
+
+def load_recording(path):
+    frames, motor = [], []
+    with open(os.path.join(path, EVENTS_FILE), "r") as f:
+        for line in f:
+            event = json.loads(line)
+            (frames if event["type"] == "frame" else motor).append(event)
+    return frames, motor
+
+
+def replay(path, out_dir=REPLAY_OUTPUT, calibration=None, load_images=True):
+    """Runs a recording through chip_trigger.process_frame(); returns a report dict.
+    calibration: belt calibration JSON to derive thresholds from (default: the live ones);
+    raises ValueError if it is given but cannot be read."""
+    if calibration and belt_calibration.load_calibration(calibration) is None:
+        raise ValueError(f"Could not read calibration file: {calibration}")
+    frames, recorded_motor = load_recording(path)
+    if not frames:
+        raise ValueError(f"No frames in {path}")
+    clock = SimClock(min([frames[0]["t"]] + [e["t"] for e in recorded_motor[:1]]))
+    scheduler = SimScheduler(clock)
+    finished = []
+    state = chip_trigger.TriggerState(
+        start_motor=lambda: None, stop_motor=lambda: None,
+        schedule=scheduler.schedule, quit=lambda: finished.append(clock()),
+        clock=clock, save_folder=out_dir,
+        thresholds=belt_calibration.load_thresholds(calibration) if calibration else chip_trigger.THRESHOLDS,
+        predictor=belt_calibration.load_predictor(calibration) if calibration else chip_trigger.PREDICTOR)
+    state.motor_start()     # chipvision3 starts the belt before the pipeline runs
+
+    blank = None
+    processed = 0
+    wall_start = time.perf_counter()
+    for event in frames:
+        clock.now = event["t"]
+        scheduler.run_due(clock.now)
+        frame = None
+        if load_images and event.get("image"):
+            image = cv2.imread(os.path.join(path, event["image"]), cv2.IMREAD_COLOR)
+            frame = cv2.cvtColor(image, cv2.COLOR_BGR2RGB) if image is not None else None
+        if frame is None:
+            shape = tuple(event.get("shape") or (720, 1280, 3))
+            if blank is None or blank.shape != shape:
+                blank = np.zeros(shape, dtype=np.uint8)
+            frame = blank
+        crop_list = [tuple(d["bbox"]) for d in event["detections"]]
+        processed += 1
+        if not chip_trigger.process_frame(state, frame, crop_list, event.get("age")):
+            break
+    wall = time.perf_counter() - wall_start
+
+    replayed_motor = [(e[0][len("motor_"):], e[1]) for e in state.events if e[0].startswith("motor_")]
+    return {
+        "frames": processed, "recorded_frames": len(frames),
+        "recorded_sec": frames[min(processed, len(frames)) - 1]["t"] - frames[0]["t"],
+        "wall_sec": wall,
+        "captures": [(t, n) for name, t, n in state.events if name == "capture"],
+        "timeouts": [t for name, t, _ in state.events if name == "timeout"],
+        "replayed_motor": replayed_motor,
+        "recorded_motor": [(e["cmd"], e["t"]) for e in recorded_motor],
+        "stops": [t for cmd, t in replayed_motor if cmd == "stop"],
+        "start_time": frames[0]["t"], "finished": bool(finished),
+    }
+
+
+def print_report(report):
+    t0 = report["start_time"]
+    print("\n=== Replay ===")
+    print(f"{report['frames']}/{report['recorded_frames']} frames, {report['recorded_sec']:.1f}s of recording "
+          f"in {report['wall_sec']:.2f}s ({report['recorded_sec'] / max(report['wall_sec'], 1e-9):.0f}x real time, "
+          f"{report['frames'] / max(report['wall_sec'], 1e-9):.0f} frames/s)")
+    print(f"Run {'finished' if report['finished'] else 'did not finish'}; "
+          f"{len(report['captures'])} captures, {len(report['timeouts'])} timeouts")
+    for stop, (capture_t, saved) in zip(report["stops"], report["captures"]):
+        print(f"  stop at {stop - t0:6.2f}s -> capture at {capture_t - t0:6.2f}s "
+              f"({1e3 * (capture_t - stop):.0f} ms), {saved} crops")
+    print("\nMotor commands (replayed vs recorded):")
+    recorded = report["recorded_motor"]
+    for i, (cmd, t) in enumerate(report["replayed_motor"]):
+        if i < len(recorded):
+            rcmd, rt = recorded[i]
+            diff = f"{1e3 * (t - rt):+.0f} ms" if rcmd == cmd else f"recorded {rcmd}"
+            print(f"  {cmd:<5} {t - t0:6.2f}s   recorded {rt - t0:6.2f}s   {diff}")
+        else:
+            print(f"  {cmd:<5} {t - t0:6.2f}s   (not in recording)")
+    for rcmd, rt in recorded[len(report["replayed_motor"]):]:
+        print(f"  -      recorded {rcmd} at {rt - t0:6.2f}s not replayed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded chipvision3 run through the trigger logic")
+    parser.add_argument("recording", help="Directory written with CHIPVISION_RECORD")
+    parser.add_argument("--out", default=REPLAY_OUTPUT, help="Where captures / latest_detection.txt go")
+    parser.add_argument("--calibration", default=None,
+                        help="Belt calibration JSON to replay with (default: the live one)")
+    parser.add_argument("--no-images", action="store_true",
+                        help="Skip loading frames (blank frames; fastest, capture gate sees no sharpness)")
+    args = parser.parse_args()
+
+    try:
+        report = replay(args.recording, args.out, args.calibration, load_images=not args.no_images)
+    except (OSError, ValueError) as e:
+        sys.exit(f"❌ {e}")
+    print_report(report)
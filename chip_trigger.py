@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# N-frame trigger state machine behind chipvision3's app_callback, free of GStreamer,
+# Hailo and GPIO so it can be driven by the live pipeline or by chip_replay.py.
+# Everything with a side effect is injected into TriggerState:
+#   start_motor / stop_motor   GPIO (or a simulated motor)
+#   schedule(ms, fn)           GLib.timeout_add (or a simulated scheduler)
+#   quit()                     stop the pipeline once the run is finished
+#   clock()                    time.time (or simulated time)
+# process_frame() is called once per frame with the RGB frame, the normalized
+# detection boxes and the frame age; it returns False when detection is done.
+import os
+import time
+import cv2
+from capture_policy import CaptureGate
+import belt_calibration
+
+SAVE_FOLDER    = "/home/scalepi/Desktop/savephototest"
+DETECTION_FILE = "latest_detection.txt"
+
+# EXACT timing per your clarification:
+PAUSE_SEC = 1.0     # pause after Frame 1
+NUDGE_SEC = 1.5     # motor run between Frame 1 and Frame 2
+TIMEOUT_SETTLE_MS = 500
+
+# Trigger band / capture zone / blind period / timeout: derived from belt_calibration.json
+# when present (CHIPVISION_CALIBRATE=1 to measure), otherwise the hand-tuned values
+THRESHOLDS = belt_calibration.load_thresholds()
+# With a calibration file, trigger on the predicted rest position (LATENCY_COMPENSATION=0 to disable)
+PREDICTOR = belt_calibration.load_predictor()
+
+
+class TriggerState:
+    """ State for the N-frame flow plus the injected motor / scheduler / clock."""
+
+    def __init__(self, start_motor, stop_motor, schedule, quit, clock=time.time,
+                 save_folder=SAVE_FOLDER, thresholds=THRESHOLDS, predictor=PREDICTOR):
+        self._start_motor = start_motor
+        self._stop_motor = stop_motor
+        self.schedule = schedule
+        self.quit = quit
+        self.clock = clock
+        self.save_folder = save_folder
+        self.thresholds = thresholds
+        self.predictor = predictor
+        # state for N-frame flow
+        self.current_frame = 1
+        self.state = "WAITING_FOR_TRIGGER"
+        self.stop_detection = False
+        self.motor_start_time = 0.0
+        self.time_offset = 0.0
+        self.capture_gate = CaptureGate()
+        self.calibrator = None  # BeltCalibrator during a calibration run
+        self.camera = None      # DualStreamCamera when CHIPVISION_DUAL_STREAM=1
+        self.recorder = None    # chip_replay.Recorder when CHIPVISION_RECORD is set
+        self.events = []        # (event, time, detail) for replay reports
+
+    def motor_start(self):
+        self._start_motor()
+        self._motor_event("start")
+
+    def motor_stop(self):
+        self._stop_motor()
+        self._motor_event("stop")
+
+    def _motor_event(self, command):
+        now = self.clock()
+        self.events.append(("motor_" + command, now, None))
+        if self.recorder is not None:
+            self.recorder.motor(command, now)
+
+    @property
+    def detection_file(self):
+        return os.path.join(self.save_folder, DETECTION_FILE)
+
+
+# --- Save Full Frame + Crop Indexed ---
+def save_full_and_crop(frame, bbox, idx, suffix="", folder=SAVE_FOLDER):
+    os.makedirs(folder, exist_ok=True)
+    full_path = os.path.join(folder, f"chip{suffix}.png")
+    cv2.imwrite(full_path, cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+
+    x1, y1, x2, y2 = bbox
+    h, w, _ = frame.shape
+    if x2 <= 1.0 and y2 <= 1.0:
+        xi1, yi1 = int(x1 * w), int(y1 * h)
+        xi2, yi2 = int(x2 * w), int(y2 * h)
+    else:
+        xi1, yi1, xi2, yi2 = map(int, (x1, y1, x2, y2))
+    xi1, yi1 = max(0, xi1), max(0, yi1)
+    xi2, yi2 = min(w, xi2), min(h, yi2)
+
+    cropped_path = (os.path.join(folder, f"chip_cropped_{suffix}_{idx}.png")
+                    if suffix else os.path.join(folder, f"chip_cropped_{idx}.png"))
+    crop = cv2.cvtColor(frame[yi1:yi2, xi1:xi2], cv2.COLOR_RGB2BGR)
+    cv2.imwrite(cropped_path, crop)
+    return full_path, cropped_path
+
+
+def process_frame(user_data: TriggerState, frame, crop_list, frame_age=None, probe_start=None):
+    """One frame through the trigger logic. crop_list: [(x1, y1, x2, y2)] normalized.
+    Returns False once detection is finished (the probe should be removed)."""
+    now = user_data.clock()
+    probe_start = probe_start if probe_start is not None else now
+    thresholds, predictor = user_data.thresholds, user_data.predictor
+    if predictor is not None:
+        predictor.observe(frame_age)
+
+    # ---------- Calibration run: measure belt motion instead of capturing ----------
+    if user_data.calibrator is not None:
+        if user_data.calibrator.update(crop_list, now, frame_age=frame_age):
+            user_data.stop_detection = True
+            user_data.quit()
+            return False
+        return True
+
+    # ---------- N-Chip Dynamic Trigger ----------
+    if user_data.state == "WAITING_FOR_TRIGGER":
+        elapsed = now - user_data.motor_start_time
+
+        trigger_stop = False
+        is_timeout = False
+
+        if user_data.current_frame == 1:
+            # First chip: wait indefinitely for a chip to cross the trigger line
+            if predictor is not None:
+                trigger_stop = any(predictor.should_stop(y1, frame_age, thresholds.zone, True)
+                                   for (_, y1, _, _) in crop_list)
+            else:
+                trigger_stop = any(y1 > thresholds.first_trigger_y for (_, y1, _, _) in crop_list)
+        else:
+            # Other chips: blind period while the last chip clears the band, then look for sweet spot
+            if elapsed > thresholds.blind_sec:
+                if predictor is not None:
+                    trigger_stop = any(predictor.should_stop(y1, frame_age, thresholds.zone, False)
+                                       for (_, y1, _, _) in crop_list)
+                else:
+                    low, high = thresholds.band
+                    trigger_stop = any(low < y1 < high for (_, y1, _, _) in crop_list)
+                if not trigger_stop and elapsed > thresholds.timeout_sec:
+                    is_timeout = True
+
+        if trigger_stop:
+            if user_data.current_frame > 1:
+                user_data.time_offset += elapsed
+            print(f"✅ [Frame {user_data.current_frame}] Triggering motor stop! Time offset: {user_data.time_offset:.2f}s")
+            user_data.motor_stop()
+            if predictor is not None:
+                predictor.observe_actuation(user_data.clock() - probe_start)
+                age_ms = f"{1e3 * frame_age:.0f} ms" if frame_age is not None else "unknown"
+                print(f"   frame age {age_ms}, predicted rest y1 "
+                      + ", ".join(f"{predictor.rest_position(y1, frame_age):.3f}" for (_, y1, _, _) in crop_list))
+            user_data.state = "STOPPING_FOR_CAPTURE"
+            user_data.capture_gate.start(user_data.clock())
+
+        elif is_timeout:
+            user_data.time_offset += elapsed
+            print(f" [Frame {user_data.current_frame}] Timeout! No additional chip seen within {thresholds.timeout_sec:.1f}s.")
+            user_data.motor_stop()
+            user_data.events.append(("timeout", now, None))
+            user_data.state = "STOPPING_FOR_TIMEOUT"
+            def _ready_timeout():
+                user_data.state = "READY_TO_TIMEOUT"
+                return False
+            user_data.schedule(TIMEOUT_SETTLE_MS, _ready_timeout)
+
+        return True
+
+    if user_data.state == "STOPPING_FOR_CAPTURE":
+        # Belt is spinning down: capture the first sharp, stable frame (or the sharpest by the max wait)
+        chosen = user_data.capture_gate.update(frame, crop_list, now)
+        if chosen is None:
+            return True
+        frame, crop_list = chosen
+        print(f"🎯 [Frame {user_data.current_frame}] Capture: {user_data.capture_gate.last_reason}")
+        user_data.state = "READY_TO_CAPTURE"
+
+    if user_data.state == "STOPPING_FOR_TIMEOUT":
+        # Motor is spinning down, wait for timeout to change state
+        return True
+
+    if user_data.state == "READY_TO_CAPTURE":
+        # Dual stream: detections came from the lores frame, crops come from full resolution
+        if user_data.camera is not None:
+            full_res = user_data.camera.snapshot()
+            if full_res is not None:
+                frame = full_res
+        mode = "w" if user_data.current_frame == 1 else "a"
+        saved = 0
+        os.makedirs(user_data.save_folder, exist_ok=True)
+        with open(user_data.detection_file, mode) as f:
+            f.write(f"FRAME={user_data.current_frame}\n")
+            if user_data.current_frame > 1:
+                f.write(f"Time_Offset: {user_data.time_offset:.2f}\n")
+
+            saved_any = False
+            for i, (x1, y1, x2, y2) in enumerate(crop_list, start=1):
+                if y1 < thresholds.zone[0] or y1 > thresholds.zone[1]:
+                    print(f"ℹ️ Ignoring chip at y1={y1:.2f} (Outside capture zone)")
+                    continue
+                print(f"📸 Saving Crop {i} (Frame {user_data.current_frame})")
+                suffix = str(user_data.current_frame) if user_data.current_frame > 1 else ""
+                full, crop = save_full_and_crop(frame, (x1, y1, x2, y2), i, suffix=suffix,
+                                                folder=user_data.save_folder)
+                f.write(f"Cropped Photo Location: {full},{crop}\n")
+                f.write(f"Coordinates of the Detection Box: ({x1}, {y1}) -> ({x2}, {y2})\n\n")
+                saved_any = True
+                saved += 1
+
+            if not saved_any:
+                print(f"⚠️ Frame {user_data.current_frame} saved, but no chips were in the sweet spot!")
+                f.write("No detections found\n\n")
+        user_data.events.append(("capture", now, saved))
+
+        user_data.current_frame += 1
+        user_data.state = "PAUSED_NUDGING"
+
+        def _start_nudge():
+            print("▶️ Restarting motor for next chip...")
+            user_data.motor_start_time = user_data.clock()
+            user_data.motor_start()
+            user_data.state = "WAITING_FOR_TRIGGER"
+            return False
+
+        print(f"⏸️ Pausing {PAUSE_SEC:.1f}s before moving belt...")
+        user_data.schedule(int(PAUSE_SEC * 1000), _start_nudge)
+        return True
+
+    if user_data.state == "READY_TO_TIMEOUT":
+        with open(user_data.detection_file, "a") as f:
+            f.write(f"FRAME={user_data.current_frame}\n")
+            f.write(f"Time_Offset: {user_data.time_offset:.2f}\n")
+            print("ℹ️ Saving final full frame before shutdown.")
+            suffix = str(user_data.current_frame)
+            full_path = os.path.join(user_data.save_folder, f"chip{suffix}.png")
+            cv2.imwrite(full_path, cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+            f.write("No detections found\n\n")
+
+        user_data.stop_detection = True
+        user_data.quit()
+        return False
+
+    # Otherwise keep streaming
+    return True
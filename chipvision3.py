@@ -8,11 +8,16 @@ import gi
 gi.require_version('Gst', '1.0')
 from gi.repository import Gst, GLib
 import numpy as np
-import cv2
 import hailo
 from hailo_rpi_common import get_caps_from_pad, app_callback_class
-from detection_pipeline import GStreamerDetectionApp
+from chip_pipeline import ChipDetectionApp, DISPLAY_MODE
+from pipeline_metrics import PipelineMetrics
 import time
+import csv
+from collections import deque
+import belt_calibration
+import chip_trigger
+import chip_replay
 
 # --- Motor GPIO Setup (gpiod 2.x API) ---
 import gpiod
@@ -69,12 +74,15 @@ HAILO_VENV_PATH = "/home/scalepi/hailo-rpi5-examples/venv_hailo_rpi_examples/bin
 SAVE_FOLDER      = "/home/scalepi/Desktop/savephototest"
 DETECTION_FILE   = os.path.join(SAVE_FOLDER, "latest_detection.txt")
 
-# Two-frame support (no pipeline restart)
+# Two-frame support (no pipeline restart): trigger state machine, timing and
+# thresholds live in chip_trigger.py so chip_replay.py can run them offline
 
+# Per-buffer timing (PTS vs pipeline clock), written on shutdown
+FRAME_TIMING_FILE = os.path.join(SAVE_FOLDER, "frame_timing.csv")
+FRAME_TIMING_MAX  = 20000
 
-# EXACT timing per your clarification:
-PAUSE_SEC = 1.0     # pause after Frame 1
-NUDGE_SEC = 1.5     # motor run between Frame 1 and Frame 2
+# Per-detection prints slow the probe down; metrics go to pipeline_metrics instead
+VERBOSE = os.environ.get("CHIPVISION_VERBOSE", "0") == "1"
 
 # --- Environment Activation Function ---
 def activate_hailo_env():
@@ -100,17 +108,44 @@ def activate_hailo_env():
 os.chdir("/home/scalepi/hailo-rpi5-examples")
 
 # --- Callback Class for Detection ---
-class UserAppCallback(app_callback_class):
+class UserAppCallback(app_callback_class, chip_trigger.TriggerState):
     def __init__(self, pipeline, main_loop):
-        super().__init__()
+        app_callback_class.__init__(self)
+        chip_trigger.TriggerState.__init__(
+            self, start_motor, stop_motor,
+            schedule=GLib.timeout_add,
+            quit=lambda: GLib.idle_add(_stop_and_quit_async, self),
+            save_folder=SAVE_FOLDER)
         self.pipeline = pipeline
         self.main_loop = main_loop
-        # state for N-frame flow
-        self.current_frame = 1
-        self.state = "WAITING_FOR_TRIGGER"
-        self.stop_detection = False
-        self.motor_start_time = 0.0
-        self.time_offset = 0.0
+        if belt_calibration.CALIBRATE:
+            self.calibrator = belt_calibration.BeltCalibrator(start_motor, stop_motor)
+        self.recorder = chip_replay.Recorder() if chip_replay.RECORD_DIR else None
+        self.frame_timing = deque(maxlen=FRAME_TIMING_MAX)   # (pts_sec, running_sec, wall, age_sec)
+        self.metrics = PipelineMetrics(label=DISPLAY_MODE)
+
+# --- Frame age: pipeline clock now minus the buffer's capture timestamp ---
+def buffer_age(pad, buf):
+    """(pts, running time now, age) in seconds, or None before the pipeline has a clock."""
+    if buf.pts == Gst.CLOCK_TIME_NONE:
+        return None
+    element = pad.get_parent_element()
+    clock = element.get_clock() if element is not None else None
+    if clock is None:
+        return None
+    running = clock.get_time() - element.get_base_time()
+    return buf.pts / Gst.SECOND, running / Gst.SECOND, (running - buf.pts) / Gst.SECOND
+
+def save_frame_timing(user_data):
+    if not user_data.frame_timing:
+        return
+    with open(FRAME_TIMING_FILE, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["pts_sec", "running_sec", "wall_time", "age_sec"])
+        writer.writerows(user_data.frame_timing)
+    ages = sorted(row[3] for row in user_data.frame_timing)
+    print(f"⏱️ Frame age at probe: median {1e3 * ages[len(ages) // 2]:.0f} ms, "
+          f"p95 {1e3 * ages[int(len(ages) * 0.95)]:.0f} ms ({len(ages)} frames) -> {FRAME_TIMING_FILE}")
 
 # --- Extract Raw Frame Utility ---
 def extract_raw_frame(buffer, width, height):
@@ -123,28 +158,6 @@ def extract_raw_frame(buffer, width, height):
     finally:
         buffer.unmap(mi)
 
-# --- Save Full Frame + Crop Indexed ---
-def save_full_and_crop(frame, bbox, idx, suffix=""):
-    os.makedirs(SAVE_FOLDER, exist_ok=True)
-    full_path = os.path.join(SAVE_FOLDER, f"chip{suffix}.png")
-    cv2.imwrite(full_path, cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
-
-    x1, y1, x2, y2 = bbox
-    h, w, _ = frame.shape
-    if x2 <= 1.0 and y2 <= 1.0:
-        xi1, yi1 = int(x1 * w), int(y1 * h)
-        xi2, yi2 = int(x2 * w), int(y2 * h)
-    else:
-        xi1, yi1, xi2, yi2 = map(int, (x1, y1, x2, y2))
-    xi1, yi1 = max(0, xi1), max(0, yi1)
-    xi2, yi2 = min(w, xi2), min(h, yi2)
-
-    cropped_path = (os.path.join(SAVE_FOLDER, f"chip_cropped_{suffix}_{idx}.png")
-                    if suffix else os.path.join(SAVE_FOLDER, f"chip_cropped_{idx}.png"))
-    crop = cv2.cvtColor(frame[yi1:yi2, xi1:xi2], cv2.COLOR_RGB2BGR)
-    cv2.imwrite(cropped_path, crop)
-    return full_path, cropped_path
-
 # --- Stop pipeline and quit main loop (run on main thread) ---
 def _stop_and_quit_async(user_data: UserAppCallback):
     try:
@@ -164,6 +177,12 @@ def app_callback(pad, info, user_data: UserAppCallback):
     if not buf or user_data.stop_detection:
         return Gst.PadProbeReturn.REMOVE if user_data.stop_detection else Gst.PadProbeReturn.OK
 
+    probe_start = time.time()
+    timing = buffer_age(pad, buf)
+    frame_age = timing[2] if timing else None
+    if timing:
+        user_data.frame_timing.append((timing[0], timing[1], probe_start, frame_age))
+
     fmt, w, h = get_caps_from_pad(pad)
     if not (fmt and w and h):
         return Gst.PadProbeReturn.OK
@@ -173,6 +192,7 @@ def app_callback(pad, info, user_data: UserAppCallback):
         return Gst.PadProbeReturn.OK
 
     detections = hailo.get_roi_from_buffer(buf).get_objects_typed(hailo.HAILO_DETECTION)
+    user_data.metrics.frame(timing[0] if timing else None, frame_age, len(detections))
 
     crop_list = []
     for det in detections:
@@ -181,108 +201,18 @@ def app_callback(pad, info, user_data: UserAppCallback):
         confidence = det.get_confidence()
         x1, y1     = bbox.xmin(), bbox.ymin()
         x2, y2     = bbox.xmax(), bbox.ymax()
-        print(f"Detection - Label: {label}, "
-              f"BBox: ({x1:.2f}, {y1:.2f}) -> ({x2:.2f}, {y2:.2f}), "
-              f"Confidence: {confidence:.2f}")
+        if VERBOSE:
+            print(f"Detection - Label: {label}, "
+                  f"BBox: ({x1:.2f}, {y1:.2f}) -> ({x2:.2f}, {y2:.2f}), "
+                  f"Confidence: {confidence:.2f}")
         crop_list.append((x1, y1, x2, y2))
 
-    # ---------- N-Chip Dynamic Trigger ----------
-    if user_data.state == "WAITING_FOR_TRIGGER":
-        elapsed = time.time() - user_data.motor_start_time
-        
-        trigger_stop = False
-        is_timeout = False
-
-        if user_data.current_frame == 1:
-            # First chip: wait indefinitely for a chip to cross y1 > 0.40
-            trigger_stop = any(y1 > 0.40 for (_, y1, _, _) in crop_list)
-        else:
-            # Other chips: Wait 0.5s before checking, then look for sweet spot
-            if elapsed > 0.5:
-                trigger_stop = any(0.38 < y1 < 0.45 for (_, y1, _, _) in crop_list)
-                if not trigger_stop and elapsed > 2.5:
-                    is_timeout = True
-        
-        if trigger_stop:
-            if user_data.current_frame > 1:
-                user_data.time_offset += elapsed
-            print(f"✅ [Frame {user_data.current_frame}] Triggering motor stop! Time offset: {user_data.time_offset:.2f}s")
-            stop_motor()
-            user_data.state = "STOPPING_FOR_CAPTURE"
-            def _ready_capture():
-                user_data.state = "READY_TO_CAPTURE"
-                return False
-            GLib.timeout_add(500, _ready_capture)
-
-        elif is_timeout:
-            user_data.time_offset += elapsed
-            print(f" [Frame {user_data.current_frame}] Timeout! No additional chip seen within 3.0s.")
-            stop_motor()
-            user_data.state = "STOPPING_FOR_TIMEOUT"
-            def _ready_timeout():
-                user_data.state = "READY_TO_TIMEOUT"
-                return False
-            GLib.timeout_add(500, _ready_timeout)
-
-        return Gst.PadProbeReturn.OK
-
-    if user_data.state in ["STOPPING_FOR_CAPTURE", "STOPPING_FOR_TIMEOUT"]:
-        # Motor is spinning down, wait for timeout to change state
-        return Gst.PadProbeReturn.OK
-
-    if user_data.state == "READY_TO_CAPTURE":
-        mode = "w" if user_data.current_frame == 1 else "a"
-        with open(DETECTION_FILE, mode) as f:
-            f.write(f"FRAME={user_data.current_frame}\n")
-            if user_data.current_frame > 1:
-                f.write(f"Time_Offset: {user_data.time_offset:.2f}\n")
-            
-            saved_any = False
-            for i, (x1, y1, x2, y2) in enumerate(crop_list, start=1):
-                if y1 < 0.35 or y1 > 0.55:
-                    print(f"ℹ️ Ignoring chip at y1={y1:.2f} (Outside capture zone)")
-                    continue
-                print(f"📸 Saving Crop {i} (Frame {user_data.current_frame})")
-                suffix = str(user_data.current_frame) if user_data.current_frame > 1 else ""
-                full, crop = save_full_and_crop(frame, (x1, y1, x2, y2), i, suffix=suffix)
-                f.write(f"Cropped Photo Location: {full},{crop}\n")
-                f.write(f"Coordinates of the Detection Box: ({x1}, {y1}) -> ({x2}, {y2})\n\n")
-                saved_any = True
-            
-            if not saved_any:
-                print(f"⚠️ Frame {user_data.current_frame} saved, but no chips were in the sweet spot!")
-                f.write("No detections found\n\n")
-
-        user_data.current_frame += 1
-        user_data.state = "PAUSED_NUDGING"
-        
-        def _start_nudge():
-            print(f"▶️ Restarting motor for next chip...")
-            user_data.motor_start_time = time.time()
-            start_motor()
-            user_data.state = "WAITING_FOR_TRIGGER"
-            return False
-
-        print(f"⏸️ Pausing {PAUSE_SEC:.1f}s before moving belt...")
-        GLib.timeout_add(int(PAUSE_SEC * 1000), _start_nudge)
-        return Gst.PadProbeReturn.OK
-
-    if user_data.state == "READY_TO_TIMEOUT":
-        with open(DETECTION_FILE, "a") as f:
-            f.write(f"FRAME={user_data.current_frame}\n")
-            f.write(f"Time_Offset: {user_data.time_offset:.2f}\n")
-            print("ℹ️ Saving final full frame before shutdown.")
-            suffix = str(user_data.current_frame)
-            full_path = os.path.join(SAVE_FOLDER, f"chip{suffix}.png")
-            cv2.imwrite(full_path, cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
-            f.write("No detections found\n\n")
-
-        user_data.stop_detection = True
-        GLib.idle_add(_stop_and_quit_async, user_data)
-        return Gst.PadProbeReturn.REMOVE
+    if user_data.recorder is not None:
+        user_data.recorder.frame(probe_start, frame_age, detections, frame)
 
-    # Otherwise keep streaming
-    return Gst.PadProbeReturn.OK
+    keep = chip_trigger.process_frame(user_data, frame, crop_list, frame_age, probe_start)
+    user_data.metrics.probe_done(time.time() - probe_start)
+    return Gst.PadProbeReturn.OK if keep else Gst.PadProbeReturn.REMOVE
 
 # --- Main Execution ---
 def stop_pipeline_safe(pipeline, main_loop):
@@ -352,9 +282,10 @@ if __name__ == "__main__":
     #setup
     dummy = Gst.Pipeline.new("dummy-pipeline")
     user_data = UserAppCallback(dummy, None)
-    app = GStreamerDetectionApp(app_callback, user_data)
+    app = ChipDetectionApp(app_callback, user_data)
     user_data.pipeline = app.pipeline
     user_data.main_loop = app.loop
+    user_data.camera = app.camera
 
     def _on_bus_message(bus, message, loop):
         t = message.type
@@ -377,8 +308,15 @@ if __name__ == "__main__":
     bus.connect("message", _on_bus_message, app.loop)
 
     try:
-        start_motor()
-        print(">>> Running chip detection pipeline...")
+        print(f"📐 Trigger thresholds ({chip_trigger.THRESHOLDS.describe()})")
+        if chip_trigger.PREDICTOR is not None:
+            print(f"📐 Latency compensation on: velocity {chip_trigger.PREDICTOR.velocity:.3f}/s, "
+                  f"stop distance {chip_trigger.PREDICTOR.stop_distance:.3f}")
+        user_data.motor_start()
+        user_data.metrics.attach(app.pipeline)
+        user_data.metrics.start()
+        print(">>> Running chip detection pipeline..." if user_data.calibrator is None
+              else ">>> Calibrating belt motion (keep chips on the belt)...")
         app.run()
     except KeyboardInterrupt:
         print("🛑 AI detection interrupted.")
@@ -388,4 +326,9 @@ if __name__ == "__main__":
         stop_motor()
         release_gpio()
         stop_pipeline_safe(user_data.pipeline, user_data.main_loop)
+        save_frame_timing(user_data)
+        user_data.metrics.log()
+        user_data.metrics.close()
+        if user_data.recorder is not None:
+            user_data.recorder.close()
         print("🧹 Cleanup done.")
\ No newline at end of file
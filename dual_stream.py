@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# Dual-stream camera for chipvision3 (CHIPVISION_DUAL_STREAM=1).
+# Picamera2 runs one configuration with two ISP outputs of the same field of view:
+#   lores: the HEF input size, pushed into the pipeline's appsrc for Hailo + trigger logic
+#   main:  full sensor resolution, copied out only when snapshot() is asked for
+# Crops are taken from the main frame by the normalized detection bbox, so OCR gets
+# every pixel while the detector runs at its native size.
+# Buffer PTS is the running time at which the sensor captured the frame
+# (SensorTimestamp), so frame ages from chipvision3.buffer_age() stay meaningful.
+import os
+import time
+import threading
+import cv2
+import numpy as np
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst
+
+DUAL_STREAM  = os.environ.get("CHIPVISION_DUAL_STREAM", "0") == "1"
+LORES_SIZE   = os.environ.get("DUAL_LORES_SIZE", "")      # "640x640"; default: HEF input size
+MAIN_SIZE    = os.environ.get("DUAL_MAIN_SIZE", "")       # default: full sensor resolution
+FRAME_RATE   = int(os.environ.get("DUAL_FRAME_RATE", "30"))
+DEFAULT_LORES_SIZE = (640, 640)
+SNAPSHOT_TIMEOUT_SEC = 1.0
+APPSRC_NAME  = "app_source"
+
+
+def _parse_size(text):
+    w, h = text.lower().split("x")
+    return int(w), int(h)
+
+
+def hef_input_size(hef_path):
+    """(width, height) of the HEF's input layer, or the default if hailo_platform is missing."""
+    if LORES_SIZE:
+        return _parse_size(LORES_SIZE)
+    try:
+        from hailo_platform import HEF
+        h, w, _ = HEF(hef_path).get_input_vstream_infos()[0].shape
+        return w, h
+    except Exception as e:
+        print(f"⚠️ Could not read HEF input size ({e}); using {DEFAULT_LORES_SIZE[0]}x{DEFAULT_LORES_SIZE[1]}")
+        return DEFAULT_LORES_SIZE
+
+
+def source_pipeline(width, height, frame_rate=FRAME_RATE):
+    """appsrc replacing the app's camera source; lores frames arrive already at model size."""
+    return (f"appsrc name={APPSRC_NAME} is-live=true format=time do-timestamp=false "
+            f'caps="video/x-raw,format=RGB,width={width},height={height},'
+            f'framerate={frame_rate}/1,pixel-aspect-ratio=1/1" ! '
+            "queue name=dual_source_q leaky=downstream max-size-buffers=3 max-size-bytes=0 max-size-time=0 ! ")
+
+
+class DualStreamCamera:
+    """ Picamera2 lores -> appsrc thread, plus on-demand full-resolution snapshots (RGB)."""
+
+    def __init__(self, pipeline, lores_size, main_size=None, frame_rate=FRAME_RATE):
+        self.pipeline = pipeline
+        self.lores_size = lores_size
+        self.main_size = _parse_size(main_size) if isinstance(main_size, str) and main_size else main_size
+        self.frame_rate = frame_rate
+        self.running = False
+        self.thread = None
+        self.want_main = threading.Event()
+        self.main_ready = threading.Event()
+        self.main_frame = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+
+    def snapshot(self, timeout=SNAPSHOT_TIMEOUT_SEC):
+        """Full-resolution RGB copy of the next camera frame, or None on timeout."""
+        self.main_ready.clear()
+        self.want_main.set()
+        if not self.main_ready.wait(timeout):
+            self.want_main.clear()
+            print("⚠️ No full-resolution frame from the camera; using the inference frame")
+            return None
+        return self.main_frame
+
+    def _running_time(self):
+        clock = self.pipeline.get_clock()
+        if clock is None:
+            return None
+        return clock.get_time() - self.pipeline.get_base_time()
+
+    def _run(self):
+        from picamera2 import Picamera2
+        appsrc = self.pipeline.get_by_name(APPSRC_NAME)
+        frame_duration = Gst.SECOND // self.frame_rate
+        with Picamera2() as picam2:
+            main_size = self.main_size or picam2.sensor_resolution
+            config = picam2.create_video_configuration(
+                main={"size": main_size, "format": "RGB888"},
+                lores={"size": self.lores_size, "format": "RGB888"},
+                controls={"FrameRate": self.frame_rate},
+                buffer_count=4)
+            picam2.configure(config)
+            picam2.start()
+            print(f"📷 Dual stream: lores {self.lores_size[0]}x{self.lores_size[1]} -> Hailo, "
+                  f"main {main_size[0]}x{main_size[1]} on trigger")
+            frame_count = 0
+            while self.running:
+                request = picam2.capture_request()
+                try:
+                    # Picamera2 "RGB888" is BGR in memory
+                    lores = cv2.cvtColor(request.make_array("lores"), cv2.COLOR_BGR2RGB)
+                    if self.want_main.is_set():
+                        self.main_frame = cv2.cvtColor(request.make_array("main"), cv2.COLOR_BGR2RGB)
+                        self.want_main.clear()
+                        self.main_ready.set()
+                    sensor_ns = request.get_metadata().get("SensorTimestamp")
+                finally:
+                    request.release()
+
+                buffer = Gst.Buffer.new_wrapped(np.ascontiguousarray(lores).tobytes())
+                running = self._running_time()
+                if running is not None and sensor_ns is not None:
+                    age = max(0, time.monotonic_ns() - sensor_ns)
+                    buffer.pts = max(0, running - age)
+                else:
+                    buffer.pts = frame_count * frame_duration
+                buffer.duration = frame_duration
+                ret = appsrc.emit("push-buffer", buffer)
+                if ret == Gst.FlowReturn.FLUSHING:
+                    continue    # pipeline not PLAYING yet, or shutting down
+                if ret != Gst.FlowReturn.OK:
+                    print(f"⚠️ appsrc refused a frame ({ret}); stopping the camera thread")
+                    break
+                frame_count += 1
+            picam2.stop()
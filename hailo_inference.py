@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# Chip detection on still images, without the GStreamer pipeline.
+# - HailoDetector: loads the HEF once on the Hailo-8L (HailoRT VStreams, NMS on chip)
+# - OnnxDetector:  ONNX Runtime on the CPU with the same model exported to ONNX,
+#                  for machines without a Hailo device
+# Both take RGB numpy images (one frame or a batch) and return, per image, a list of
+# Detection objects with the same accessors the pipeline's hailo.HailoDetection has
+# (get_label(), get_bbox().xmin()..., get_confidence()), so app_callback-style code and
+# the saved-frame tools share one format. Boxes are normalized to the input frame.
+# Usage:
+#   python3 hailo_inference.py savephototest/chip.png
+#   python3 hailo_inference.py --benchmark --batch 8 savephototest/chip.png
+#   DETECTOR_BACKEND=onnx python3 hailo_inference.py frame1.png frame2.png
+import os
+import sys
+import json
+import time
+import argparse
+import cv2
+import numpy as np
+
+RESOURCES_DIR = "/home/scalepi/hailo-rpi5-examples/resources"
+HEF_PATH      = os.path.join(RESOURCES_DIR, "NewFinal.hef")
+ONNX_PATH     = os.environ.get("DETECTOR_ONNX", os.path.join(RESOURCES_DIR, "NewFinal.onnx"))
+LABELS_JSON   = os.path.join(RESOURCES_DIR, "Final.json")
+
+DETECTOR_BACKEND     = os.environ.get("DETECTOR_BACKEND", "auto")   # auto | hailo | onnx
+DETECTION_THRESHOLD  = 0.5      # overridden by "detection_threshold" in the labels JSON
+NMS_IOU              = 0.45
+MAX_BOXES            = 100
+
+
+class BBox:
+    """ Normalized box with hailo.HailoBBox's accessors."""
+    __slots__ = ("_xmin", "_ymin", "_xmax", "_ymax")
+
+    def __init__(self, xmin, ymin, xmax, ymax):
+        self._xmin, self._ymin, self._xmax, self._ymax = (float(np.clip(v, 0.0, 1.0)) for v in (xmin, ymin, xmax, ymax))
+
+    def xmin(self):
+        return self._xmin
+
+    def ymin(self):
+        return self._ymin
+
+    def xmax(self):
+        return self._xmax
+
+    def ymax(self):
+        return self._ymax
+
+    def width(self):
+        return self._xmax - self._xmin
+
+    def height(self):
+        return self._ymax - self._ymin
+
+
+class Detection:
+    """ One detection with hailo.HailoDetection's accessors."""
+    __slots__ = ("label", "class_id", "bbox", "confidence")
+
+    def __init__(self, label, class_id, bbox, confidence):
+        self.label = label
+        self.class_id = class_id
+        self.bbox = bbox
+        self.confidence = float(confidence)
+
+    def get_label(self):
+        return self.label
+
+    def get_class_id(self):
+        return self.class_id
+
+    def get_bbox(self):
+        return self.bbox
+
+    def get_confidence(self):
+        return self.confidence
+
+    def to_dict(self):
+        b = self.bbox
+        return {"label": self.label, "class_id": self.class_id, "confidence": round(self.confidence, 4),
+                "bbox": [round(b.xmin(), 5), round(b.ymin(), 5), round(b.xmax(), 5), round(b.ymax(), 5)]}
+
+    def __repr__(self):
+        b = self.bbox
+        return (f"Detection({self.label}, ({b.xmin():.2f}, {b.ymin():.2f}) -> "
+                f"({b.xmax():.2f}, {b.ymax():.2f}), {self.confidence:.2f})")
+
+
+def load_labels(path=LABELS_JSON):
+    """(labels, detection threshold). Hailo label files start with 'unlabeled' (class id 0)."""
+    try:
+        with open(path, "r") as f:
+            config = json.load(f)
+        return config.get("labels", []), config.get("detection_threshold", DETECTION_THRESHOLD)
+    except FileNotFoundError:
+        print(f"⚠️ Labels file not found: {path}; using class numbers")
+        return [], DETECTION_THRESHOLD
+
+
+def label_for(labels, class_id):
+    return labels[class_id] if 0 <= class_id < len(labels) else str(class_id)
+
+
+def as_batch(images):
+    """One HxWx3 image, a list of them or an NxHxWx3 array -> list of images."""
+    if isinstance(images, np.ndarray) and images.ndim == 3:
+        return [images]
+    return list(images)
+
+
+def resize_batch(images, width, height):
+    """Stretch to the network input like the pipeline's inference wrapper (no letterbox),
+    so normalized outputs map straight back to the original frames."""
+    return np.stack([cv2.resize(img, (width, height), interpolation=cv2.INTER_LINEAR) for img in images])
+
+
+class HailoDetector:
+    """ HEF on the Hailo device; NMS runs on chip, outputs come back per class."""
+    backend = "hailo"
+
+    def __init__(self, hef_path=HEF_PATH, labels_json=LABELS_JSON):
+        from contextlib import ExitStack
+        from hailo_platform import (HEF, VDevice, HailoStreamInterface, ConfigureParams, InferVStreams,
+                                    InputVStreamParams, OutputVStreamParams, FormatType)
+        self.path = hef_path
+        self.labels, self.threshold = load_labels(labels_json)
+        self.hef = HEF(hef_path)
+        self.device = VDevice()
+        params = ConfigureParams.create_from_hef(self.hef, interface=HailoStreamInterface.PCIe)
+        self.network_group = self.device.configure(self.hef, params)[0]
+        self.input_info = self.hef.get_input_vstream_infos()[0]
+        self.output_info = self.hef.get_output_vstream_infos()[0]
+        self.height, self.width, _ = self.input_info.shape
+        # Keep the vstreams and the activation open for the detector's lifetime
+        self._stack = ExitStack()
+        self.pipeline = self._stack.enter_context(InferVStreams(
+            self.network_group,
+            InputVStreamParams.make(self.network_group, format_type=FormatType.UINT8),
+            OutputVStreamParams.make(self.network_group, format_type=FormatType.FLOAT32)))
+        self._stack.enter_context(self.network_group.activate(self.network_group.create_params()))
+
+    def close(self):
+        self._stack.close()
+        self.device.release()
+
+    def detect(self, images):
+        frames = as_batch(images)
+        batch = resize_batch(frames, self.width, self.height).astype(np.uint8)
+        outputs = self.pipeline.infer({self.input_info.name: batch})[self.output_info.name]
+        offset = 1 if self.labels and self.labels[0] == "unlabeled" else 0
+        results = []
+        for per_class in outputs:
+            dets = []
+            # NMS by class: one (n, 5) array per class of [ymin, xmin, ymax, xmax, score]
+            for class_index, boxes in enumerate(per_class):
+                for ymin, xmin, ymax, xmax, score in np.asarray(boxes).reshape(-1, 5):
+                    if score >= self.threshold:
+                        class_id = class_index + offset
+                        dets.append(Detection(label_for(self.labels, class_id), class_id,
+                                              BBox(xmin, ymin, xmax, ymax), score))
+            results.append(sorted(dets, key=lambda d: d.confidence, reverse=True)[:MAX_BOXES])
+        return results
+
+
+class OnnxDetector:
+    """ CPU stand-in: the YOLOv8 ONNX export ((1, 4 + classes, anchors) output, cx/cy/w/h
+    in input pixels) with confidence filtering and NMS done here."""
+    backend = "onnx"
+
+    def __init__(self, onnx_path=ONNX_PATH, labels_json=LABELS_JSON):
+        import onnxruntime as ort
+        self.path = onnx_path
+        self.labels, self.threshold = load_labels(labels_json)
+        self.session = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+        self.input = self.session.get_inputs()[0]
+        _, _, self.height, self.width = self.input.shape
+
+    def close(self):
+        self.session = None
+
+    def detect(self, images):
+        frames = as_batch(images)
+        batch = resize_batch(frames, self.width, self.height).astype(np.float32) / 255.0
+        batch = np.ascontiguousarray(batch.transpose(0, 3, 1, 2))
+        # Exports often have a fixed batch of 1
+        if self.input.shape[0] == 1 and len(frames) > 1:
+            outputs = np.concatenate([self.session.run(None, {self.input.name: b[None]})[0] for b in batch])
+        else:
+            outputs = self.session.run(None, {self.input.name: batch})[0]
+        offset = 1 if self.labels and self.labels[0] == "unlabeled" else 0
+        return [self._decode(out, offset) for out in outputs]
+
+    def _decode(self, output, offset):
+        preds = output.T                                   # (anchors, 4 + classes)
+        scores = preds[:, 4:]
+        class_index = scores.argmax(axis=1)
+        confidence = scores[np.arange(len(scores)), class_index]
+        keep = confidence >= self.threshold
+        preds, class_index, confidence = preds[keep], class_index[keep], confidence[keep]
+        if not len(preds):
+            return []
+        cx, cy, w, h = preds[:, 0], preds[:, 1], preds[:, 2], preds[:, 3]
+        boxes = np.stack([cx - w / 2, cy - h / 2, w, h], axis=1)
+        # Per-class NMS, as the Hailo NMS does
+        dets = []
+        for c in np.unique(class_index):
+            idx = np.nonzero(class_index == c)[0]
+            kept = cv2.dnn.NMSBoxes(boxes[idx].tolist(), confidence[idx].tolist(), self.threshold, NMS_IOU)
+            for i in np.asarray(kept).reshape(-1):
+                x, y, bw, bh = boxes[idx[i]]
+                class_id = int(c) + offset
+                dets.append(Detection(label_for(self.labels, class_id), class_id,
+                                      BBox(x / self.width, y / self.height,
+                                           (x + bw) / self.width, (y + bh) / self.height),
+                                      confidence[idx[i]]))
+        return sorted(dets, key=lambda d: d.confidence, reverse=True)[:MAX_BOXES]
+
+
+def create_detector(backend=DETECTOR_BACKEND):
+    """Hailo when asked for or available, else the ONNX Runtime CPU stand-in."""
+    if backend in ("auto", "hailo"):
+        try:
+            return HailoDetector()
+        except Exception as e:
+            if backend == "hailo":
+                raise
+            print(f"ℹ️ Hailo unavailable ({e}); using ONNX Runtime on the CPU")
+    return OnnxDetector()
+
+
+def load_image(path):
+    """RGB frame as the pipeline sees it (saved frames are BGR on disk)."""
+    image = cv2.imread(path, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Could not load: {path}")
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+
+def benchmark(detector, images, batch_size=1, repeats=20):
+    """Latency per batch (median / p95 ms) and throughput (frames per second)."""
+    frames = as_batch(images)
+    batch = (frames * ((batch_size + len(frames) - 1) // len(frames)))[:batch_size]
+    detector.detect(batch)      # warm-up
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        detector.detect(batch)
+        times.append(time.perf_counter() - start)
+    times = np.array(times)
+    return {"backend": detector.backend, "batch": batch_size,
+            "median_ms": float(np.median(times) * 1e3), "p95_ms": float(np.percentile(times, 95) * 1e3),
+            "fps": float(batch_size / np.median(times))}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the chip detector on saved frames")
+    parser.add_argument("images", nargs="+", help="Frames (PNG/JPG)")
+    parser.add_argument("--backend", default=DETECTOR_BACKEND, choices=["auto", "hailo", "onnx"])
+    parser.add_argument("--benchmark", action="store_true", help="Measure latency / throughput")
+    parser.add_argument("--batch", type=int, default=1, help="Batch size for --benchmark")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    detector = create_detector(args.backend)
+    print(f"Backend: {detector.backend} ({detector.path})")
+    try:
+        images = [load_image(p) for p in args.images]
+        for path, dets in zip(args.images, detector.detect(images)):
+            print(f"\n{path}: {len(dets)} detections")
+            for det in dets:
+                bbox = det.get_bbox()
+                print(f"Detection - Label: {det.get_label()}, "
+                      f"BBox: ({bbox.xmin():.2f}, {bbox.ymin():.2f}) -> ({bbox.xmax():.2f}, {bbox.ymax():.2f}), "
+                      f"Confidence: {det.get_confidence():.2f}")
+        if args.benchmark:
+            for batch_size in sorted({1, args.batch}):
+                r = benchmark(detector, images, batch_size, args.repeats)
+                print(f"\n[{r['backend']}] batch {r['batch']}: median {r['median_ms']:.1f} ms, "
+                      f"p95 {r['p95_ms']:.1f} ms, {r['fps']:.1f} frames/s")
+    except ValueError as e:
+        sys.exit(f"❌ {e}")
+    finally:
+        detector.close()
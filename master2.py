@@ -3,7 +3,9 @@ import subprocess
 import sys
 import os
 import time
+import argparse
 from pathlib import Path
+import request_queue
 
 # --- Configuration: Update these paths as needed ---
 CHIP_VISION_HANDLER = "/home/scalepi/hailo-rpi5-examples/basic_pipelines/Final/chipvision3.py"
@@ -18,6 +20,9 @@ DETECTION_FILE = os.path.join(SAVE_FOLDER, "latest_detection.txt")
 # Optional: tune between-frames nudge in one place (both CV + Arm respect this via env)
 EXTRA_RUN_SEC = os.environ.get("EXTRA_RUN_SEC", "1.0")  # default 1.0 s
 
+# Daemon mode: how often to look for the next queued request
+QUEUE_POLL_SEC = 1.0
+
 # Hailo venv python (used for chipvision3 which needs hailo/gstreamer)
 # HAILO_PYTHON = "/home/scalepi/hailo-rpi5-examples/venv_hailo_rpi_examples/bin/python3"
 # Attempt to change python to 3.13.5 aka current python in venv, but fallback to "python3" if that path doesn't exist (e.g., if venv was recreated and python version changed)
@@ -30,6 +35,13 @@ def run_ui_chip_request():
         sys.exit(f"❌ UI Chip Request failed with return code {result.returncode}")
     print("✅ UI complete.")
 
+def launch_ui_stay_open():
+    """UI in the background for daemon mode; each submit is appended to the request queue."""
+    print("\n=== UI: stays open, requests are queued ===")
+    env = os.environ.copy()
+    env["UI_STAY_OPEN"] = "1"
+    return subprocess.Popen(["python3", UI_HANDLER], env=env)
+
 def run_chip_vision_handler():
     print("\n=== Vision: detection + crops (Frame 1, optional Frame 2) ===")
 
@@ -104,11 +116,8 @@ def _file_has_frames(path):
     f2 = "FRAME=2" in txt or "Frame: 2" in txt
     return True, ("Frame1+2" if (f1 and f2) else ("Frame1 only" if f1 else "no Frame markers"))
 
-def main():
-    # 1) UI request (sets chip_request_input.txt)
-    run_ui_chip_request()
-    time.sleep(0.5)
-
+def run_cycle():
+    """Stages 2-5 for the request in CHIP_REQUEST / chip_request_input.txt."""
     # 2) Vision (creates latest_detection.txt with FRAME sections + chip.png/chip2.png)
     run_chip_vision_handler()
     time.sleep(0.5)
@@ -130,11 +139,62 @@ def main():
     # 5) ARM picks: does Frame 1 → 1s nudge → Frame 2 (internally), then drop-offs
     run_arm_handler()
 
+def main():
+    # 1) UI request (sets chip_request_input.txt)
+    run_ui_chip_request()
+    time.sleep(0.5)
+
+    run_cycle()
+
     print("\n>>> Master: All processes completed successfully.")
 
+def daemon():
+    """Runs queued requests back to back until the UI is closed and the queue is empty."""
+    ui = launch_ui_stay_open()
+    waiting = False
+    try:
+        while True:
+            request = request_queue.claim()
+            if request is None:
+                if ui.poll() is not None:
+                    print("UI closed and request queue empty. Exiting daemon.")
+                    break
+                if not waiting:
+                    print("\n⏳ Waiting for the next queued request...")
+                    waiting = True
+                time.sleep(QUEUE_POLL_SEC)
+                continue
+            waiting = False
+
+            text = request_queue.format_request(request["kind"], request["value"])
+            backlog = len(request_queue.pending()) - 1
+            print(f"\n##### Job #{request['id']}: {text} ({backlog} more queued) #####")
+            # Inherited by the stage subprocesses; beltocr2 reads it once per cycle
+            os.environ["CHIP_REQUEST"] = text
+            ok = True
+            start = time.time()
+            try:
+                run_cycle()
+            except SystemExit as e:
+                # Stage helpers sys.exit() on failure; fail this job and keep the daemon up
+                print(f"❌ Job #{request['id']} failed: {e}")
+                ok = False
+            request_queue.finish(request["id"], ok)
+            print(f">>> Master: Job #{request['id']} {'completed' if ok else 'failed'} in {time.time() - start:.1f}s.")
+    finally:
+        if ui.poll() is None:
+            ui.terminate()
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chip sorting pipeline")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Keep the UI open and run queued requests back to back")
+    args = parser.parse_args()
     try:
-        main()
+        if args.daemon:
+            daemon()
+        else:
+            main()
     except KeyboardInterrupt:
         print("\n Master process interrupted by user. Exiting.")
         sys.exit(0)
\ No newline at end of file
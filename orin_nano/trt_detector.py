@@ -0,0 +1,382 @@
+# Description:
+# Chip detection for the sorting line on the Jetson Orin Nano, with the same detection
+# interface, trigger logic and capture / crop outputs as the Hailo pipeline (chipvision3.py).
+# Approach:
+# 1. TrtDetector loads the YOLOv8 chip model exported as a TensorRT engine; OnnxDetector
+#    (ONNX Runtime on the CPU, from hailo_inference.py) is the fallback for testing.
+#    Both return hailo_inference.Detection objects (get_label(), get_bbox().xmin()..., get_confidence()).
+# 2. The camera pipeline keeps frames in NVMM from nvarguscamerasrc through scaling: nvvidconv
+#    (VIC) resizes to the engine input size, so only model-size frames are copied to the CPU.
+#    A second branch converts a full-resolution frame only when a capture asks for one.
+# 3. Each frame goes through chip_trigger.process_frame(), so the motor stops, capture gate,
+#    latest_detection.txt and chip / chip_cropped_*.png files are the same as on the Pi.
+# 4. pipeline_metrics logs fps / inference / probe time in the same JSON lines as chipvision3,
+#    and --benchmark prints the same lines as hailo_inference.py, for side-by-side numbers.
+# Usage:
+#   python3 trt_detector.py --live                                  # sorting line
+#   python3 trt_detector.py frame1.png frame2.png                   # still images
+#   python3 trt_detector.py --benchmark --batch 8 frame1.png        # same as hailo_inference.py --benchmark
+#   python3 trt_detector.py --compare frame1.png                    # every backend that loads here
+# Notes:
+# - Engine export (on the Jetson, from the same ONNX as the Hailo HEF):
+#   /usr/src/tensorrt/bin/trtexec --onnx=models/NewFinal.onnx --saveEngine=models/NewFinal.engine --fp16
+# - The Orin's CPU and GPU share DRAM: engine inputs / outputs are mapped pinned host memory,
+#   so preprocessing writes straight into what TensorRT reads (no cudaMemcpy).
+# - Passing NVMM buffers straight into TensorRT needs DeepStream (nvinfer); not done here.
+
+import os
+import sys
+import time
+import argparse
+import cv2
+import numpy as np
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst, GLib
+
+# Add parent directory to path so we can share the Pi's detector / trigger modules
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPO_DIR)
+import hailo_inference
+from hailo_inference import OnnxDetector, as_batch, load_labels
+import chip_trigger
+import chip_replay
+from pipeline_metrics import PipelineMetrics
+
+MODELS_DIR   = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+ENGINE_PATH  = os.environ.get("TRT_ENGINE", os.path.join(MODELS_DIR, "NewFinal.engine"))
+ONNX_PATH    = os.environ.get("DETECTOR_ONNX", os.path.join(MODELS_DIR, "NewFinal.onnx"))
+LABELS_JSON  = os.environ.get("DETECTOR_LABELS", os.path.join(MODELS_DIR, "Final.json"))
+SAVE_FOLDER  = os.environ.get("JETSON_SAVE_FOLDER", os.path.join(os.path.expanduser("~"), "savephototest"))
+DETECTOR_BACKEND = os.environ.get("DETECTOR_BACKEND", "auto")   # auto | tensorrt | onnx
+
+# Camera (same defaults as jetson_cv.gstreamer_pipeline)
+SENSOR_ID      = 0
+CAPTURE_WIDTH  = 1920
+CAPTURE_HEIGHT = 1080
+FRAMERATE      = 30
+FLIP_METHOD    = 2
+SNAPSHOT_TIMEOUT_SEC = 1.0
+
+MOTOR_PIN = int(os.environ.get("JETSON_MOTOR_PIN", "24"))   # BCM numbering, same header pin as the Pi
+
+
+class TrtDetector(OnnxDetector):
+    """ TensorRT engine of the YOLOv8 export; same output tensor as the ONNX model,
+    so OnnxDetector's decode (confidence filter + per-class NMS) is reused."""
+    backend = "tensorrt"
+
+    def __init__(self, engine_path=ENGINE_PATH, labels_json=LABELS_JSON):
+        import tensorrt as trt
+        import pycuda.driver as cuda
+        self.path = engine_path
+        self.labels, self.threshold = load_labels(labels_json)
+        # The primary context, pushed around every CUDA call: in --live, detect() runs on a
+        # GStreamer streaming thread, where no context is current otherwise
+        cuda.init()
+        self.ctx = cuda.Device(0).retain_primary_context()
+        self.ctx.push()
+        try:
+            self._load(trt, cuda, engine_path)
+        except Exception:
+            self.ctx.pop()
+            self.ctx.detach()
+            self.ctx = None
+            raise
+        self.ctx.pop()
+
+    def _load(self, trt, cuda, engine_path):
+        with open(engine_path, "rb") as f:
+            self.engine = trt.Runtime(trt.Logger(trt.Logger.WARNING)).deserialize_cuda_engine(f.read())
+        if self.engine is None:
+            raise ValueError(f"Could not load TensorRT engine: {engine_path}")
+        self.context = self.engine.create_execution_context()
+        self.stream = cuda.Stream()
+        self.input = self.output = None
+        for i in range(self.engine.num_io_tensors):
+            name = self.engine.get_tensor_name(i)
+            shape = tuple(self.engine.get_tensor_shape(name))
+            is_input = self.engine.get_tensor_mode(name) == trt.TensorIOMode.INPUT
+            if is_input and -1 in shape:
+                # Dynamic batch: run one frame at a time like the fixed-batch exports
+                shape = tuple(1 if d == -1 else d for d in shape)
+                self.context.set_input_shape(name, shape)
+            if not is_input:
+                shape = tuple(self.context.get_tensor_shape(name))
+            # Mapped pinned memory: the GPU reads / writes the same DRAM the CPU does;
+            # PORTABLE so it stays valid whichever thread has the context pushed
+            host = cuda.pagelocked_empty(shape, trt.nptype(self.engine.get_tensor_dtype(name)),
+                                         mem_flags=cuda.host_alloc_flags.DEVICEMAP
+                                         | cuda.host_alloc_flags.PORTABLE)
+            self.context.set_tensor_address(name, int(host.base.get_device_pointer()))
+            if is_input:
+                self.input = host
+            elif self.output is None:
+                self.output = host
+        _, _, self.height, self.width = self.input.shape
+
+    def close(self):
+        if self.ctx is None:
+            return
+        self.ctx.push()
+        try:
+            self.context = self.engine = self.stream = None
+            self.input = self.output = None
+        finally:
+            self.ctx.pop()
+            self.ctx.detach()
+            self.ctx = None
+
+    def detect(self, images):
+        offset = 1 if self.labels and self.labels[0] == "unlabeled" else 0
+        results = []
+        for frame in as_batch(images):
+            if frame.shape[:2] != (self.height, self.width):
+                frame = cv2.resize(frame, (self.width, self.height), interpolation=cv2.INTER_LINEAR)
+            # HWC uint8 RGB -> CHW 0..1 in one pass, written into the engine's input buffer
+            np.divide(frame[..., :3].transpose(2, 0, 1), 255.0, out=self.input[0], casting="unsafe")
+            self.ctx.push()
+            try:
+                if not self.context.execute_async_v3(self.stream.handle):
+                    raise RuntimeError(f"TensorRT inference failed ({self.path})")
+                self.stream.synchronize()
+            finally:
+                self.ctx.pop()
+            results.append(self._decode(np.array(self.output[0], dtype=np.float32), offset))
+        return results
+
+
+def create_detector(backend=DETECTOR_BACKEND):
+    """TensorRT when asked for or available, else ONNX Runtime on the CPU."""
+    if backend in ("auto", "tensorrt"):
+        try:
+            return TrtDetector()
+        except Exception as e:
+            if backend == "tensorrt":
+                raise
+            print(f"ℹ️ TensorRT unavailable ({e}); using ONNX Runtime on the CPU")
+    return OnnxDetector(ONNX_PATH, LABELS_JSON)
+
+
+# --- Camera: NVMM capture, VIC scaling to the model input, full resolution on demand ---
+def camera_pipeline(width, height, sensor_id=SENSOR_ID, capture_width=CAPTURE_WIDTH,
+                    capture_height=CAPTURE_HEIGHT, framerate=FRAMERATE, flip_method=FLIP_METHOD):
+    return (
+        f"nvarguscamerasrc sensor-id={sensor_id} ! "
+        f"video/x-raw(memory:NVMM), width=(int){capture_width}, height=(int){capture_height}, "
+        f"framerate=(fraction){framerate}/1, format=NV12 ! "
+        "tee name=camera_tee "
+        # Detection branch: NVMM -> model size RGBA in one VIC pass; only this size reaches the CPU
+        "camera_tee. ! queue name=detect_q leaky=downstream max-size-buffers=2 max-size-bytes=0 max-size-time=0 ! "
+        f"nvvidconv flip-method={flip_method} ! "
+        f"video/x-raw, width=(int){width}, height=(int){height}, format=(string)RGBA ! "
+        "appsink name=detect_sink emit-signals=true max-buffers=1 drop=true sync=false "
+        # Full-resolution branch: stays closed (no conversion) until snapshot() opens the valve
+        "camera_tee. ! queue name=full_q leaky=downstream max-size-buffers=2 max-size-bytes=0 max-size-time=0 ! "
+        "valve name=full_valve drop=true ! "
+        f"nvvidconv flip-method={flip_method} ! video/x-raw, format=(string)BGRx ! "
+        "appsink name=full_sink emit-signals=false max-buffers=1 drop=true sync=false"
+    )
+
+
+def sample_to_array(sample, channels=4):
+    """Copy of the sample's frame as an HxWxchannels uint8 array."""
+    buf = sample.get_buffer()
+    structure = sample.get_caps().get_structure(0)
+    width, height = structure.get_value("width"), structure.get_value("height")
+    ok, mi = buf.map(Gst.MapFlags.READ)
+    if not ok:
+        return None
+    try:
+        # nvvidconv rows can be padded: use the real stride
+        stride = len(mi.data) // height
+        rows = np.frombuffer(mi.data, dtype=np.uint8).reshape(height, stride)
+        return rows[:, :width * channels].reshape(height, width, channels).copy()
+    finally:
+        buf.unmap(mi)
+
+
+def frame_age(element, buf):
+    """(pts, age) in seconds from the pipeline clock, or (None, None)."""
+    clock = element.get_clock()
+    if clock is None or buf.pts == Gst.CLOCK_TIME_NONE:
+        return None, None
+    running = clock.get_time() - element.get_base_time()
+    return buf.pts / Gst.SECOND, (running - buf.pts) / Gst.SECOND
+
+
+class JetsonCamera:
+    """ snapshot() like dual_stream.DualStreamCamera: full-resolution RGB of the next frame."""
+
+    def __init__(self, pipeline):
+        self.valve = pipeline.get_by_name("full_valve")
+        self.sink = pipeline.get_by_name("full_sink")
+
+    def snapshot(self, timeout=SNAPSHOT_TIMEOUT_SEC):
+        while self.sink.emit("try-pull-sample", 0) is not None:
+            pass    # stale frame from a previous snapshot
+        self.valve.set_property("drop", False)
+        try:
+            sample = self.sink.emit("try-pull-sample", int(timeout * Gst.SECOND))
+        finally:
+            self.valve.set_property("drop", True)
+        if sample is None:
+            print("⚠️ No full-resolution frame from the camera; using the inference frame")
+            return None
+        frame = sample_to_array(sample)
+        return cv2.cvtColor(frame, cv2.COLOR_BGRA2RGB) if frame is not None else None
+
+
+# --- Motor (Jetson.GPIO on the same header pin as the Pi; log only without it) ---
+GPIO = None
+
+
+def setup_motor():
+    global GPIO
+    try:
+        import Jetson.GPIO
+        Jetson.GPIO.setmode(Jetson.GPIO.BCM)
+        Jetson.GPIO.setup(MOTOR_PIN, Jetson.GPIO.OUT, initial=Jetson.GPIO.LOW)
+        GPIO = Jetson.GPIO
+    except Exception as e:
+        print(f"⚠️ Jetson.GPIO unavailable ({e}); motor commands are only logged")
+
+
+def start_motor():
+    if GPIO is not None:
+        GPIO.output(MOTOR_PIN, GPIO.HIGH)
+    print("✅ Motor started.")
+
+
+def stop_motor():
+    if GPIO is not None:
+        GPIO.output(MOTOR_PIN, GPIO.LOW)
+    print("✅ Motor stopped.")
+
+
+def run_live(detector):
+    Gst.init(None)
+    setup_motor()
+    pipeline = Gst.parse_launch(camera_pipeline(detector.width, detector.height))
+    loop = GLib.MainLoop()
+    state = chip_trigger.TriggerState(start_motor, stop_motor, schedule=GLib.timeout_add,
+                                      quit=lambda: GLib.idle_add(loop.quit), save_folder=SAVE_FOLDER)
+    state.camera = JetsonCamera(pipeline)
+    state.recorder = chip_replay.Recorder() if chip_replay.RECORD_DIR else None
+    metrics = PipelineMetrics(label=detector.backend)
+
+    def on_sample(sink):
+        sample = sink.emit("pull-sample")
+        if sample is None or state.stop_detection:
+            return Gst.FlowReturn.OK
+        probe_start = time.time()
+        pts, age = frame_age(sink, sample.get_buffer())
+        rgba = sample_to_array(sample)
+        if rgba is None:
+            return Gst.FlowReturn.OK
+        frame = np.ascontiguousarray(rgba[..., :3])
+        start = time.perf_counter()
+        detections = detector.detect(frame)[0]
+        metrics.inference_done(time.perf_counter() - start)
+        metrics.frame(pts, age, len(detections))
+        crop_list = [(d.get_bbox().xmin(), d.get_bbox().ymin(), d.get_bbox().xmax(), d.get_bbox().ymax())
+                     for d in detections]
+        if state.recorder is not None:
+            state.recorder.frame(probe_start, age, detections, frame)
+        chip_trigger.process_frame(state, frame, crop_list, age, probe_start)
+        metrics.probe_done(time.time() - probe_start)
+        return Gst.FlowReturn.OK
+
+    def on_bus_message(bus, message):
+        if message.type == Gst.MessageType.ERROR:
+            err, _ = message.parse_error()
+            print(f"⚠️ Pipeline error: {err}")
+            loop.quit()
+        elif message.type == Gst.MessageType.EOS:
+            print("⏹️ Pipeline EOS — shutting down.")
+            loop.quit()
+        return True
+
+    pipeline.get_by_name("detect_sink").connect("new-sample", on_sample)
+    bus = pipeline.get_bus()
+    bus.add_signal_watch()
+    bus.connect("message", on_bus_message)
+
+    metrics.attach(pipeline, measure_inference=False)
+    try:
+        pipeline.set_state(Gst.State.PLAYING)
+        metrics.start()
+        state.motor_start()
+        print(f">>> Running chip detection on the Jetson ({detector.backend}, {detector.path})...")
+        loop.run()
+    except KeyboardInterrupt:
+        print("🛑 AI detection interrupted.")
+    finally:
+        stop_motor()
+        pipeline.set_state(Gst.State.NULL)
+        metrics.log()
+        metrics.close()
+        if state.recorder is not None:
+            state.recorder.close()
+        if GPIO is not None:
+            GPIO.cleanup()
+        print("🧹 Cleanup done.")
+
+
+def print_benchmark(r):
+    print(f"[{r['backend']}] batch {r['batch']}: median {r['median_ms']:.1f} ms, "
+          f"p95 {r['p95_ms']:.1f} ms, {r['fps']:.1f} frames/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chip detection on the Jetson (TensorRT / ONNX Runtime)")
+    parser.add_argument("images", nargs="*", help="Frames (PNG/JPG)")
+    parser.add_argument("--backend", default=DETECTOR_BACKEND, choices=["auto", "tensorrt", "onnx"])
+    parser.add_argument("--live", action="store_true", help="Run the sorting line from the CSI camera")
+    parser.add_argument("--benchmark", action="store_true", help="Measure latency / throughput")
+    parser.add_argument("--compare", action="store_true", help="Benchmark every backend that loads here")
+    parser.add_argument("--batch", type=int, default=1, help="Batch size for --benchmark")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.compare:
+        if not args.images:
+            sys.exit("❌ --compare needs at least one frame")
+        images = [hailo_inference.load_image(p) for p in args.images]
+        for backend in ("tensorrt", "onnx"):
+            try:
+                detector = create_detector(backend)
+            except Exception as e:
+                print(f"[{backend}] not available: {e}")
+                continue
+            try:
+                for batch_size in sorted({1, args.batch}):
+                    print_benchmark(hailo_inference.benchmark(detector, images, batch_size, args.repeats))
+            finally:
+                detector.close()
+        sys.exit(0)
+
+    detector = create_detector(args.backend)
+    print(f"Backend: {detector.backend} ({detector.path})")
+    try:
+        if args.live:
+            run_live(detector)
+            sys.exit(0)
+        if not args.images:
+            sys.exit("❌ Give frames to run on, or --live")
+        images = [hailo_inference.load_image(p) for p in args.images]
+        for path, dets in zip(args.images, detector.detect(images)):
+            print(f"\n{path}: {len(dets)} detections")
+            for det in dets:
+                bbox = det.get_bbox()
+                print(f"Detection - Label: {det.get_label()}, "
+                      f"BBox: ({bbox.xmin():.2f}, {bbox.ymin():.2f}) -> ({bbox.xmax():.2f}, {bbox.ymax():.2f}), "
+                      f"Confidence: {det.get_confidence():.2f}")
+        if args.benchmark:
+            print()
+            for batch_size in sorted({1, args.batch}):
+                print_benchmark(hailo_inference.benchmark(detector, images, batch_size, args.repeats))
+    except ValueError as e:
+        sys.exit(f"❌ {e}")
+    finally:
+        detector.close()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# Catalog-constrained decoding of spoken part numbers.
+# Vosk (grammar = letters, digits, "circuit") returns n-best alternatives per utterance
+# (SetMaxAlternatives). Instead of concatenating the top tokens, every alternative
+# extends a small beam of hypotheses that walk a prefix trie of the catalog
+# (Parts.txt known parts + aliases, Circuits.txt parts and circuit names).
+# - committed(): as soon as nearly all beam mass sits under one catalog entry,
+#   that entry is returned, so "s n 7 4 1 8" is already enough for SN74185AN.
+# - best(): top complete match with confidence, falling back to edit distance
+#   against the catalog when the spoken string left the trie.
+import os
+import re
+import math
+from typing import Dict, List, Optional, Tuple
+
+SAVE_FOLDER  = "/home/scalepi/Desktop/savephototest"
+PART_FILE    = os.path.join(SAVE_FOLDER, "Parts.txt")
+CIRCUIT_FILE = os.path.join(SAVE_FOLDER, "Circuits.txt")
+
+BEAM_WIDTH = 8
+OFF_TRIE_PENALTY = math.log(0.05)   # log-prob charged when a hypothesis leaves the catalog
+COMMIT_CONFIDENCE = 0.90            # beam mass needed under one entry to commit early
+MIN_CONFIDENCE = 0.50               # below this best() is reported as no match
+
+DIGIT_MAP = {
+    "zero": "0", "one": "1", "two": "2", "three": "3", "four": "4",
+    "five": "5", "six": "6", "seven": "7", "eight": "8", "nine": "9",
+}
+
+
+def normalize(name: str) -> str:
+    """Catalog key: upper-case letters and digits only ('SN7414N ' -> 'SN7414N')."""
+    return re.sub(r"[^A-Z0-9]", "", name.upper())
+
+
+def tokens_to_symbols(text: str) -> str:
+    """Vosk tokens -> characters ('s n seven four' -> 'SN74', 'circuit one' -> 'CIRCUIT1')."""
+    out = ""
+    for tok in text.lower().split():
+        if tok in DIGIT_MAP:
+            out += DIGIT_MAP[tok]
+        elif tok in ("next", "stop"):
+            continue
+        else:
+            out += normalize(tok)
+    return out
+
+
+def load_catalog(part_file: str = PART_FILE, circuit_file: str = CIRCUIT_FILE,
+                 extra_names: Optional[List[str]] = None) -> Dict[str, str]:
+    """Spoken key -> canonical name, from Parts.txt ([KNOWN_PARTS] and [ALIASES]),
+    the part names and circuit names in Circuits.txt, and extra_names."""
+    catalog: Dict[str, str] = {}
+
+    def add(key, canonical):
+        key = normalize(key)
+        if key:
+            catalog.setdefault(key, canonical)
+
+    try:
+        section = None
+        with open(part_file, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                if line.startswith("["):
+                    section = line.strip("[]").upper()
+                elif section == "KNOWN_PARTS":
+                    name = re.sub(r"^\d+\.\s*", "", line).strip()
+                    add(name, name)
+                elif section == "ALIASES" and "=" in line:
+                    name, aliases = line.split("=", 1)
+                    name = name.strip()
+                    add(name, name)
+                    for alias in aliases.split(","):
+                        add(alias, name)
+    except FileNotFoundError:
+        print(f"⚠️ Parts file not found: {part_file}")
+
+    try:
+        with open(circuit_file, "r") as f:
+            text = f.read()
+        for circuit_name, block in re.findall(r"(CIRCUIT\d+)\s*=\s*\[([^\]]+)\]", text, flags=re.IGNORECASE):
+            add(circuit_name, circuit_name.upper())
+            for part_name in re.findall(r"\d+\.\s*([^()]+)\(", block):
+                add(part_name, part_name.strip().upper())
+    except FileNotFoundError:
+        print(f"⚠️ Circuits file not found: {circuit_file}")
+
+    for name in extra_names or []:
+        add(name, name)
+    return catalog
+
+
+class TrieNode:
+    __slots__ = ("children", "names", "terminal")
+
+    def __init__(self):
+        self.children: Dict[str, "TrieNode"] = {}
+        self.names = set()      # canonical names reachable from this prefix
+        self.terminal = None    # canonical name if a key ends here
+
+
+class PartTrie:
+    """ Character trie over the catalog keys."""
+
+    def __init__(self, catalog: Dict[str, str]):
+        self.catalog = catalog
+        self.root = TrieNode()
+        for key, canonical in catalog.items():
+            node = self.root
+            node.names.add(canonical)
+            for ch in key:
+                node = node.children.setdefault(ch, TrieNode())
+                node.names.add(canonical)
+            node.terminal = canonical
+
+    def walk(self, node: Optional[TrieNode], symbols: str) -> Optional[TrieNode]:
+        for ch in symbols:
+            if node is None:
+                return None
+            node = node.children.get(ch)
+        return node
+
+
+def edit_distance(a: str, b: str) -> int:
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+
+class PartDecoder:
+    """ Beam search over recognizer alternatives, constrained by the catalog trie.
+    One decoder instance per spoken part; call reset() between parts."""
+
+    def __init__(self, catalog: Dict[str, str]):
+        self.trie = PartTrie(catalog)
+        self.reset()
+
+    def reset(self):
+        # hypothesis: (log-prob, symbols, trie node or None once off the catalog)
+        self.beam: List[Tuple[float, str, Optional[TrieNode]]] = [(0.0, "", self.trie.root)]
+
+    def is_empty(self) -> bool:
+        return self.beam == [(0.0, "", self.trie.root)]
+
+    def add_alternatives(self, alternatives: List[Tuple[str, float]]):
+        """Extends the beam with one recognizer result: [(text, confidence), ...].
+        Confidences are Vosk lattice scores; a softmax turns them into probabilities."""
+        alts = [(tokens_to_symbols(text), conf) for text, conf in alternatives]
+        alts = [(sym, conf) for sym, conf in alts if sym]
+        if not alts:
+            return
+        top = max(conf for _, conf in alts)
+        norm = math.log(sum(math.exp(conf - top) for _, conf in alts))
+        # Same symbols from different token splits are one alternative
+        merged: Dict[str, float] = {}
+        for sym, conf in alts:
+            logp = conf - top - norm
+            merged[sym] = logp if sym not in merged else _logaddexp(merged[sym], logp)
+
+        candidates: Dict[str, Tuple[float, str, Optional[TrieNode]]] = {}
+        for score, symbols, node in self.beam:
+            for sym, logp in merged.items():
+                new_symbols = symbols + sym
+                new_node = self.trie.walk(node, sym)
+                new_score = score + logp
+                if node is not None and new_node is None:
+                    new_score += OFF_TRIE_PENALTY
+                old = candidates.get(new_symbols)
+                if old is not None:
+                    new_score = _logaddexp(old[0], new_score)
+                candidates[new_symbols] = (new_score, new_symbols, new_node)
+        self.beam = sorted(candidates.values(), key=lambda h: h[0], reverse=True)[:BEAM_WIDTH]
+
+    def _posterior(self):
+        top = max(h[0] for h in self.beam)
+        weights = [math.exp(h[0] - top) for h in self.beam]
+        total = sum(weights)
+        return [(w / total, symbols, node) for w, (_, symbols, node) in zip(weights, self.beam)]
+
+    def committed(self) -> Optional[Tuple[str, float]]:
+        """(name, confidence) once one catalog entry holds COMMIT_CONFIDENCE of the beam
+        and the spoken prefix can only complete to it; otherwise None."""
+        if self.is_empty():
+            return None
+        mass: Dict[str, float] = {}
+        for p, _, node in self._posterior():
+            if node is not None and len(node.names) == 1:
+                name = next(iter(node.names))
+                mass[name] = mass.get(name, 0.0) + p
+        if not mass:
+            return None
+        name, confidence = max(mass.items(), key=lambda kv: kv[1])
+        return (name, confidence) if confidence >= COMMIT_CONFIDENCE else None
+
+    def best(self) -> Tuple[Optional[str], float]:
+        """Top catalog match for what was said so far, with confidence.
+        Complete keys win; otherwise the most likely spoken string is matched by edit distance."""
+        if self.is_empty():
+            return None, 0.0
+        posterior = self._posterior()
+        mass: Dict[str, float] = {}
+        for p, _, node in posterior:
+            if node is not None and node.terminal is not None:
+                mass[node.terminal] = mass.get(node.terminal, 0.0) + p
+            elif node is not None and len(node.names) == 1:
+                name = next(iter(node.names))
+                mass[name] = mass.get(name, 0.0) + p
+        if mass:
+            name, confidence = max(mass.items(), key=lambda kv: kv[1])
+            if confidence >= MIN_CONFIDENCE:
+                return name, confidence
+        # Fuzzy fallback on the most likely string
+        _, symbols, _ = max(posterior, key=lambda h: h[0])
+        best_name, best_score = None, 0.0
+        for key, canonical in self.trie.catalog.items():
+            score = 1.0 - edit_distance(symbols, key) / max(len(symbols), len(key))
+            if score > best_score:
+                best_name, best_score = canonical, score
+        if best_score < MIN_CONFIDENCE:
+            return None, best_score
+        return best_name, best_score
+
+    def spoken(self) -> str:
+        """Most likely raw symbol string (what combine_letters_and_digits used to return)."""
+        return max(self.beam, key=lambda h: h[0])[1]
+
+
+def _logaddexp(a: float, b: float) -> float:
+    hi, lo = max(a, b), min(a, b)
+    return hi + math.log1p(math.exp(lo - hi))
+
+
+if __name__ == "__main__":
+    catalog = load_catalog()
+    print(f"{len(catalog)} catalog keys: {', '.join(sorted(catalog))}")
+    decoder = PartDecoder(catalog)
+    while True:
+        try:
+            text = input("tokens> ").strip()
+        except EOFError:
+            break
+        if not text:
+            print(f"best: {decoder.best()}")
+            decoder.reset()
+            continue
+        decoder.add_alternatives([(text, 0.0)])
+        print(f"committed: {decoder.committed()}  best: {decoder.best()}  spoken: {decoder.spoken()}")
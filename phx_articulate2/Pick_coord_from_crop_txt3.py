@@ -1,10 +1,12 @@
-import kinematics as kin
-import numpy as np
+import ik_table
+import motion_planner
+import pick_sequencer
+import pick_trace
 import phx
 import time
 import math
+import functools
 import re
-import gpiod
 import os
 # Turn on Phoenix system and initialize resting position
 phx.turn_on()
@@ -15,12 +17,20 @@ phx.rest_position()
 # led_line = chip.get_line(LED_PIN)
 # led_line.request(consumer="LED", type=gpiod.LINE_REQ_DIR_OUT)
 LED_PIN = 24
+led_request = None
 
-chip = gpiod.Chip('/dev/gpiochip0')
-led_request = chip.request_lines(
-    config={LED_PIN: gpiod.LineSettings(direction=gpiod.line.Direction.OUTPUT)},
-    consumer="arm_belt_run"
-)
+
+def get_led_request():
+    """Claim the belt GPIO line on first use so the arm can run without it (e.g. DXL_BACKEND=sim)."""
+    global led_request
+    if led_request is None:
+        import gpiod
+        chip = gpiod.Chip('/dev/gpiochip0')
+        led_request = chip.request_lines(
+            config={LED_PIN: gpiod.LineSettings(direction=gpiod.line.Direction.OUTPUT)},
+            consumer="arm_belt_run"
+        )
+    return led_request
 
 # def transform_coordinates(x1, y1):
 
@@ -40,9 +50,70 @@ def transform_coordinates(x1, y1):
     y2 = y1 * (y_right - y_left) + y_left - 5.15        # the extra .15 is an additional shift from guess and check
     return x2, y2
 
+def pickup_coordinates(x_raw, y_raw, time_offset):
+    """Arm coordinates of a detection, including the belt travel of trailing chips."""
+    tx, ty = transform_coordinates(x_raw, y_raw)
+    # Apply physical offset for trailing chips based on dynamic time delta
+    # Belt speed is ~18.5 cm / 8.25 s = 2.242 cm/s
+    # Since y-axis is parallel to the belt and upstream is +y, we add the offset
+    y_offset_cm = time_offset * 2.242
+    ty += y_offset_cm
+    return tx, ty
+
+
+DETECTION_FILE = "/home/scalepi/Desktop/savephototest/latest_detection.txt"
 CIRCUITS_FILE = "/home/scalepi/Desktop/savephototest/Circuits.txt"
 PARTS_FILE = "/home/scalepi/Desktop/savephototest/Parts.txt"  # NOTE File still needs to be fully updated/created
 
+# Fixed poses reused on every pick
+PARK_POSITION = [10, 0, 25]
+NONE_BIN = (18.5, -20, 17, -90)      # x, y, z, desired_angle of the None bin
+PICK_THETA0_4 = -90
+DROP_THETA0_4 = -95
+DROP_APPROACH_Z = 15      # move_to_position_with_z_adjustment() default
+DROP_CLEAR_Z = 4.25       # vertical lift after releasing a chip
+DROP_LIFT_STEP = 0.25     # lifts are lowered in these steps where a bin is out of reach
+
+# "blended": via-points blend, gripper feedback, no rest pose between chips
+# "legacy": full stop at every waypoint, fixed sleeps (kept for cycle-time comparison)
+ARM_MOTION_MODE = os.environ.get("ARM_MOTION_MODE", "blended")
+DESCENT_SPEED = 40          # slower final descent onto the chip
+GRIP_CLOSE_TIMEOUT = 3.5    # upper bound for the jaws to clamp (was a fixed sleep)
+GRIP_OPEN_TIMEOUT = 2.5     # upper bound for the jaws to release (was a fixed sleep)
+
+# Joint solutions for the pick plane; drop and park poses are added as they are known
+IK_TABLE = ik_table.IKTable.load_or_build()
+IK_TABLE.precompute(PARK_POSITION, 0)
+
+
+def plan_joints(pos, theta0_4):
+    """Joints go_to_pos() will use (table, then exact IK), or None if the pose is out of reach
+    (IK gives NaN angles there, also for precomputed table poses)."""
+    joints = IK_TABLE.lookup(pos, theta0_4)
+    if joints is None:
+        joints = ik_table.solve_joints(pos, theta0_4)
+    if any(math.isnan(j) for j in joints):
+        return None
+    return joints
+
+
+@functools.lru_cache(maxsize=None)
+def drop_lift(x, y, z, wanted):
+    """Highest lift above a bin, up to wanted, the arm can reach there (0 if none)."""
+    lift = wanted
+    while lift > 0 and plan_joints([x, y, z + lift], DROP_THETA0_4) is None:
+        lift -= DROP_LIFT_STEP
+    return max(lift, 0)
+
+
+def precompute_drop_pose(x, y, z):
+    """Cache IK for every pose drop_off_blended() visits at this bin."""
+    for dz in (drop_lift(x, y, z, DROP_APPROACH_Z), 0, drop_lift(x, y, z, DROP_CLEAR_Z)):
+        IK_TABLE.precompute([x, y, z + dz], DROP_THETA0_4)
+
+
+precompute_drop_pose(*NONE_BIN[:3])
+
 
 def load_circuits(filepath):
     """ Parse Circuits.txt into a dict:
@@ -61,6 +132,7 @@ def load_circuits(filepath):
             part = part_name.strip()
             nums = [float(n) for n in coord_str.split(',')]
             circuits[key][part] = (nums[0], nums[1], nums[2], nums[3])
+            precompute_drop_pose(nums[0], nums[1], nums[2])
 
     return circuits
 
@@ -124,16 +196,20 @@ def readjusted_gripper_angle(current_angle, additional_angle):
 
 
 def go_to_pos(pickup_pos, theta0_4):
-    try:
-        joint_angles = kin.ik3(pickup_pos)
-        theta4 = kin.calculate_theta_4(joint_angles, theta0_4)
-        phx.set_wrist(theta4)
-        phx.set_wse(joint_angles)
-        phx.wait_for_completion()
-    except ValueError as e:
-        print(f"Error: Unable to reach position {pickup_pos}.")
-        print(f"Details: {e}")
-        return False
+    with pick_trace.span("move", "go_to_pos", {"pos": list(map(float, pickup_pos))}):
+        try:
+            # Table lookup for the pick plane and cached poses, exact IK otherwise
+            with pick_trace.span("ik", "ik"):
+                joints = IK_TABLE.lookup(pickup_pos, theta0_4)
+                if joints is None:
+                    joints = ik_table.solve_joints(pickup_pos, theta0_4)
+            phx.set_wrist(joints[3])
+            phx.set_wse(joints[:3])
+            phx.wait_for_completion()
+        except ValueError as e:
+            print(f"Error: Unable to reach position {pickup_pos}.")
+            print(f"Details: {e}")
+            return False
     return True
 
 
@@ -150,16 +226,20 @@ def set_gripper(position):
     phx.set_gripper(position)
 
 
+def pick_gripper_position(x, y, additional_angle=0):
+    """Gripper rotation (motor steps) for picking a chip at (x, y) rotated by additional_angle."""
+    angle = calculate_angle(x, y)
+    print(f"The gripper is adjusted to angle: {angle:.2f} degrees")
+    adjusted_angle = adjust_gripper_angle(angle, additional_angle)
+    return angle_to_motor_steps(adjusted_angle)
+
+
 def pick_up(x, y, additional_angle=0):
     pickup_pos = [x, y, 20.75]      # 21 is the height of the pickuintermedp position  
-    theta0_4 = -90
+    theta0_4 = PICK_THETA0_4
     print(f"Picking up from position: {pickup_pos}, with theta4: {theta0_4}")
 
-    angle = calculate_angle(x, y)
-    print(f"The gripper is adjusted to angle: {angle:.2f} degrees")
-    adjusted_angle = adjust_gripper_angle(angle, additional_angle)
-    gripper_position = angle_to_motor_steps(adjusted_angle)
-    set_gripper(gripper_position)
+    set_gripper(pick_gripper_position(x, y, additional_angle))
 
 # check arm position here for esp capture
     
@@ -167,22 +247,39 @@ def pick_up(x, y, additional_angle=0):
     intermediate_pos = [x, y, 23]
     go_to_pos(intermediate_pos, theta0_4)
 
-    time.sleep(1.5) # freeze to check positioning
+    pick_trace.sleep(1.5, "freeze to check positioning")
     print(str(intermediate_pos), str(theta0_4))
 # adjust intermediate_pos so that arm is hanging straight down at z=23
-    phx.all_motors.set_moving_speed(40)         # Set motion speed slower for more gracefull decent. 
+    phx.set_speed(DESCENT_SPEED)         # Set motion speed slower for more gracefull decent. 
     # print(f"Moving down to pick up position (X, Y, 20).")
     go_to_pos(pickup_pos, theta0_4)
     phx.close_gripper2()
     # print("Gripper closed at the pick up location.")
-    time.sleep(3.5)
+    pick_trace.sleep(3.5, "gripper close")
     # restore motion speed back to default
-    phx.all_motors.set_moving_speed(phx.default_speed)
+    phx.set_speed(phx.default_speed)
     # print(f"Moving up to clear the area: (X, Y, 25).")
     intermediate_pos[2] = 25
     go_to_pos(intermediate_pos, theta0_4)
-    fixed_position = [10, 0, 25]
-    go_to_pos(fixed_position, 0)
+    go_to_pos(PARK_POSITION, 0)
+
+
+def pick_up_blended(x, y, additional_angle=0):
+    """pick_up() without full stops: approach blends into the descent, the jaws
+    report when they are clamped, and lift blends through park into the next move."""
+    print(f"Picking up from position: {[x, y, 20.75]}, with theta4: {PICK_THETA0_4}")
+    set_gripper(pick_gripper_position(x, y, additional_angle))
+
+    motion_planner.move_through([
+        motion_planner.Waypoint([x, y, 23], PICK_THETA0_4),
+        motion_planner.Waypoint([x, y, 20.75], PICK_THETA0_4, blend=False, speed=DESCENT_SPEED),
+    ], IK_TABLE)
+    phx.close_gripper2()
+    print(f"Gripper closed after {phx.wait_for_gripper2(GRIP_CLOSE_TIMEOUT):.2f}s")
+    motion_planner.move_through([
+        motion_planner.Waypoint([x, y, 25], PICK_THETA0_4),
+        motion_planner.Waypoint(PARK_POSITION, 0),
+    ], IK_TABLE, stop_at_end=False)
 
 
 def calculate_drop_bearing(x, y):
@@ -204,8 +301,29 @@ def drop_off(x, y, z, desired_angle):
     6) move, open, and return home
     """
     drop_off_pos = [x, y, z]
-    theta0_4 = -95
+    theta0_4 = DROP_THETA0_4
+
+    # Steps 1-5
+    set_gripper(drop_gripper_position(x, y, desired_angle))
+
+    # Step 6: perform motion
+    print(f"Dropping off at {drop_off_pos}, base θ₀₋₄ = {theta0_4}")
+    move_to_position_with_z_adjustment(drop_off_pos, theta0_4, DROP_APPROACH_Z)
+    phx.open_gripper2()
+    print("Gripper opened at drop-off location.")
+    pick_trace.sleep(2.5, "gripper open")
+    
+    # Move vertically UP to avoid nudging chip after dropoff (relative to z)
+    go_to_pos([x, y, z + DROP_CLEAR_Z], theta0_4)
+    print("Moving to fixed position (10, 0, 25)...")
+    go_to_pos(PARK_POSITION, 0)
+
+    print("Returning to rest position...")
+    phx.rest_position()
 
+
+def drop_gripper_position(x, y, desired_angle):
+    """Gripper rotation (motor steps) for a drop at (x, y), steps 1-5 of drop_off()."""
     # Step 1: raw bearing
     raw = calculate_drop_bearing(x, y)
     print(f"Raw drop bearing: {raw:.2f}°")
@@ -225,26 +343,40 @@ def drop_off(x, y, z, desired_angle):
         new_angle = raw - delta
         print(f"x<0: new_angle = raw({raw:.2f}) + delta({delta:.2f}) = {new_angle:.2f}°")
 
-    # Step 5: normalize and set
+    # Step 5: normalize
     new_angle %= 360
     motor_pos = angle_to_motor_steps(new_angle)
     print(f"Setting gripper to {new_angle:.2f}° (motor pos {motor_pos})")
-    set_gripper(motor_pos)
-
-    # Step 6: perform motion
-    print(f"Dropping off at {drop_off_pos}, base θ₀₋₄ = {theta0_4}")
-    move_to_position_with_z_adjustment(drop_off_pos, theta0_4)
+    return motor_pos
+
+
+def drop_off_blended(x, y, z, desired_angle, last=True):
+    """drop_off() without full stops. The rest pose is only taken after the last
+    chip of a batch, otherwise the arm blends through park into the next pick."""
+    set_gripper(drop_gripper_position(x, y, desired_angle))
+    print(f"Dropping off at {[x, y, z]}, base θ₀₋₄ = {DROP_THETA0_4}")
+    # Bins near the edge of reach (the None bin) only allow a few cm of lift
+    approach_z = z + drop_lift(x, y, z, DROP_APPROACH_Z)
+    clear_z = z + drop_lift(x, y, z, DROP_CLEAR_Z)
+    motion_planner.move_through([
+        motion_planner.Waypoint([x, y, approach_z], DROP_THETA0_4),
+        motion_planner.Waypoint([x, y, z], DROP_THETA0_4, blend=False),
+    ], IK_TABLE)
     phx.open_gripper2()
-    print("Gripper opened at drop-off location.")
-    time.sleep(2.5)
-    
-    # Move vertically UP to avoid nudging chip after dropoff (relative to z)
-    go_to_pos([x, y, z + 4.25], theta0_4)
-    print("Moving to fixed position (10, 0, 25)...")intermed
-    go_to_pos([10, 0, 25], 0)
-
-    print("Returning to rest position...")
-    phx.rest_position()
+    print(f"Gripper opened after {phx.wait_for_gripper2(GRIP_OPEN_TIMEOUT):.2f}s")
+    if last:
+        motion_planner.move_through([
+            motion_planner.Waypoint([x, y, clear_z], DROP_THETA0_4),
+            motion_planner.Waypoint(PARK_POSITION, 0),
+        ], IK_TABLE)
+        print("Returning to rest position...")
+        phx.rest_position()
+    else:
+        # Empty gripper: climb back out the way we came in and blend straight into the next pick
+        waypoints = [motion_planner.Waypoint([x, y, clear_z], DROP_THETA0_4)]
+        if approach_z > clear_z:
+            waypoints.append(motion_planner.Waypoint([x, y, approach_z], DROP_THETA0_4))
+        motion_planner.move_through(waypoints, IK_TABLE, stop_at_end=False)
 
 
 
@@ -259,6 +391,8 @@ def drop_off(x, y, z, desired_angle):
 #     time.sleep(1)  # Sleep for one second
 #     led_line.release()
 def none_belt_run():
+    import gpiod
+    led_request = get_led_request()
     try:
         led_request.set_value(LED_PIN, gpiod.line.Value.ACTIVE)
         print("ON")
@@ -276,8 +410,7 @@ def none_belt_run():
 
 
 # --- Main Loop ---
-def main():
-    filename = "/home/scalepi/Desktop/savephototest/latest_detection.txt"
+def main(filename=DETECTION_FILE):
    # circuits = load_circuits(CIRCUITS_FILE)
     circuits = {}
     if os.path.exists(CIRCUITS_FILE):
@@ -321,36 +454,29 @@ def main():
         print("No detections found.")
         return
 
-
     # --- Selection Logic ---
-    for i in range(len(detections)):    # This will loop through all the detections
-
-        # Case 1: if all parts are None → just pick first (only None parts exist)
-        all_none = all(d[4] == "None" for d in detections)
-
-        if all_none:
-            chosen = detections[0]  # just pick up
-        else:
-            # Case 2: if part_name == None → use last detection with None
-            none_candidates = [d for d in detections if d[4] == "None"]
-            if none_candidates:
-                chosen = none_candidates[-1]  # last None
-            else:
-                # Case 3: otherwise, take the first with a valid part name
-                valid_candidates = [d for d in detections if d[4] != "None"]
-                chosen = valid_candidates[0]
-        # After selecting a detection, remove it from list and process next on following iteration
-        detections.remove(chosen)       
-        
-        # --- Execute chosen detection ---
+    # Chips for the None bin first, then the order with the least estimated joint travel
+    tasks = []
+    for chosen in detections:
         x_raw, y_raw, angle, part_circuit, part_name, time_offset = chosen
-        tx, ty = transform_coordinates(x_raw, y_raw)
+        tx, ty = pickup_coordinates(x_raw, y_raw, time_offset)
+        to_none_bin = part_name == "None" or part_circuit is None
+        dx, dy, dz, _ = NONE_BIN if to_none_bin else circuits[part_circuit][part_name]
+        # Legs are costed from where drop_off_blended(last=False) leaves the arm
+        tasks.append(pick_sequencer.PickTask(
+            plan_joints([tx, ty, 23], PICK_THETA0_4),
+            plan_joints([dx, dy, dz + drop_lift(dx, dy, dz, DROP_APPROACH_Z)], DROP_THETA0_4),
+            priority=0 if to_none_bin else 1,
+            payload=chosen))
+    order = pick_sequencer.plan_order(tasks, plan_joints(PARK_POSITION, 0), phx.default_speed)
+
+    cycle_times = []
+    for n, task in enumerate(order):
+        remaining = len(order) - n - 1
 
-        # Apply physical offset for trailing chips based on dynamic time delta
-        # Belt speed is ~18.5 cm / 8.25 s = 2.242 cm/s
-        # Since y-axis is parallel to the belt and upstream is +y, we add the offset
-        y_offset_cm = time_offset * 2.242
-        ty += y_offset_cm
+        # --- Execute chosen detection ---
+        x_raw, y_raw, angle, part_circuit, part_name, time_offset = task.payload
+        tx, ty = pickup_coordinates(x_raw, y_raw, time_offset)
 
         if abs(angle) < 1.0:
             pickup_offset = 0
@@ -359,23 +485,36 @@ def main():
         else:
             pickup_offset = angle
 
+        cycle_start = time.monotonic()
+        pick_trace.begin_chip(f"{n + 1} ({part_name})")
         print(f"Picking up '{part_name}' at ({tx:.2f},{ty:.2f}) with {pickup_offset:.2f}° offset")
-        pick_up(tx, ty, pickup_offset)
-        phx.rest_position_closed()
+        if ARM_MOTION_MODE == "legacy":
+            pick_up(tx, ty, pickup_offset)
+            phx.rest_position_closed()
+        else:
+            pick_up_blended(tx, ty, pickup_offset)
 
         # --- Drop-off ---
         if part_name == "None" or part_circuit is None:
-            dx, dy, dz, desired_angle = 18.5, -20, 17, -90    #raised to height of 22 for now this is supposed to be droppoff location 
+            dx, dy, dz, desired_angle = NONE_BIN    #raised to height of 22 for now this is supposed to be droppoff location 
             print("Dropping off to None Bin")
-            drop_off(dx, dy, dz, desired_angle)
         #    none_belt_run()        #commented out so we can do multiple chips
         else:
             dx, dy, dz, desired_angle = circuits[part_circuit][part_name]
             print(f"Dropping off '{part_name}' at ({dx:.2f},{dy:.2f},{dz:.2f}), CIRCUITS θ = {desired_angle:.2f}°")
+        if ARM_MOTION_MODE == "legacy":
             drop_off(dx, dy, dz, desired_angle)
-        
-        print("Remaining detections to process: ", len(detections))
+        else:
+            drop_off_blended(dx, dy, dz, desired_angle, last=remaining == 0)
+
+        pick_trace.end_chip()
+        cycle_times.append(time.monotonic() - cycle_start)
+        print(f"Chip cycle time ({ARM_MOTION_MODE}): {cycle_times[-1]:.2f}s")
+        print("Remaining detections to process: ", remaining)
 
+    print(f"Cycle time ({ARM_MOTION_MODE}): {len(cycle_times)} chips, "
+          f"mean {sum(cycle_times) / len(cycle_times):.2f}s, total {sum(cycle_times):.2f}s")
+    pick_trace.finish()
     print("All operations complete. Resting.")
  
 
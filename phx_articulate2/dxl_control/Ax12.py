@@ -1,6 +1,14 @@
-from dynamixel_sdk import PortHandler, PacketHandler, COMM_SUCCESS
+import os
+import pick_trace
 from dxl_control.ax12_control_table import *
 
+# Port backend: "serial" (real bus through dynamixel_sdk) or "sim" (software AX-12 bus)
+DXL_BACKEND = os.environ.get("DXL_BACKEND", "serial")
+if DXL_BACKEND == "sim":
+    from dxl_control.sim_bus import PortHandler, PacketHandler, COMM_SUCCESS
+else:
+    from dynamixel_sdk import PortHandler, PacketHandler, COMM_SUCCESS
+
 
 class Ax12:
     """ Class for Dynamixel AX12A motors."""
@@ -12,6 +20,12 @@ class Ax12:
     MIN_POS_VAL = 0
     MAX_POS_VAL = 1023
 
+    @classmethod
+    def set_backend(cls, port_handler, packet_handler):
+        """Swap the port/packet handlers (e.g. a sim_bus.PortHandler) before turn_on()."""
+        cls.portHandler = port_handler
+        cls.packetHandler = packet_handler
+
     @classmethod
     def open_port(cls):
         if cls.portHandler.openPort():
@@ -39,26 +53,31 @@ class Ax12:
     def __init__(self, motor_id):
         """Initialize motor id"""
         self.id = motor_id
+        self.goal_position = None
 
     def set_register1(self, reg_num, reg_value):
-        dxl_comm_result, dxl_error = Ax12.packetHandler.write1ByteTxRx(
-            Ax12.portHandler, self.id, reg_num, reg_value)
+        with pick_trace.span("bus", "write1", {"id": self.id, "reg": reg_num}):
+            dxl_comm_result, dxl_error = Ax12.packetHandler.write1ByteTxRx(
+                Ax12.portHandler, self.id, reg_num, reg_value)
         Ax12.check_error(dxl_comm_result, dxl_error)
 
     def set_register2(self, reg_num, reg_value):
-        dxl_comm_result, dxl_error = Ax12.packetHandler.write2ByteTxRx(
-            Ax12.portHandler, self.id, reg_num, reg_value)
+        with pick_trace.span("bus", "write2", {"id": self.id, "reg": reg_num}):
+            dxl_comm_result, dxl_error = Ax12.packetHandler.write2ByteTxRx(
+                Ax12.portHandler, self.id, reg_num, reg_value)
         Ax12.check_error(dxl_comm_result, dxl_error)
 
     def get_register1(self, reg_num):
-        reg_data, dxl_comm_result, dxl_error = Ax12.packetHandler.read1ByteTxRx(
-            Ax12.portHandler, self.id, reg_num)
+        with pick_trace.span("bus", "read1", {"id": self.id, "reg": reg_num}):
+            reg_data, dxl_comm_result, dxl_error = Ax12.packetHandler.read1ByteTxRx(
+                Ax12.portHandler, self.id, reg_num)
         Ax12.check_error(dxl_comm_result, dxl_error)
         return reg_data
 
     def get_register2(self, reg_num_low):
-        reg_data, dxl_comm_result, dxl_error = Ax12.packetHandler.read2ByteTxRx(
-            Ax12.portHandler, self.id, reg_num_low)
+        with pick_trace.span("bus", "read2", {"id": self.id, "reg": reg_num_low}):
+            reg_data, dxl_comm_result, dxl_error = Ax12.packetHandler.read2ByteTxRx(
+                Ax12.portHandler, self.id, reg_num_low)
         Ax12.check_error(dxl_comm_result, dxl_error)
         return reg_data
 
@@ -77,6 +96,7 @@ class Ax12:
     def set_position(self, dxl_goal_position):
         """Write goal position."""
         self.set_register2(ADDR_AX_GOAL_POSITION_L, dxl_goal_position)
+        self.goal_position = dxl_goal_position
         # print("Position of dxl ID: %d set to %d " % (self.id, dxl_goal_position))
 
     def set_moving_speed(self, dxl_goal_speed):
@@ -91,6 +111,10 @@ class Ax12:
         print("ID:%03d  PresPos:%03d" % (self.id, dxl_present_position))
         return dxl_present_position
 
+    def get_present_position(self):
+        """Returns present position without printing (for polling loops)."""
+        return self.get_register2(ADDR_AX_PRESENT_POSITION_L)
+
     def get_present_speed(self):
         """Returns the current speed of the motor."""
         present_speed = self.get_register2(ADDR_AX_PRESENT_SPEED_L)
@@ -0,0 +1,241 @@
+# Simulated Dynamixel protocol 1.0 bus with AX-12 motors.
+# PortHandler / PacketHandler mirror the dynamixel_sdk calls Ax12 uses, so the
+# arm stack runs without /dev/ttyUSB0 (select it with DXL_BACKEND=sim).
+import time
+from dxl_control.ax12_control_table import *
+
+COMM_SUCCESS = 0
+COMM_NOT_AVAILABLE = -9000
+COMM_RX_TIMEOUT = -3001
+
+BROADCAST_ID = 254
+DEFAULT_IDS = (1, 2, 3, 4, 5, 6, 7, 8)   # phx.py motors
+BITS_PER_BYTE = 10                      # start + 8 data + stop
+USB_LATENCY = 0.001                     # s per round trip (FTDI latency_timer set to 1 ms)
+RX_TIMEOUT = 0.01                       # s lost when a motor does not answer
+
+# AX-12: 1024 ticks over 300 deg, speed unit ~0.111 rpm (0 = max speed)
+TICKS_PER_DEG = 1024 / 300
+DEG_PER_SEC_PER_SPEED_UNIT = 0.111 * 360 / 60
+MAX_SPEED_UNITS = 1023
+
+_real_sleep = time.sleep
+_real_monotonic = time.monotonic
+
+
+class SimClock:
+    """ Simulated time. Virtual clocks only move when the bus (or sleep) advances them,
+    so runs are deterministic and faster than real time."""
+
+    def __init__(self, virtual=True):
+        self.virtual = virtual
+        self.t = 0.0
+
+    def now(self):
+        return self.t if self.virtual else _real_monotonic()
+
+    def advance(self, seconds):
+        if seconds <= 0:
+            return
+        if self.virtual:
+            self.t += seconds
+        else:
+            _real_sleep(seconds)
+
+
+CLOCK = SimClock()
+
+
+def use_virtual_time(clock=CLOCK):
+    """Routes time.sleep / time.monotonic / time.perf_counter through the simulated clock
+    so fixed delays in the arm scripts count as simulated wall time."""
+    clock.virtual = True
+    time.sleep = clock.advance
+    time.monotonic = clock.now
+    time.perf_counter = clock.now
+
+
+class SimAx12:
+    """ Control table and motion model of one AX-12."""
+
+    def __init__(self, motor_id, clock):
+        self.clock = clock
+        self.table = bytearray(50)
+        self._write2(ADDR_AX_MODEL_NUMBER_L, 12)
+        self.table[ADDR_AX_ID] = motor_id
+        self.table[ADDR_AX_BAUD_RATE] = 1          # 1 Mbps
+        self.table[ADDR_AX_RETURN_DELAY_TIME] = 250  # x2 us
+        self._write2(ADDR_AX_CCW_ANGLE_LIMIT_L, 1023)
+        self._write2(ADDR_AX_MAX_TORQUE_L, 1023)
+        self._write2(ADDR_AX_TORQUE_LIMIT_L, 1023)
+        self.table[ADDR_AX_PRESENT_VOLTAGE] = 120
+        self.table[ADDR_AX_PRESENT_TEMPERATURE] = 35
+        self.position = 512.0
+        self.goal = 512
+        self._write2(ADDR_AX_GOAL_POSITION_L, 512)
+        self.last_update = clock.now()
+        self._sync_present(0.0)
+
+    def _write2(self, addr, value):
+        self.table[addr] = value & 0xFF
+        self.table[addr + 1] = (value >> 8) & 0xFF
+
+    def _read2(self, addr):
+        return self.table[addr] | (self.table[addr + 1] << 8)
+
+    def speed_ticks_per_sec(self):
+        speed = self._read2(ADDR_AX_GOAL_SPEED_L) & 0x3FF
+        if speed == 0:
+            speed = MAX_SPEED_UNITS
+        return speed * DEG_PER_SEC_PER_SPEED_UNIT * TICKS_PER_DEG
+
+    def update(self):
+        """Moves the simulated horn toward the goal for the time elapsed since the last access."""
+        now = self.clock.now()
+        dt = now - self.last_update
+        self.last_update = now
+        rate = 0.0
+        if self.table[ADDR_AX_TORQUE_ENABLE]:
+            error = self.goal - self.position
+            step = self.speed_ticks_per_sec() * dt
+            if abs(error) <= step:
+                self.position = float(self.goal)
+            else:
+                self.position += step if error > 0 else -step
+                rate = self.speed_ticks_per_sec()
+        self._sync_present(rate)
+
+    def _sync_present(self, rate):
+        self._write2(ADDR_AX_PRESENT_POSITION_L, int(round(self.position)))
+        self._write2(ADDR_AX_PRESENT_SPEED_L, int(rate / (DEG_PER_SEC_PER_SPEED_UNIT * TICKS_PER_DEG)))
+        self.table[ADDR_AX_MOVING] = 1 if abs(self.goal - self.position) >= 1 else 0
+
+    def write(self, addr, data, length):
+        self.update()
+        if length == 1:
+            self.table[addr] = data & 0xFF
+        else:
+            self._write2(addr, data)
+        if addr == ADDR_AX_GOAL_POSITION_L:
+            self.goal = max(0, min(1023, data))
+            self.table[ADDR_AX_TORQUE_ENABLE] = 1
+        self.update()
+
+    def read(self, addr, length):
+        self.update()
+        return self.table[addr] if length == 1 else self._read2(addr)
+
+    def return_delay(self):
+        return self.table[ADDR_AX_RETURN_DELAY_TIME] * 2e-6
+
+
+class SimBus:
+    """ Motors on one port plus transaction statistics."""
+
+    def __init__(self, ids=DEFAULT_IDS, clock=CLOCK, baudrate=1000000):
+        self.clock = clock
+        self.baudrate = baudrate
+        self.motors = {motor_id: SimAx12(motor_id, clock) for motor_id in ids}
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {"reads": 0, "writes": 0, "bytes": 0, "bus_time": 0.0, "timeouts": 0}
+        self.start_time = self.clock.now()
+
+    def transaction(self, tx_bytes, rx_bytes, motor=None, write=True):
+        """Charges the wire time of one instruction (+ status) packet to the clock."""
+        seconds = (tx_bytes + rx_bytes) * BITS_PER_BYTE / self.baudrate + USB_LATENCY
+        if motor is not None and rx_bytes:
+            seconds += motor.return_delay()
+        self.stats["writes" if write else "reads"] += 1
+        self.stats["bytes"] += tx_bytes + rx_bytes
+        self.stats["bus_time"] += seconds
+        self.clock.advance(seconds)
+
+    def summary(self):
+        elapsed = self.clock.now() - self.start_time
+        s = self.stats
+        return (f"{s['reads'] + s['writes']} transactions ({s['reads']} reads, {s['writes']} writes, "
+                f"{s['timeouts']} timeouts), {s['bytes']} bytes, bus {s['bus_time']:.3f}s, "
+                f"simulated wall time {elapsed:.3f}s")
+
+
+class PortHandler:
+    """ Stand-in for dynamixel_sdk.PortHandler backed by a SimBus."""
+
+    def __init__(self, port_name, bus=None):
+        self.port_name = port_name
+        self.bus = bus if bus is not None else SimBus()
+        self.is_open = False
+
+    def openPort(self):
+        self.is_open = True
+        return True
+
+    def closePort(self):
+        self.is_open = False
+
+    def setBaudRate(self, baudrate):
+        self.bus.baudrate = baudrate
+        return True
+
+    def getBaudRate(self):
+        return self.bus.baudrate
+
+
+class PacketHandler:
+    """ Stand-in for dynamixel_sdk.PacketHandler (protocol 1.0 framing sizes)."""
+
+    def __init__(self, protocol_version=1.0):
+        self.protocol_version = protocol_version
+
+    def _write(self, port, dxl_id, address, data, length):
+        bus = port.bus
+        tx = 7 + length     # FF FF id len instr addr data.. checksum
+        if dxl_id == BROADCAST_ID:
+            bus.transaction(tx, 0)
+            for motor in bus.motors.values():
+                motor.write(address, data, length)
+            return COMM_SUCCESS, 0
+        motor = bus.motors.get(dxl_id)
+        if motor is None:
+            bus.stats["timeouts"] += 1
+            bus.transaction(tx, 0)
+            bus.clock.advance(RX_TIMEOUT)
+            return COMM_RX_TIMEOUT, 0
+        motor.write(address, data, length)
+        bus.transaction(tx, 6, motor)
+        return COMM_SUCCESS, 0
+
+    def _read(self, port, dxl_id, address, length):
+        bus = port.bus
+        if dxl_id == BROADCAST_ID:
+            return 0, COMM_NOT_AVAILABLE, 0
+        motor = bus.motors.get(dxl_id)
+        if motor is None:
+            bus.stats["timeouts"] += 1
+            bus.transaction(8, 0, write=False)
+            bus.clock.advance(RX_TIMEOUT)
+            return 0, COMM_RX_TIMEOUT, 0
+        bus.transaction(8, 6 + length, motor, write=False)
+        return motor.read(address, length), COMM_SUCCESS, 0
+
+    def write1ByteTxRx(self, port, dxl_id, address, data):
+        return self._write(port, dxl_id, address, data, 1)
+
+    def write2ByteTxRx(self, port, dxl_id, address, data):
+        return self._write(port, dxl_id, address, data, 2)
+
+    def read1ByteTxRx(self, port, dxl_id, address):
+        return self._read(port, dxl_id, address, 1)
+
+    def read2ByteTxRx(self, port, dxl_id, address):
+        return self._read(port, dxl_id, address, 2)
+
+    def getTxRxResult(self, result):
+        return {COMM_SUCCESS: "[TxRxResult] Communication success!",
+                COMM_RX_TIMEOUT: "[TxRxResult] There is no status packet!",
+                COMM_NOT_AVAILABLE: "[TxRxResult] Port is not available!"}.get(result, f"[TxRxResult] {result}")
+
+    def getRxPacketError(self, error):
+        return f"[RxPacketError] error 0x{error:02X}" if error else ""
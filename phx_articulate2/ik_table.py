@@ -0,0 +1,134 @@
+import os
+import numpy as np
+import kinematics as kin
+
+# Pick plane covered by the table (cm). transform_coordinates() maps the camera
+# frame to x 15-22 and y roughly -15 to 10, the time-offset shift can push y a
+# little past either end so the grid is padded slightly.
+PICK_X_RANGE = (14.5, 22.5)
+PICK_Y_RANGE = (-16.0, 10.5)
+GRID_STEP = 0.25
+
+# (z height, theta0_4) layers used by pick_up(): approach, pick and lift heights
+PICK_LAYERS = ((23.0, -90), (20.75, -90), (25.0, -90))
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ik_table_cache.npz")
+
+
+def solve_joints(pos, theta0_4):
+    """Exact IK. Input: xyz position, theta0_4  Returns: 1x4 joint array [waist, shoulder, elbow, wrist]"""
+    joint_angles = kin.ik3(pos)
+    theta4 = kin.calculate_theta_4(joint_angles, theta0_4)
+    return np.array([joint_angles[0], joint_angles[1], joint_angles[2], theta4], dtype=float)
+
+
+def _pose_key(pos, theta0_4):
+    return (round(float(pos[0]), 3), round(float(pos[1]), 3), round(float(pos[2]), 3), round(float(theta0_4), 3))
+
+
+class IKTable:
+    """ Precomputed joint solutions for the pick plane.
+
+    Each (z, theta0_4) layer holds a dense x/y grid of joint angles that is
+    bilinearly interpolated on lookup. Poses that are reused verbatim (drop-off
+    bins, park pose) can be added with precompute() and are returned exactly.
+    """
+
+    def __init__(self, xs, ys, layers, grids, max_error):
+        self.xs = xs
+        self.ys = ys
+        self.layers = [(float(z), float(t)) for z, t in layers]
+        self.grids = grids            # one (len(xs), len(ys), 4) array per layer
+        self.max_error = max_error    # worst fk position error of interpolation (cm) per layer
+        self.poses = {}
+
+    @staticmethod
+    def _cache_key():
+        return np.concatenate([kin.link_lengths.astype(float),
+                               [PICK_X_RANGE[0], PICK_X_RANGE[1], PICK_Y_RANGE[0], PICK_Y_RANGE[1], GRID_STEP],
+                               np.array(PICK_LAYERS, dtype=float).ravel()])
+
+    @classmethod
+    def build(cls):
+        xs = np.arange(PICK_X_RANGE[0], PICK_X_RANGE[1] + GRID_STEP / 2, GRID_STEP)
+        ys = np.arange(PICK_Y_RANGE[0], PICK_Y_RANGE[1] + GRID_STEP / 2, GRID_STEP)
+        grids = []
+        max_error = []
+        for z, theta0_4 in PICK_LAYERS:
+            grid = np.zeros([len(xs), len(ys), 4])
+            for i, x in enumerate(xs):
+                for j, y in enumerate(ys):
+                    grid[i, j] = solve_joints([x, y, z], theta0_4)
+            grids.append(grid)
+            max_error.append(cls._interpolation_error(xs, ys, grid, z))
+        print(f"IK table built: {len(xs)}x{len(ys)} grid, {len(PICK_LAYERS)} layers, "
+              f"max interpolation error {max(max_error):.4f} cm")
+        return cls(xs, ys, PICK_LAYERS, grids, np.array(max_error))
+
+    @staticmethod
+    def _interpolation_error(xs, ys, grid, z):
+        """Error bound: fk of the interpolated joints at every cell centre vs. the target point."""
+        worst = 0.0
+        for i in range(len(xs) - 1):
+            for j in range(len(ys) - 1):
+                cell = grid[i:i + 2, j:j + 2]
+                if np.isnan(cell).any():
+                    continue
+                joints = cell.mean(axis=(0, 1))
+                target = [(xs[i] + xs[i + 1]) / 2, (ys[j] + ys[j + 1]) / 2, z]
+                reached = kin.fk3(joints[:3])
+                worst = max(worst, float(np.linalg.norm(np.subtract(reached, target))))
+        return worst
+
+    @classmethod
+    def load_or_build(cls, cache_file=CACHE_FILE):
+        """Load the cached table, rebuilding it when the link lengths or grid spec changed."""
+        key = cls._cache_key()
+        if os.path.exists(cache_file):
+            try:
+                data = np.load(cache_file)
+                if data["key"].shape == key.shape and np.allclose(data["key"], key):
+                    return cls(data["xs"], data["ys"], PICK_LAYERS, list(data["grids"]), data["max_error"])
+                print("IK table cache is stale (link lengths or grid changed), rebuilding...")
+            except Exception as e:
+                print(f"Could not read IK table cache {cache_file}: {e}")
+        table = cls.build()
+        try:
+            np.savez(cache_file, key=key, xs=table.xs, ys=table.ys,
+                     grids=np.array(table.grids), max_error=table.max_error)
+        except OSError as e:
+            print(f"Could not write IK table cache {cache_file}: {e}")
+        return table
+
+    def precompute(self, pos, theta0_4):
+        """Solve and remember an exact pose (drop-off bins, park pose)."""
+        joints = solve_joints(pos, theta0_4)
+        self.poses[_pose_key(pos, theta0_4)] = joints
+        return joints
+
+    def lookup(self, pos, theta0_4):
+        """Returns 1x4 joint array, or None when the pose is not covered by the table."""
+        joints = self.poses.get(_pose_key(pos, theta0_4))
+        if joints is not None:
+            return joints
+
+        x, y, z = float(pos[0]), float(pos[1]), float(pos[2])
+        for layer, (layer_z, layer_theta) in enumerate(self.layers):
+            if abs(layer_z - z) < 1e-6 and abs(layer_theta - theta0_4) < 1e-6:
+                break
+        else:
+            return None
+        if not (self.xs[0] <= x <= self.xs[-1] and self.ys[0] <= y <= self.ys[-1]):
+            return None
+
+        # bilinear interpolation between the four surrounding grid points
+        i = min(int((x - self.xs[0]) / GRID_STEP), len(self.xs) - 2)
+        j = min(int((y - self.ys[0]) / GRID_STEP), len(self.ys) - 2)
+        tx = (x - self.xs[i]) / GRID_STEP
+        ty = (y - self.ys[j]) / GRID_STEP
+        g = self.grids[layer]
+        joints = ((1 - tx) * (1 - ty) * g[i, j] + tx * (1 - ty) * g[i + 1, j]
+                  + (1 - tx) * ty * g[i, j + 1] + tx * ty * g[i + 1, j + 1])
+        if np.isnan(joints).any():
+            return None
+        return joints
@@ -0,0 +1,45 @@
+import phx
+import ik_table
+import pick_trace
+
+
+class Waypoint:
+    """ One via-point of a move: xyz target, end-effector angle theta0_4 and how to pass through it."""
+
+    def __init__(self, pos, theta0_4, blend=True, speed=None):
+        self.pos = pos
+        self.theta0_4 = theta0_4
+        self.blend = blend      # True: hand over to the next waypoint once within phx.blend_tolerance
+        self.speed = speed      # moving speed into this waypoint, None = phx.default_speed
+
+
+def move_through(waypoints, table=None, stop_at_end=True):
+    """Runs waypoints back to back.
+    Blended waypoints send the next goal as soon as the arm is close instead of
+    waiting for a full stop. Non-blended waypoints (and the last one, unless
+    stop_at_end is False) wait for completion. Unreachable poses are skipped like go_to_pos()
+    does; returns False if any was."""
+    reached_all = True
+    for n, wp in enumerate(waypoints):
+        with pick_trace.span("move", "waypoint", {"pos": list(map(float, wp.pos)), "blend": wp.blend}):
+            with pick_trace.span("ik", "ik"):
+                joints = table.lookup(wp.pos, wp.theta0_4) if table is not None else None
+            try:
+                if joints is None:
+                    with pick_trace.span("ik", "ik exact"):
+                        joints = ik_table.solve_joints(wp.pos, wp.theta0_4)
+                phx.set_speed(wp.speed if wp.speed is not None else phx.default_speed)
+                phx.set_wrist(joints[3])
+                phx.set_wse(joints[:3])
+            except ValueError as e:
+                print(f"Error: Unable to reach position {wp.pos}.")
+                print(f"Details: {e}")
+                reached_all = False
+                continue
+
+            last = n == len(waypoints) - 1
+            if (wp.blend and not last) or (last and not stop_at_end):
+                phx.wait_until_near()
+            else:
+                phx.wait_for_completion()
+    return reached_all
@@ -1,4 +1,5 @@
 from dxl_control.Ax12 import Ax12
+import pick_trace
 import time
 
 # motor objects
@@ -15,6 +16,19 @@ gripper2 = Ax12(8)
 default_speed = 75
 max_speed = 1023
 half_speed = 512
+current_speed = None
+
+# Blending / gripper feedback
+blend_tolerance = 25        # ticks (~7 deg) from goal before the next waypoint may be sent
+grip_load_threshold = 300   # present load (0-1023) once the jaws are clamped on a chip
+grip_stall_time = 0.15      # s without jaw movement that counts as stalled
+grip_settle_time = 0.2      # s to let the grip firm up once clamped
+near_poll_interval = 0.005  # s between position polls in wait_until_near()
+near_timeout_margin = 2.0   # x the expected move time before wait_until_near() gives up
+near_timeout_min = 0.5      # s added to that, for acceleration and bus latency
+
+# AX-12: 1024 ticks over 300 deg, speed unit ~0.111 rpm (0 = max speed)
+TICKS_PER_SEC_PER_SPEED_UNIT = 0.111 * 360 / 60 * 1024 / 300
 
 
 def map_val(x_in, x_min, x_max, y_min, y_max):
@@ -146,22 +160,86 @@ def get_angle(self):
 
 
 def wait_for_completion():
-    while gripper2.is_moving():
-        pass
-    while gripper.is_moving():
-        pass
-    while waist.is_moving():
-        pass
-    while shoulder1.is_moving():
-        pass
-    while wrist.is_moving():
-        pass
-    while elbow1.is_moving():
-        pass
+    with pick_trace.span("motion", "wait_for_completion"):
+        while gripper2.is_moving():
+            pass
+        while gripper.is_moving():
+            pass
+        while waist.is_moving():
+            pass
+        while shoulder1.is_moving():
+            pass
+        while wrist.is_moving():
+            pass
+        while elbow1.is_moving():
+            pass
     
     
 
 
+def expected_move_time(ticks, speed=None):
+    """Seconds to move the given ticks at the moving speed (current_speed by default)."""
+    speed = speed or current_speed or max_speed
+    return ticks / (speed * TICKS_PER_SEC_PER_SPEED_UNIT)
+
+
+def wait_until_near(tolerance=None, timeout=None):
+    """Returns once waist, shoulder, elbow and wrist are within tolerance ticks of their goals.
+    Lets the next waypoint be sent before a full stop.
+    If a joint is blocked or stalls short of its goal, gives up after timeout (default: from the
+    expected move time) and waits until no joint is moving instead. Returns False in that case."""
+    if tolerance is None:
+        tolerance = blend_tolerance
+    motors = [m for m in (waist, shoulder1, elbow1, wrist) if m.goal_position is not None]
+    with pick_trace.span("motion", "wait_until_near"):
+        distances = [abs(m.get_present_position() - m.goal_position) for m in motors]
+        if timeout is None:
+            timeout = near_timeout_margin * expected_move_time(max(distances, default=0)) + near_timeout_min
+        deadline = time.monotonic() + timeout
+        while any(d > tolerance for d in distances):
+            if time.monotonic() > deadline:
+                print(f"Warning: joints {[m.id for m, d in zip(motors, distances) if d > tolerance]} "
+                      f"not within {tolerance} ticks after {timeout:.1f}s; waiting for them to stop.")
+                while any(m.is_moving() for m in motors) and time.monotonic() < deadline + timeout:
+                    time.sleep(near_poll_interval)
+                return False
+            time.sleep(near_poll_interval)
+            distances = [abs(m.get_present_position() - m.goal_position) for m in motors]
+    return True
+
+
+def wait_for_gripper2(timeout):
+    """Waits for the gripper jaws instead of a fixed sleep.
+    Done when the goal is reached, the load shows a clamped part, or the jaws stall.
+    Returns seconds waited; timeout is the old fixed sleep."""
+    start = time.monotonic()
+    last_pos = None
+    last_change = start
+    with pick_trace.span("gripper", "wait_for_gripper2"):
+        while time.monotonic() - start < timeout:
+            if not gripper2.is_moving():
+                break
+            if (gripper2.get_load() & 0x3FF) >= grip_load_threshold:
+                pick_trace.sleep(grip_settle_time, "grip settle")
+                break
+            pos = gripper2.get_present_position()
+            now = time.monotonic()
+            if last_pos is None or abs(pos - last_pos) > 1:
+                last_pos = pos
+                last_change = now
+            elif now - last_change >= grip_stall_time:
+                break
+    return time.monotonic() - start
+
+
+def set_speed(speed):
+    """Sets moving speed of all motors, skipping the bus write when it is unchanged."""
+    global current_speed
+    if speed != current_speed:
+        all_motors.set_moving_speed(speed)
+        current_speed = speed
+
+
 def set_wse(joint_angles):
     """Set the first 3 joints: waist, shoulder, elbow."""
     set_waist(joint_angles[0])
@@ -208,11 +286,13 @@ def zero_position():
 
 
 def turn_on():
+    global current_speed
     Ax12.open_port()
     Ax12.set_baudrate()
     config_motor_angles()
     print('Connection Successful')
     all_motors.set_moving_speed(default_speed)
+    current_speed = default_speed
 
 
 def sleep_position():
@@ -220,7 +300,7 @@ def sleep_position():
     shoulder_deg = 170  # between 0 and 180
     elbow_deg = -160  # between 0 and -180
     wrist_deg = 30
-    all_motors.set_moving_speed(20)
+    set_speed(20)
     set_wsew([waist_deg, shoulder_deg, elbow_deg, wrist_deg])
     wait_for_completion()
 
@@ -0,0 +1,83 @@
+import numpy as np
+
+# AX-12 moving speed unit is ~0.111 rpm, i.e. 0.666 deg/s per unit
+DEG_PER_SEC_PER_SPEED_UNIT = 0.111 * 360 / 60
+UNREACHABLE_COST = 1e3    # s, keeps unreachable poses at the end of the order
+TWO_OPT_MAX_PASSES = 5
+
+
+class PickTask:
+    """ One chip: joints at its pick approach and its drop approach.
+    priority 0 is picked before priority 1 (unmatched parts go first)."""
+
+    def __init__(self, pick_joints, drop_joints, priority=1, payload=None):
+        self.pick_joints = pick_joints
+        self.drop_joints = drop_joints
+        self.priority = priority
+        self.payload = payload
+
+
+def move_time(joints_a, joints_b, speed):
+    """Estimated move time (s). All joints run at the same moving speed, so the
+    joint with the largest angle change sets the time."""
+    if joints_a is None or joints_b is None:
+        return UNREACHABLE_COST
+    delta = np.max(np.abs(np.subtract(joints_a, joints_b)))
+    if np.isnan(delta):
+        return UNREACHABLE_COST
+    return float(delta) / (speed * DEG_PER_SEC_PER_SPEED_UNIT)
+
+
+def path_time(order, start_joints, speed):
+    """Travel time of an order: start -> first pick, then each drop -> next pick.
+    The pick -> drop leg of a task is the same in every order so it is not counted."""
+    total = 0.0
+    prev = start_joints
+    for task in order:
+        total += move_time(prev, task.pick_joints, speed)
+        prev = task.drop_joints
+    return total
+
+
+def nearest_neighbor(tasks, start_joints, speed):
+    """Greedy order, only choosing among the lowest remaining priority. O(n) per decision."""
+    remaining = list(tasks)
+    order = []
+    prev = start_joints
+    while remaining:
+        top = min(t.priority for t in remaining)
+        best = min((t for t in remaining if t.priority == top),
+                   key=lambda t: move_time(prev, t.pick_joints, speed))
+        remaining.remove(best)
+        order.append(best)
+        prev = best.drop_joints
+    return order
+
+
+def two_opt(order, start_joints, speed):
+    """Reverses segments that lie inside one priority group while it shortens the path.
+    Costs are asymmetric (drop -> pick) so each candidate is re-timed in full."""
+    best = list(order)
+    best_time = path_time(best, start_joints, speed)
+    for _ in range(TWO_OPT_MAX_PASSES):
+        improved = False
+        for i in range(len(best) - 1):
+            for k in range(i + 1, len(best)):
+                if best[k].priority != best[i].priority:
+                    break
+                candidate = best[:i] + best[i:k + 1][::-1] + best[k + 1:]
+                candidate_time = path_time(candidate, start_joints, speed)
+                if candidate_time < best_time - 1e-9:
+                    best, best_time = candidate, candidate_time
+                    improved = True
+        if not improved:
+            break
+    return best
+
+
+def plan_order(tasks, start_joints, speed):
+    """Pick order minimising estimated joint-space travel time, unmatched parts first."""
+    order = two_opt(nearest_neighbor(tasks, start_joints, speed), start_joints, speed)
+    print(f"Planned pick order: {len(order)} chips, est. travel {path_time(order, start_joints, speed):.2f}s "
+          f"(detection order {path_time(sorted(tasks, key=lambda t: t.priority), start_joints, speed):.2f}s)")
+    return order
@@ -0,0 +1,146 @@
+# Pick-cycle latency profiler.
+# Spans are recorded with time.monotonic() around moves, motion waits, Ax12 register
+# access, IK and the explicit sleeps. finish() writes a Chrome trace (open in
+# chrome://tracing or ui.perfetto.dev) and prints a per-chip breakdown.
+# Enable with PHX_TRACE=/path/to/trace.json; when unset every call is a no-op.
+import os
+import json
+import time
+
+# Summary categories (time goes to the innermost span)
+#   move    - go_to_pos / move_through container, self time is command overhead
+#   motion  - waiting for the arm joints to arrive
+#   gripper - waiting for the jaws
+#   bus     - register reads/writes outside of waits (polling reads count as waiting)
+#   sleep   - fixed delays
+#   ik      - table lookups and exact IK
+CATEGORIES = ("motion", "gripper", "bus", "sleep", "ik", "move")
+WAIT_CATEGORIES = ("motion", "gripper")
+
+trace_file = os.environ.get("PHX_TRACE")
+events = []
+chips = []
+_stack = []
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """ One timed region; keeps child time so the summary can use self time."""
+
+    def __init__(self, category, name, args):
+        self.category = category
+        self.name = name
+        self.args = args
+        self.child_time = 0.0
+        self.polls = 0
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        _stack.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        end = time.monotonic()
+        _stack.pop()
+        duration = end - self.start
+        if _stack:
+            _stack[-1].child_time += duration
+        if self.polls:
+            self.args = dict(self.args or {}, polls=self.polls)
+        events.append((self.category, self.name, self.start, duration, duration - self.child_time, self.args))
+        return False
+
+
+def enable(path):
+    """Turns tracing on (and clears earlier spans), e.g. from sim_benchmark.py."""
+    global trace_file
+    trace_file = path
+    events.clear()
+    chips.clear()
+
+
+def span(category, name, args=None):
+    """Context manager timing one region. Bus access inside a wait is only counted as a poll."""
+    if not trace_file:
+        return _NULL_SPAN
+    if category == "bus" and _stack and _stack[-1].category in WAIT_CATEGORIES:
+        _stack[-1].polls += 1
+        return _NULL_SPAN
+    return _Span(category, name, args)
+
+
+def sleep(seconds, name):
+    """time.sleep() recorded as a fixed delay."""
+    with span("sleep", name, {"seconds": seconds}):
+        time.sleep(seconds)
+
+
+def begin_chip(label):
+    if trace_file:
+        chips.append([label, time.monotonic(), None, len(events)])
+
+
+def end_chip():
+    if trace_file and chips and chips[-1][2] is None:
+        chips[-1][2] = time.monotonic()
+
+
+def chip_breakdown(start_index, end_index):
+    totals = dict.fromkeys(CATEGORIES, 0.0)
+    for category, _, _, _, self_time, _ in events[start_index:end_index]:
+        totals[category] = totals.get(category, 0.0) + self_time
+    return totals
+
+
+def write_chrome_trace(path):
+    trace_events = []
+    for category, name, start, duration, _, args in events:
+        event = {"name": name, "cat": category, "ph": "X", "pid": 1, "tid": 1,
+                 "ts": round(start * 1e6, 1), "dur": round(duration * 1e6, 1)}
+        if args:
+            event["args"] = args
+        trace_events.append(event)
+    for label, start, end, _ in chips:
+        if end is not None:
+            trace_events.append({"name": f"chip {label}", "cat": "chip", "ph": "X", "pid": 1, "tid": 0,
+                                 "ts": round(start * 1e6, 1), "dur": round((end - start) * 1e6, 1)})
+    with open(path, "w") as f:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+
+
+def print_summary():
+    print("-" * 40)
+    print("Pick cycle breakdown (self time per category):")
+    for n, (label, start, end, first_event) in enumerate(chips):
+        if end is None:
+            continue
+        last_event = chips[n + 1][3] if n + 1 < len(chips) else len(events)
+        totals = chip_breakdown(first_event, last_event)
+        total = end - start
+        other = max(0.0, total - sum(totals.values()))
+        parts = " | ".join(f"{c} {totals[c]:.2f}s ({100 * totals[c] / total:.0f}%)"
+                           for c in CATEGORIES if totals[c] > 0)
+        print(f"chip {label}: {total:.2f}s | {parts} | other {other:.2f}s")
+    print("-" * 40)
+
+
+def finish():
+    """Writes the Chrome trace and prints the per-chip summary."""
+    if not trace_file:
+        return
+    try:
+        write_chrome_trace(trace_file)
+        print(f"Pick trace written to {trace_file}")
+    except OSError as e:
+        print(f"Could not write pick trace {trace_file}: {e}")
+    print_summary()
@@ -0,0 +1,65 @@
+# Description:
+# Run the arm scripts against the simulated AX-12 bus (dxl_control/sim_bus.py).
+# Approach:
+# 1. Select the sim backend before anything imports Ax12, and put time on the simulated clock.
+# 2. Run a scenario (interpolation line demo, or a pick cycle from a detection file).
+# 3. Report bus transactions, bytes, bus time and simulated wall time for each scenario.
+# Notes:
+# - No hardware needed, so this also works as an end-to-end smoke test in CI.
+# - Compare bus-efficiency changes by transaction count and simulated wall time.
+import os
+import sys
+import time
+import argparse
+
+os.environ["DXL_BACKEND"] = "sim"
+from dxl_control import sim_bus
+sim_bus.use_virtual_time()
+from dxl_control.Ax12 import Ax12
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DETECTION_FILE = os.path.join(REPO_DIR, "savephototest", "latest_detection.txt")
+
+
+def run_scenario(name, func):
+    bus = Ax12.portHandler.bus
+    bus.reset_stats()
+    cpu_start = time.process_time()
+    func()
+    print(f"[{name}] {bus.summary()}, cpu {time.process_time() - cpu_start:.2f}s")
+
+
+def interpolation_scenario(steps):
+    import interpolation_demo
+    interpolation_demo.line_demo(steps)
+    interpolation_demo.phx.wait_for_completion()
+
+
+def pick_scenario(detection_file, mode, trace=None):
+    import Pick_coord_from_crop_txt3 as pick
+    if trace:
+        root, ext = os.path.splitext(trace)
+        pick.pick_trace.enable(f"{root}_{mode}{ext or '.json'}")
+    pick.ARM_MOTION_MODE = mode
+    pick.main(detection_file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Arm benchmark on the simulated Dynamixel bus")
+    parser.add_argument("--scenario", choices=["interpolation", "pick", "all"], default="all")
+    parser.add_argument("--steps", type=int, default=60, help="Interpolation points for the line demo")
+    parser.add_argument("--detections", default=DEFAULT_DETECTION_FILE, help="latest_detection.txt to pick from")
+    parser.add_argument("--mode", choices=["legacy", "blended", "both"], default="both",
+                        help="ARM_MOTION_MODE for the pick scenario")
+    parser.add_argument("--trace", help="Write a Chrome trace per pick run (suffixed with the mode)")
+    args = parser.parse_args()
+
+    import phx
+    phx.turn_on()
+    if args.scenario in ("interpolation", "all"):
+        run_scenario("interpolation", lambda: interpolation_scenario(args.steps))
+    if args.scenario in ("pick", "all"):
+        modes = ["legacy", "blended"] if args.mode == "both" else [args.mode]
+        for mode in modes:
+            run_scenario(f"pick/{mode}", lambda: pick_scenario(args.detections, mode, args.trace))
+    sys.exit(0)
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# Pipeline metrics for chipvision3 (replaces chip_pipeline.PerfLog).
+# Collected per frame from the pad probe and from probes / queues inside the pipeline:
+#   fps            rolling, over the last ROLLING_FRAMES frames reaching the callback
+#   inference_ms   hailonet sink -> src per buffer, matched by PTS (HailoRT puts no timing
+#                  in the ROI metadata, so it is measured around the hailonet element)
+#   frame_age_ms   capture -> callback (chipvision3.buffer_age)
+#   probe_ms       time spent in app_callback (frame copy, trigger logic, recording)
+#   dropped        frames missing from the PTS sequence at the callback (lost anywhere upstream)
+#   overruns       per leaky queue, buffers arriving while it was full (where the drops happen)
+#   queues         current-level-buffers / max-size-buffers of every queue element
+# Every CHIPVISION_PERF_LOG_SEC one JSON line is printed:
+#   📊 {"fps": 29.9, "inference_ms": {"mean": 14.2, "p95": 17.8, "max": 21.0}, ...}
+# CHIPVISION_METRICS_PORT=9108 also serves the same values in Prometheus text format on
+# http://127.0.0.1:9108/metrics (CHIPVISION_METRICS_HOST=0.0.0.0 to scrape from another machine).
+import os
+import json
+import time
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from gi.repository import Gst, GLib
+
+METRICS_LOG_SEC = int(os.environ.get("CHIPVISION_PERF_LOG_SEC", "5"))
+METRICS_PORT    = int(os.environ.get("CHIPVISION_METRICS_PORT", "0"))     # 0 = no endpoint
+METRICS_HOST    = os.environ.get("CHIPVISION_METRICS_HOST", "127.0.0.1")
+ROLLING_FRAMES  = 300
+INFLIGHT_MAX    = 256     # PTS -> hailonet entry time; cleared if buffers never come out
+DROP_GAP_RATIO  = 1.5     # PTS gap (in frame intervals) counted as dropped frames
+HAILONET_FACTORIES = ("hailonet", "hailonet2")
+
+
+class Rolling:
+    """ Last ROLLING_FRAMES samples (seconds) summarized in ms."""
+
+    def __init__(self, maxlen=ROLLING_FRAMES):
+        self.values = deque(maxlen=maxlen)
+
+    def add(self, seconds):
+        if seconds is not None:
+            self.values.append(seconds)
+
+    def summary(self):
+        if not self.values:
+            return None
+        ordered = sorted(self.values)
+        return {"mean": round(1e3 * sum(ordered) / len(ordered), 2),
+                "p95": round(1e3 * ordered[int(0.95 * (len(ordered) - 1))], 2),
+                "max": round(1e3 * ordered[-1], 2)}
+
+
+def _elements(pipeline):
+    it = pipeline.iterate_recurse()
+    while True:
+        result, element = it.next()
+        if result != Gst.IteratorResult.OK:
+            break
+        yield element
+
+
+def _factory_name(element):
+    factory = element.get_factory()
+    return factory.get_name() if factory is not None else ""
+
+
+class PipelineMetrics:
+    """ Rolling pipeline metrics; frame()/probe_done() from the pad probe, log() on a GLib timer."""
+
+    def __init__(self, interval=METRICS_LOG_SEC, port=METRICS_PORT, label=""):
+        self.interval = interval
+        self.port = port
+        self.label = label
+        self.lock = threading.Lock()
+        self.frame_times = deque(maxlen=ROLLING_FRAMES)
+        self.frame_intervals = deque(maxlen=ROLLING_FRAMES)
+        self.inference = Rolling()
+        self.frame_age = Rolling()
+        self.probe = Rolling()
+        self.frames = 0
+        self.detections = 0
+        self.dropped = 0
+        self.overruns = {}
+        self.queues = []
+        self.inflight = {}
+        self.last_pts = None
+        self.last_wall = time.time()
+        self.last_cpu = time.process_time()
+        self.cpu_pct = 0.0
+        self.server = None
+
+    # --- Pipeline hooks ---
+    def attach(self, pipeline, measure_inference=True):
+        """Probes around hailonet and the list of queues to sample; call once the pipeline is built.
+        measure_inference=False when inference runs outside the pipeline (call inference_done())."""
+        hailonet = None
+        for element in _elements(pipeline):
+            factory = _factory_name(element)
+            if factory == "queue":
+                self.queues.append(element)
+                if element.get_property("leaky") != 0:
+                    name = element.get_name()
+                    self.overruns[name] = 0
+                    element.connect("overrun", self._on_overrun, name)
+            elif factory in HAILONET_FACTORIES and hailonet is None:
+                hailonet = element
+        if not measure_inference:
+            return
+        if hailonet is None:
+            print("⚠️ No hailonet element found; inference latency not measured")
+        else:
+            hailonet.get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, self._on_inference_in)
+            hailonet.get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, self._on_inference_out)
+
+    def _on_overrun(self, queue, name):
+        self.overruns[name] += 1
+
+    def _on_inference_in(self, pad, info):
+        buf = info.get_buffer()
+        if buf is not None and buf.pts != Gst.CLOCK_TIME_NONE:
+            if len(self.inflight) >= INFLIGHT_MAX:
+                self.inflight.clear()
+            self.inflight[buf.pts] = time.perf_counter()
+        return Gst.PadProbeReturn.OK
+
+    def _on_inference_out(self, pad, info):
+        buf = info.get_buffer()
+        if buf is not None:
+            entered = self.inflight.pop(buf.pts, None)
+            if entered is not None:
+                self.inference_done(time.perf_counter() - entered)
+        return Gst.PadProbeReturn.OK
+
+    def inference_done(self, seconds):
+        with self.lock:
+            self.inference.add(seconds)
+
+    # --- Called from app_callback ---
+    def frame(self, pts=None, frame_age=None, detections=0):
+        """pts in seconds (None if unknown)."""
+        now = time.time()
+        with self.lock:
+            self.frames += 1
+            self.detections += detections
+            self.frame_times.append(now)
+            self.frame_age.add(frame_age)
+            if pts is not None and self.last_pts is not None and pts > self.last_pts:
+                gap = pts - self.last_pts
+                if len(self.frame_intervals) >= 10:
+                    interval = sorted(self.frame_intervals)[len(self.frame_intervals) // 2]
+                    if gap > DROP_GAP_RATIO * interval:
+                        self.dropped += int(round(gap / interval)) - 1
+                        gap = None
+                if gap is not None:
+                    self.frame_intervals.append(gap)
+            if pts is not None:
+                self.last_pts = pts
+
+    def probe_done(self, seconds):
+        with self.lock:
+            self.probe.add(seconds)
+
+    # --- Reporting ---
+    def snapshot(self):
+        with self.lock:
+            times = self.frame_times
+            fps = (len(times) - 1) / (times[-1] - times[0]) if len(times) > 1 and times[-1] > times[0] else 0.0
+            data = {
+                "time": round(time.time(), 3),
+                "fps": round(fps, 2),
+                "frames": self.frames,
+                "detections": self.detections,
+                "dropped": self.dropped,
+                "inference_ms": self.inference.summary(),
+                "frame_age_ms": self.frame_age.summary(),
+                "probe_ms": self.probe.summary(),
+                "cpu_pct": round(self.cpu_pct, 1),
+                "load": round(os.getloadavg()[0], 2),
+            }
+        if self.label:
+            data["mode"] = self.label
+        data["queues"] = {q.get_name(): [q.get_property("current-level-buffers"),
+                                         q.get_property("max-size-buffers")] for q in self.queues}
+        if self.overruns:
+            data["overruns"] = dict(self.overruns)
+        return data
+
+    def prometheus(self):
+        data = self.snapshot()
+        lines = []
+
+        def metric(name, kind, value, labels=""):
+            if value is None:
+                return
+            if not any(line == f"# TYPE chipvision_{name} {kind}" for line in lines):
+                lines.append(f"# TYPE chipvision_{name} {kind}")
+            lines.append(f"chipvision_{name}{labels} {value}")
+
+        metric("fps", "gauge", data["fps"])
+        metric("frames_total", "counter", data["frames"])
+        metric("detections_total", "counter", data["detections"])
+        metric("dropped_frames_total", "counter", data["dropped"])
+        metric("process_cpu_percent", "gauge", data["cpu_pct"])
+        for key in ("inference_ms", "frame_age_ms", "probe_ms"):
+            for stat, value in (data[key] or {}).items():
+                metric(key, "gauge", value, f'{{stat="{stat}"}}')
+        for name, (level, size) in data["queues"].items():
+            metric("queue_level_buffers", "gauge", level, f'{{queue="{name}"}}')
+            metric("queue_max_buffers", "gauge", size, f'{{queue="{name}"}}')
+        for name, count in data.get("overruns", {}).items():
+            metric("queue_overruns_total", "counter", count, f'{{queue="{name}"}}')
+        return "\n".join(lines) + "\n"
+
+    def log(self):
+        wall, cpu = time.time(), time.process_time()
+        if wall > self.last_wall:
+            self.cpu_pct = 100.0 * (cpu - self.last_cpu) / (wall - self.last_wall)
+        self.last_wall, self.last_cpu = wall, cpu
+        print(f"📊 {json.dumps(self.snapshot())}")
+        return True
+
+    def start(self):
+        if self.interval > 0:
+            GLib.timeout_add_seconds(self.interval, self.log)
+        if self.port > 0:
+            self._serve()
+
+    def _serve(self):
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            self.server = ThreadingHTTPServer((METRICS_HOST, self.port), Handler)
+        except OSError as e:
+            print(f"⚠️ Metrics endpoint not started on {METRICS_HOST}:{self.port}: {e}")
+            return
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"📊 Metrics at http://{METRICS_HOST}:{self.port}/metrics")
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
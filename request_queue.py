@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# Chip request queue shared by the UI and the pipeline (FIFO, JSON-lines log).
+# QUEUE_FILE is append-only; one line per event:
+#   {"id": 3, "kind": "Part", "value": "SN74185AN", "time": 1700000000.0}   enqueued
+#   {"id": 3, "status": "claimed", "time": ...}                             taken by master2
+#   {"id": 3, "status": "done", "time": ...}                                or "failed"
+# Every access holds a flock on the file, so the UI can submit the next request
+# while the pipeline is still working on the previous one.
+# One-shot runs (master2 without --daemon) keep using chip_request_input.txt.
+import os
+import json
+import time
+import fcntl
+
+SAVE_FOLDER  = "/home/scalepi/Desktop/savephototest"
+QUEUE_FILE   = os.path.join(SAVE_FOLDER, "request_queue.jsonl")
+REQUEST_FILE = os.path.join(SAVE_FOLDER, "chip_request_input.txt")
+
+
+def format_request(kind: str, value: str) -> str:
+    """The one-line form beltocr2 parses: 'Requested Part: SN74185AN'."""
+    return f"Requested {kind}: {value}"
+
+
+def _read_events(f):
+    f.seek(0)
+    events = []
+    for line in f:
+        line = line.strip()
+        if line:
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError:
+                print(f"⚠️ Skipping bad queue line: {line}")
+    return events
+
+
+def write_request_file(kind: str, value: str, request_file: str = REQUEST_FILE):
+    """Legacy single request (overwritten each time)."""
+    os.makedirs(os.path.dirname(request_file), exist_ok=True)
+    with open(request_file, "w") as f:
+        f.write(format_request(kind, value))
+    print(f"Saved -> {format_request(kind, value)}")
+
+
+def enqueue(kind: str, value: str, queue_file: str = QUEUE_FILE) -> dict:
+    """Appends a request and returns it (with its id)."""
+    os.makedirs(os.path.dirname(queue_file), exist_ok=True)
+    with open(queue_file, "a+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            existing = _read_events(f)
+            request = {"id": max((r.get("id", 0) for r in existing), default=0) + 1,
+                       "kind": kind, "value": value, "time": time.time()}
+            f.seek(0, os.SEEK_END)
+            f.write(json.dumps(request) + "\n")
+            f.flush()
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+    print(f"Queued #{request['id']} -> {format_request(kind, value)}")
+    return request
+
+
+def _state(events):
+    """(requests by id in queue order, latest status by id)."""
+    requests, status = {}, {}
+    for event in events:
+        if "status" in event:
+            status[event["id"]] = event["status"]
+        else:
+            requests[event["id"]] = event
+    return requests, status
+
+
+def pending(queue_file: str = QUEUE_FILE) -> list:
+    """Requests not yet finished, oldest first (a claimed one stays listed until done)."""
+    if not os.path.exists(queue_file):
+        return []
+    with open(queue_file, "r") as f:
+        fcntl.flock(f, fcntl.LOCK_SH)
+        try:
+            requests, status = _state(_read_events(f))
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+    return [r for i, r in requests.items() if status.get(i) not in ("done", "failed")]
+
+
+def claim(queue_file: str = QUEUE_FILE):
+    """Marks the oldest unfinished request as claimed and returns it, or None.
+    Single consumer: a request left 'claimed' by a crashed orchestrator is handed out again."""
+    if not os.path.exists(queue_file):
+        return None
+    with open(queue_file, "a+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            requests, status = _state(_read_events(f))
+            for request_id, request in requests.items():
+                if status.get(request_id) not in ("done", "failed"):
+                    f.seek(0, os.SEEK_END)
+                    f.write(json.dumps({"id": request_id, "status": "claimed", "time": time.time()}) + "\n")
+                    f.flush()
+                    return request
+            return None
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def finish(request_id: int, ok: bool = True, queue_file: str = QUEUE_FILE):
+    """Records the outcome of a claimed request."""
+    with open(queue_file, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.write(json.dumps({"id": request_id, "status": "done" if ok else "failed", "time": time.time()}) + "\n")
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def parse_request(text: str):
+    """'Requested Circuit: CIRCUIT1' / 'Requested Part: A, B' -> (circuit_name or None, [parts])."""
+    circuit_name = None
+    manual_parts = []
+    for line in (text or "").splitlines():
+        line = line.strip()
+        if line.upper().startswith("REQUESTED CIRCUIT:"):
+            circuit_name = line.split(":", 1)[1].strip().upper()
+        elif line.upper().startswith("REQUESTED PART:"):
+            manual_parts = [
+                p.strip().upper()
+                for p in line.split(":", 1)[1].split(",")
+                if p.strip()
+            ]
+    return circuit_name, manual_parts
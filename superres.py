@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# Optional OCR pre-stage: FSRCNN x3 super-resolution on the text band of a rotated chip.
+# - Only the band holding the markings is upscaled, never the full frame.
+# - The model (FSRCNN_x3.pb, repo root) is loaded once, on first use.
+# - One upscale per chip; the 180° OCR image is the upscaled band rotated.
+# SUPERRES_MODE: "auto" (default) upscales only bands shorter than SUPERRES_MAX_HEIGHT
+# pixels (pick the value from testing/benchmark_superres.py), "on" always, "off" never.
+# Needs cv2.dnn_superres (opencv-contrib-python); without it OCR runs on the plain crop.
+import os
+import time
+import cv2
+import numpy as np
+
+SR_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "FSRCNN_x3.pb")
+SR_MODEL_NAME = "fsrcnn"
+SR_SCALE      = 3
+
+SUPERRES_MODE       = os.environ.get("SUPERRES_MODE", "auto")
+SUPERRES_MAX_HEIGHT = int(os.environ.get("SUPERRES_MAX_HEIGHT", "40"))   # text band height in px
+BAND_PAD_PX         = 4
+WHITE_LEVEL         = 245       # mask_and_rotate() fills everything outside the chip with white
+
+_upsampler = None
+_load_failed = False
+
+
+def get_upsampler():
+    """The FSRCNN model, loaded on first call; None if dnn_superres or the model is missing."""
+    global _upsampler, _load_failed
+    if _upsampler is None and not _load_failed:
+        try:
+            sr = cv2.dnn_superres.DnnSuperResImpl_create()
+            sr.readModel(SR_MODEL_PATH)
+            sr.setModel(SR_MODEL_NAME, SR_SCALE)
+            _upsampler = sr
+        except (AttributeError, cv2.error) as e:
+            _load_failed = True
+            print(f"⚠️ Super-resolution unavailable ({e}); OCR uses the plain crop")
+    return _upsampler
+
+
+def text_band(rotated):
+    """Crop of the rotated chip image holding the markings: the chip body (non-white
+    pixels), narrowed to the rows with a strong x-gradient, i.e. many vertical character
+    strokes (the text lines); the plain chip body and its top / bottom outline have few."""
+    gray = cv2.cvtColor(rotated, cv2.COLOR_BGR2GRAY) if rotated.ndim == 3 else rotated
+    ys, xs = np.nonzero(gray < WHITE_LEVEL)
+    if len(ys) == 0:
+        return rotated
+    y1, y2, x1, x2 = ys.min(), ys.max() + 1, xs.min(), xs.max() + 1
+    body = gray[y1:y2, x1:x2]
+
+    # dx=1 on purpose: responds to vertical strokes, which text rows are full of
+    edges = np.abs(cv2.Sobel(body, cv2.CV_32F, 1, 0, ksize=3)).mean(axis=1)
+    # Ignore the chip outline and pins at the top / bottom edge
+    margin = len(edges) // 10 if len(edges) >= 20 else 0
+    inner = edges[margin:len(edges) - margin]
+    rows = np.nonzero(inner > inner.mean())[0] + margin
+    if len(rows):
+        top = max(0, rows.min() - BAND_PAD_PX)
+        bottom = min(len(edges), rows.max() + 1 + BAND_PAD_PX)
+        y1, y2 = y1 + top, y1 + bottom
+    return rotated[y1:y2, x1:x2]
+
+
+def should_upscale(band):
+    if SUPERRES_MODE == "off":
+        return False
+    if SUPERRES_MODE == "on":
+        return True
+    return band.shape[0] < SUPERRES_MAX_HEIGHT
+
+
+def upscale(band):
+    """band x3 with FSRCNN, or None if the model is unavailable."""
+    sr = get_upsampler()
+    return sr.upsample(band) if sr is not None else None
+
+
+def enhance(rotated):
+    """Upscaled text band of a rotated chip image, or None when super-resolution does
+    not apply (band tall enough, mode off, model missing)."""
+    band = text_band(rotated)
+    result = None
+    if should_upscale(band):
+        start = time.perf_counter()
+        result = upscale(band)
+        if result is not None:
+            print(f"🔍 Super-resolution on {band.shape[1]}x{band.shape[0]} text band "
+                  f"({(time.perf_counter() - start) * 1e3:.0f} ms)")
+    return result
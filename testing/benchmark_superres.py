@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# OCR accuracy vs added latency of FSRCNN x3 on the chip text band (superres.py).
+# Each crop goes through beltocr2's mask_and_rotate(), then EasyOCR runs on
+#   plain: the rotated crop (as without superres)
+#   sr:    the upscaled text band
+# both orientations, best match kept, exactly like run_ocr_and_select().
+# Results are grouped by text band height to choose SUPERRES_MAX_HEIGHT.
+# Usage:
+#   python3 testing/benchmark_superres.py chip_cropped_1.png=SN74185AN chip_cropped_2.png=LM745
+#   python3 testing/benchmark_superres.py --expect SN74185AN crops/*.png
+import os
+import sys
+import time
+import argparse
+import cv2
+import numpy as np
+
+# Add parent directory to path so we can import the OCR stage
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPO_DIR)
+import beltocr2
+import superres
+import easyocr
+
+HEIGHT_BUCKETS = [20, 30, 40, 60, 80]
+
+
+def ocr_best(reader, image):
+    """(best part, match ratio, seconds) over the 0° and 180° orientations."""
+    start = time.perf_counter()
+    best = (None, 0.0)
+    for img in (image, cv2.rotate(image, cv2.ROTATE_180)):
+        text = " ".join(res[1] for res in reader.readtext(img))
+        part, score = beltocr2.best_part_match(text)
+        if score > best[1]:
+            best = (part, score)
+    return best[0], best[1], time.perf_counter() - start
+
+
+def bucket(height):
+    for edge in HEIGHT_BUCKETS:
+        if height < edge:
+            return edge
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FSRCNN x3 text-band OCR benchmark")
+    parser.add_argument("crops", nargs="+", help="Crop images, optionally as path=EXPECTED_PART")
+    parser.add_argument("--expect", default=None, help="Expected part for crops given without =PART")
+    args = parser.parse_args()
+
+    if superres.get_upsampler() is None:
+        sys.exit("❌ cv2.dnn_superres not available (install opencv-contrib-python)")
+    reader = easyocr.Reader(['en'], gpu=False)
+
+    rows = []
+    for item in args.crops:
+        path, _, expected = item.partition("=")
+        expected = (expected or args.expect or "").upper() or None
+        beltocr2.mask_and_rotate(path)
+        rotated = cv2.imread(beltocr2.ROTATED_OUTPUT)
+        band = superres.text_band(rotated)
+
+        start = time.perf_counter()
+        upscaled = superres.upscale(band)
+        sr_ms = (time.perf_counter() - start) * 1e3
+
+        plain_part, plain_score, plain_sec = ocr_best(reader, rotated)
+        sr_part, sr_score, sr_sec = ocr_best(reader, upscaled)
+        rows.append({
+            "height": band.shape[0], "sr_ms": sr_ms,
+            "plain_ok": expected is not None and (plain_part or "").upper() == expected,
+            "sr_ok": expected is not None and (sr_part or "").upper() == expected,
+            "plain_score": plain_score, "sr_score": sr_score,
+            "ocr_ms_delta": (sr_sec - plain_sec) * 1e3, "expected": expected,
+        })
+        print(f"{os.path.basename(path):<28} band {band.shape[1]:>4}x{band.shape[0]:<4} "
+              f"SR {sr_ms:6.1f} ms | plain {plain_part or 'None'} ({plain_score:.2f}) "
+              f"| sr {sr_part or 'None'} ({sr_score:.2f}) | OCR {1e3 * plain_sec:.0f} -> {1e3 * sr_sec:.0f} ms")
+
+    print("\n=== By text band height ===")
+    print(f"{'height <':>9}{'crops':>7}{'plain ok':>10}{'sr ok':>8}{'score +':>9}{'added ms':>10}")
+    labelled = any(r["expected"] for r in rows)
+    threshold = None
+    for edge in HEIGHT_BUCKETS + [None]:
+        group = [r for r in rows if bucket(r["height"]) == edge]
+        if not group:
+            continue
+        plain_ok = sum(r["plain_ok"] for r in group)
+        sr_ok = sum(r["sr_ok"] for r in group)
+        gain = np.mean([r["sr_score"] - r["plain_score"] for r in group])
+        added = np.mean([r["sr_ms"] + r["ocr_ms_delta"] for r in group])
+        label = str(edge) if edge else "rest"
+        print(f"{label:>9}{len(group):>7}{plain_ok if labelled else '-':>10}{sr_ok if labelled else '-':>8}"
+              f"{gain:>+9.2f}{added:>10.0f}")
+        helps = (sr_ok > plain_ok) if labelled else gain > 0
+        if edge and helps:
+            threshold = edge
+    if threshold:
+        print(f"\nSuggested SUPERRES_MAX_HEIGHT={threshold} (SR helps below this band height)")
+    else:
+        print("\nSuper-resolution did not help on these crops; SUPERRES_MODE=off")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# Float vs int8 wake-word model: invoke latency per thread count / XNNPACK setting,
+# and how closely the int8 model follows the float one on recorded clips.
+# Usage:
+#   python3 testing/benchmark_wake_model.py
+#   python3 testing/benchmark_wake_model.py --positive hey_dan_1.wav --negative UIRequestRecord.wav
+#   python3 testing/benchmark_wake_model.py --calibrate   # build the int8 model first (needs tensorflow)
+import os
+import sys
+import argparse
+import numpy as np
+
+# Add parent directory to path so we can import the UI helpers
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPO_DIR)
+import audio_stream
+import wake_model
+
+DEFAULT_CLIP = os.path.join(REPO_DIR, "UIRequestRecord.wav")
+THRESHOLD = 0.70
+
+
+def clip_probabilities(model, samples):
+    """Wake probability after every hop, as the listener would see it."""
+    return np.array([model.predict(features) for _, features in audio_stream.stream_features(samples)])
+
+
+def benchmark_latency(variants, thread_counts, features):
+    print("=== Invoke latency (ms) ===")
+    print(f"{'model':<34}{'threads':>8}{'xnnpack':>9}{'median':>9}{'p95':>9}")
+    for variant, path in variants:
+        for threads in thread_counts:
+            for xnnpack in (True, False):
+                try:
+                    model = wake_model.WakeWordModel(path, num_threads=threads, use_xnnpack=xnnpack)
+                except Exception as e:
+                    print(f"{os.path.basename(path):<34}{threads:>8}{str(xnnpack):>9}  failed: {e}")
+                    continue
+                median, p95 = model.time_invoke(features)
+                print(f"{os.path.basename(path):<34}{threads:>8}{str(xnnpack):>9}{median:>9.2f}{p95:>9.2f}")
+
+
+def benchmark_accuracy(variants, clips, threads):
+    """clips: [(path, expected_wake or None)]"""
+    print("\n=== Accuracy on clips ===")
+    models = [(variant, wake_model.WakeWordModel(path, num_threads=threads)) for variant, path in variants]
+    errors = {variant: 0 for variant, _ in models}
+    for clip, expected in clips:
+        samples = audio_stream.load_wav(clip)
+        traces = {variant: clip_probabilities(model, samples) for variant, model in models}
+        label = {True: "wake", False: "no wake", None: "unlabelled"}[expected]
+        print(f"{os.path.basename(clip)} ({len(samples) / audio_stream.FS:.1f}s, {label})")
+        for variant, trace in traces.items():
+            detected = bool((trace >= THRESHOLD).any())
+            verdict = ""
+            if expected is not None:
+                verdict = "OK" if detected == expected else ("MISS" if expected else "FALSE ALARM")
+                errors[variant] += detected != expected
+            print(f"  {variant:<6} peak {trace.max():.3f}  windows >= {THRESHOLD}: {(trace >= THRESHOLD).sum():>3}  {verdict}")
+        if "float" in traces and "int8" in traces:
+            diff = np.abs(traces["float"] - traces["int8"])
+            agree = np.mean((traces["float"] >= THRESHOLD) == (traces["int8"] >= THRESHOLD))
+            print(f"  int8 vs float: mean |dp| {diff.mean():.4f}, max |dp| {diff.max():.4f}, "
+                  f"decision agreement {100 * agree:.1f}%")
+    if any(expected is not None for _, expected in clips):
+        for variant, count in errors.items():
+            print(f"{variant}: {count} wrong clip decisions")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Float vs int8 wake-word benchmark")
+    parser.add_argument("--positive", nargs="*", default=[], help="Clips that contain 'Hey Dan'")
+    parser.add_argument("--negative", nargs="*", default=[], help="Clips without the wake word")
+    parser.add_argument("--clips", nargs="*", default=None, help="Unlabelled clips (default UIRequestRecord.wav)")
+    parser.add_argument("--threads", default="1,2,4", help="Comma-separated interpreter thread counts")
+    parser.add_argument("--calibrate", action="store_true",
+                        help="Quantize the SavedModel to int8 using the given clips first")
+    args = parser.parse_args()
+
+    clips = [(c, True) for c in args.positive] + [(c, False) for c in args.negative]
+    clips += [(c, None) for c in (args.clips if args.clips is not None else ([] if clips else [DEFAULT_CLIP]))]
+
+    if args.calibrate:
+        windows = [f for clip, _ in clips for _, f in audio_stream.stream_features(audio_stream.load_wav(clip))]
+        wake_model.quantize_saved_model(wake_model.SAVED_MODEL_DIR, windows)
+
+    variants = [(v, wake_model.model_path(v)) for v in ("float", "int8") if os.path.exists(wake_model.model_path(v))]
+    if not variants:
+        sys.exit(f"❌ No wake models found in {wake_model.MODEL_DIR}")
+    print("Models: " + ", ".join(f"{v} = {p}" for v, p in variants))
+
+    # Latency on a real window from the first clip
+    _, features = list(audio_stream.stream_features(audio_stream.load_wav(clips[0][0])))[-1]
+    benchmark_latency(variants, [int(t) for t in args.threads.split(",")], features)
+    benchmark_accuracy(variants, clips, wake_model.WAKE_NUM_THREADS)
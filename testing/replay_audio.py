@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# Offline replay of recorded audio through the UI's wake-word listener and Vosk capture.
+# The WAV is fed into AudioCaptureService's mic callback (start_replay), so
+# wake_word_listener(), the VAD, StreamingMFCC, the wake model and
+# run_voice_capture() run exactly as with the microphone, just without hardware.
+# Usage:
+#   python3 testing/replay_audio.py UIRequestRecord.wav
+#   python3 testing/replay_audio.py --positive hey_dan_sn74185an.wav --expect SN74185AN --vosk
+#   python3 testing/replay_audio.py --negative belt_noise.wav --speed 0     # as fast as possible
+# Reports per clip: wake detections (audio time, latency after the triggering audio
+# was written), recognized text, CPU seconds per audio second; totals give
+# false-reject rate (positive clips) and false accepts per hour (negative clips).
+# Note: Vosk silence timeouts are wall-clock, so at --speed > 1 they span more audio.
+import os
+import sys
+import time
+import queue
+import argparse
+import threading
+import numpy as np
+
+# Add parent directory to path so we can import the UI
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPO_DIR)
+import audio_stream
+import UIChipRequest2 as ui
+ui.load_audio_stack()
+
+DEFAULT_CLIP = os.path.join(REPO_DIR, "UIRequestRecord.wav")
+TAIL_SILENCE_SEC = 2.0      # appended so the end of a clip can still trigger / time out
+SETTLE_SEC = 1.0            # wait after the replay for late events
+
+
+def replay_clip(path, speed, run_vosk):
+    samples = audio_stream.load_wav(path, ui.FS)
+    samples = np.concatenate((samples, np.zeros(int(TAIL_SILENCE_SEC * ui.FS), dtype=np.float32)))
+    audio_sec = len(samples) / ui.FS
+
+    # Fresh capture service big enough to hold the whole clip (speed 0 writes it at once)
+    ui.AUDIO = audio_stream.AudioCaptureService(samplerate=ui.FS, blocksize=ui.HOP_LENGTH,
+                                                history_sec=audio_sec + 10)
+    while not ui.ui_events.empty():
+        ui.ui_events.get_nowait()
+    ui.STOP_LISTENING = False
+    ui.wake_position = None
+    ui.wake_enabled.set()
+    ui.listener_ready.clear()
+    listener = threading.Thread(target=ui.wake_word_listener, daemon=True)
+    listener.start()
+    if not ui.listener_ready.wait(timeout=30):
+        sys.exit("❌ Wake word listener did not start (model missing?)")
+
+    wakes, commands = [], []
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    ui.AUDIO.start_replay(samples, speed)
+    settle_until = None
+    while True:
+        try:
+            event, value = ui.ui_events.get(timeout=0.05)
+        except queue.Empty:
+            if ui.AUDIO.replay_done.is_set():
+                settle_until = settle_until or time.perf_counter() + SETTLE_SEC
+                if time.perf_counter() >= settle_until:
+                    break
+            continue
+        if event != "wake":
+            continue
+        detected_at = time.perf_counter()
+        position = ui.wake_position
+        written = ui.AUDIO.written_at(position)
+        latency = detected_at - written if written is not None else float("nan")
+        wakes.append((position / ui.FS, latency, value))
+        if run_vosk:
+            # Same reader speech_to_text() builds, run through the UI's worker function
+            reader = ui.AUDIO.reader(start=position, preroll_sec=ui.COMMAND_PREROLL_SEC)
+            ui.wake_position = None
+            ui._speech_worker(reader)
+            text = ""
+            while not ui.ui_events.empty():
+                event, value = ui.ui_events.get_nowait()
+                if event == "result":
+                    text = value
+            done = time.perf_counter()
+            end_of_clip = ui.AUDIO.block_times[-1] if ui.AUDIO.replay_done.is_set() else None
+            commands.append((text, done - detected_at, done - end_of_clip if end_of_clip else None))
+        else:
+            ui.wake_position = None
+            ui.wake_enabled.set()
+
+    ui.STOP_LISTENING = True
+    ui.wake_enabled.set()
+    listener.join(timeout=2)
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    return {"audio_sec": audio_sec, "wakes": wakes, "commands": commands, "cpu": cpu, "wall": wall}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay WAV files through the wake word + Vosk path")
+    parser.add_argument("clips", nargs="*", help="Unlabelled clips (default UIRequestRecord.wav)")
+    parser.add_argument("--positive", nargs="*", default=[], help="Clips that contain 'Hey Dan'")
+    parser.add_argument("--negative", nargs="*", default=[], help="Clips without the wake word")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = real time, 4 = 4x, 0 = as fast as possible")
+    parser.add_argument("--vosk", action="store_true", help="Run the command recognizer after each wake word")
+    parser.add_argument("--expect", default=None, help="Expected recognized request (with --vosk)")
+    args = parser.parse_args()
+
+    clips = [(c, True) for c in args.positive] + [(c, False) for c in args.negative]
+    clips += [(c, None) for c in (args.clips or ([] if clips else [DEFAULT_CLIP]))]
+    if args.vosk:
+        ui.vosk_capture.preload()
+
+    positives = misses = false_accepts = 0
+    negative_sec = 0.0
+    total_audio = total_cpu = 0.0
+    for clip, expected in clips:
+        result = replay_clip(clip, args.speed, args.vosk)
+        total_audio += result["audio_sec"]
+        total_cpu += result["cpu"]
+        print(f"\n=== {os.path.basename(clip)} "
+              f"({result['audio_sec']:.1f}s audio in {result['wall']:.1f}s, speed {args.speed:g}) ===")
+        for t, latency, prob in result["wakes"]:
+            print(f"  wake at {t:6.2f}s audio  p={prob:.2f}  latency {1e3 * latency:.0f} ms")
+        for text, wake_to_text, after_clip in result["commands"]:
+            tail = f", {after_clip:+.2f}s vs end of clip" if after_clip is not None else ""
+            match = ""
+            if args.expect is not None:
+                match = "  OK" if text.replace(" ", "").upper() == args.expect.replace(" ", "").upper() else "  MISMATCH"
+            print(f"  recognized '{text}' ({wake_to_text:.2f}s after wake{tail}){match}")
+        print(f"  CPU {result['cpu']:.2f}s = {result['cpu'] / result['audio_sec']:.3f} s per audio second")
+        if expected is True:
+            positives += 1
+            misses += not result["wakes"]
+        elif expected is False:
+            negative_sec += result["audio_sec"]
+            false_accepts += len(result["wakes"])
+
+    print("\n=== Summary ===")
+    print(f"CPU per audio second: {total_cpu / total_audio:.3f}")
+    if positives:
+        print(f"False-reject rate: {misses}/{positives} = {100 * misses / positives:.1f}%")
+    if negative_sec:
+        print(f"False accepts: {false_accepts} in {negative_sec:.0f}s = {3600 * false_accepts / negative_sec:.1f} per hour")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# Detector regression test on recorded frames (hailo_inference.py).
+# --record stores the current detections of each frame as the reference; later runs
+# (new HEF, new export, ONNX stand-in vs Hailo) are compared against it:
+# every reference box needs a detection with the same label and IoU >= IOU_MIN,
+# confidence within CONF_TOLERANCE, and no extra detections.
+# Usage:
+#   python3 testing/test_detector_regression.py --record            # after a known-good model
+#   python3 testing/test_detector_regression.py
+#   python3 testing/test_detector_regression.py --backend onnx frame1.png frame2.png
+import os
+import sys
+import json
+import argparse
+
+# Add parent directory to path so we can import the detector
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPO_DIR)
+import hailo_inference
+
+SAVE_FOLDER    = "/home/scalepi/Desktop/savephototest"
+DEFAULT_FRAMES = [os.path.join(SAVE_FOLDER, "chip.png")]
+REFERENCE_FILE = os.path.join(SAVE_FOLDER, "detector_reference.json")
+IOU_MIN        = 0.80
+CONF_TOLERANCE = 0.10
+
+
+def iou(a, b):
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def compare(reference, detections):
+    """List of problems (empty = pass)."""
+    problems = []
+    unmatched = list(detections)
+    for ref in reference:
+        candidates = [d for d in unmatched if d["label"] == ref["label"]]
+        best = max(candidates, key=lambda d: iou(ref["bbox"], d["bbox"]), default=None)
+        if best is None or iou(ref["bbox"], best["bbox"]) < IOU_MIN:
+            problems.append(f"missing {ref['label']} at {ref['bbox']}"
+                            + (f" (best IoU {iou(ref['bbox'], best['bbox']):.2f})" if best else ""))
+            continue
+        unmatched.remove(best)
+        if abs(best["confidence"] - ref["confidence"]) > CONF_TOLERANCE:
+            problems.append(f"{ref['label']} confidence {best['confidence']:.2f} vs reference {ref['confidence']:.2f}")
+    for extra in unmatched:
+        problems.append(f"extra {extra['label']} at {extra['bbox']} ({extra['confidence']:.2f})")
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detector regression test on recorded frames")
+    parser.add_argument("frames", nargs="*", default=DEFAULT_FRAMES)
+    parser.add_argument("--backend", default=hailo_inference.DETECTOR_BACKEND, choices=["auto", "hailo", "onnx"])
+    parser.add_argument("--reference", default=REFERENCE_FILE)
+    parser.add_argument("--record", action="store_true", help="Save current detections as the reference")
+    args = parser.parse_args()
+
+    print("=== Detector Regression Test ===")
+    detector = hailo_inference.create_detector(args.backend)
+    print(f"Backend: {detector.backend} ({detector.path})")
+    try:
+        images = [hailo_inference.load_image(p) for p in args.frames]
+        results = {os.path.basename(p): [d.to_dict() for d in dets]
+                   for p, dets in zip(args.frames, detector.detect(images))}
+    finally:
+        detector.close()
+
+    if args.record:
+        with open(args.reference, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Recorded {sum(len(v) for v in results.values())} detections on {len(results)} frames -> {args.reference}")
+        sys.exit(0)
+
+    with open(args.reference, "r") as f:
+        reference = json.load(f)
+    failed = 0
+    for name, dets in results.items():
+        if name not in reference:
+            print(f"{name}: no reference (run with --record)")
+            continue
+        problems = compare(reference[name], dets)
+        print(f"{name}: {'PASS' if not problems else 'FAIL'} ({len(dets)} detections)")
+        for problem in problems:
+            print(f"  - {problem}")
+        failed += bool(problems)
+    print(f"\n{len(results) - failed}/{len(results)} frames match the reference")
+    sys.exit(1 if failed else 0)
@@ -4,11 +4,16 @@ import queue
 import os
 import json
 import time
+import threading
+import contextlib
 from vosk import Model, KaldiRecognizer
 import string
+import part_decoder
 
 SAVE_FOLDER = "/home/scalepi/Desktop/savephototest"
 SPEECH_FILE = os.path.join(SAVE_FOLDER, "speech_input.txt")
+# Change path if your model folder is elsewhere (e.g., /home/pi/vosk-model-small-en-us-0.15)
+MODEL_PATH = "/home/scalepi/model"
 
 # Configuration
 LETTERS = list(string.ascii_lowercase)
@@ -24,11 +29,38 @@ DIGIT_MAP = {
 # Queue for audio data
 q = queue.Queue()
 
-# Initialize Vosk
-# Change path if your model folder is elsewhere (e.g., /home/pi/vosk-model-small-en-us-0.15)
-model = Model("/home/scalepi/model")
-rec = KaldiRecognizer(model, 16000, json.dumps(KEYWORDS))
-rec.SetWords(True)
+# Vosk n-best per utterance, scored against the part catalog by part_decoder
+N_ALTERNATIVES = 5
+
+# Vosk model + grammar recognizer, loaded once per process (the UI preloads it at startup)
+model = None
+rec = None
+catalog = None
+_load_lock = threading.Lock()
+
+def get_recognizer():
+    """Loads the model and builds the keyword recognizer on first use, then reuses them."""
+    global model, rec, catalog
+    with _load_lock:
+        if rec is None:
+            start = time.time()
+            model = Model(MODEL_PATH)
+            rec = KaldiRecognizer(model, 16000, json.dumps(KEYWORDS))
+            rec.SetWords(True)
+            rec.SetMaxAlternatives(N_ALTERNATIVES)
+            catalog = part_decoder.load_catalog()
+            print(f"Vosk model loaded in {time.time() - start:.2f}s ({len(catalog)} catalog keys)")
+    return rec
+
+def preload():
+    """For a background thread: pay the model load before the first wake word.
+    Returns False if the model could not be loaded."""
+    try:
+        get_recognizer()
+    except Exception as e:
+        print(f"Could not load Vosk model {MODEL_PATH}: {e}")
+        return False
+    return True
 
 def combine_letters_and_digits(text: str) -> str:
     """Turn spaced letters/digits into a compact chip name (e.g. 's n 7 4 1 8 5 a n' → 'sn74185an')."""
@@ -48,47 +80,110 @@ def callback(indata, frames, time_info, status):
     """Sounddevice callback – queues audio chunks."""
     q.put(bytes(indata))
 
-# Timeout duration. Currently set to 6 Seconds
-LISTEN_TIMEOUT = 6.0
+# Timeouts. Parts commit as soon as they are unambiguous, so less silence is needed
+LISTEN_TIMEOUT = 4.0    # s without speech before the capture ends
+COMMIT_GRACE = 1.5      # s without speech after a committed part (enough to say "next")
+MAX_CAPTURE_SEC = 20.0  # hard cap for one capture
+
+def _alternatives(result):
+    """[(text, confidence), ...] from a Vosk result, with or without SetMaxAlternatives."""
+    if "alternatives" in result:
+        return [(a.get("text", "").lower().strip(), a.get("confidence", 0.0)) for a in result["alternatives"]]
+    return [(result.get("text", "").lower().strip(), 0.0)]
+
+def _before_command(text):
+    """Tokens of one alternative up to the first command word."""
+    tokens = text.split()
+    for n, tok in enumerate(tokens):
+        if tok in COMMANDS:
+            return " ".join(tokens[:n])
+    return text
+
+def _finish_part(decoder, chip_buffer, current_phrase, match=None):
+    """Adds the committed / best catalog match (or the raw letters if nothing matches) to chip_buffer."""
+    if decoder.is_empty():
+        return
+    name, confidence = match if match else decoder.best()
+    if name is None:
+        name = combine_letters_and_digits(" ".join(current_phrase))
+        print(f"⚠️ No catalog match for '{decoder.spoken()}' (best {confidence:.2f}); keeping it as heard")
+    else:
+        print(f"✅ Matched {name} (confidence {confidence:.2f}, heard '{decoder.spoken()}')")
+    if chip_buffer and chip_buffer[-1] != ",":
+        chip_buffer.append(",")
+    chip_buffer.append(name)
+    decoder.reset()
+    current_phrase.clear()
+
+def _queue_source(timeout):
+    """Audio from this script's own stream (callback -> q); None on timeout."""
+    try:
+        return q.get(timeout=timeout)
+    except queue.Empty:
+        return None
+
+def _display(chip_buffer, in_progress=""):
+    """Request text as it stands: committed parts plus the part being spoken."""
+    text = " ".join(chip_buffer).replace(" ,", ",")
+    if in_progress:
+        text = f"{text}, {in_progress}" if text and not text.endswith(",") else f"{text} {in_progress}"
+    return text.strip()
 
 # Main Voice Capture Function
-def run_voice_capture():
+# Returns the recognized string; save_to_file also writes SPEECH_FILE (script mode).
+# source(timeout) -> int16 bytes or None lets the caller supply audio from a shared
+# stream (UIChipRequest2's AudioCaptureService); without it the mic is opened here.
+# on_update(text) is called from this thread with the request as heard so far.
+def run_voice_capture(save_to_file=True, source=None, on_update=None):
     chip_buffer = []
     current_phrase = []
-    os.makedirs(SAVE_FOLDER, exist_ok=True)
+    rec = get_recognizer()
+    decoder = part_decoder.PartDecoder(catalog)
+    # Start every utterance from a clean decoder and an empty audio queue
+    rec.Reset()
+    while not q.empty():
+        q.get_nowait()
+    if source is None:
+        source = _queue_source
+        # 100 ms blocks: the first audio reaches the recognizer without a half-second wait
+        stream = sd.RawInputStream(samplerate=16000, blocksize=1600,
+                                   dtype='int16', channels=1, callback=callback)
+    else:
+        stream = contextlib.nullcontext()
     # last_heard_time = time.time()
     # PHRASE_TIMEOUT = 2.0  # seconds between tokens before committing a phrase
 
-    # --- NEW: Simple timeout logic ---
+    # --- Timeout logic: silence since the last speech, shorter once a part is committed ---
     start_time = time.time()
+    last_activity = start_time
 
-    with sd.RawInputStream(samplerate=16000, blocksize=8000,
-                           dtype='int16', channels=1, callback=callback):
+    with stream:
         print("-" * 40)
         print("Listening... Say chip names, 'next' for comma, 'stop' to finish.")
         print("-" * 40)
 
         while True:
             # Timeout Logic - After LISTEN_TIMEOUT seconds of no input, the program will exit
-            # Check if we've exceeded the timeout without hearing anything
-            elapsed = time.time() - start_time
-            if elapsed >= LISTEN_TIMEOUT:
-                print("Timeout reached (6 seconds). Exiting capture.")
+            # (COMMIT_GRACE once the spoken part already matched the catalog)
+            now = time.time()
+            idle_limit = COMMIT_GRACE if chip_buffer and decoder.is_empty() else LISTEN_TIMEOUT
+            if now - last_activity >= idle_limit or now - start_time >= MAX_CAPTURE_SEC:
+                print(f"Timeout reached ({idle_limit:.1f} seconds without speech). Exiting capture.")
                 break
 
-            try:
-                remaining = LISTEN_TIMEOUT - elapsed
-                data = q.get(timeout=remaining)
-            except queue.Empty:
-                print("Timeout reached ( seconds). Exiting capture.")
+            remaining = idle_limit - (now - last_activity)
+            data = source(remaining)
+            if data is None:
+                print(f"Timeout reached ({idle_limit:.1f} seconds without audio). Exiting capture.")
                 break
             if rec.AcceptWaveform(data):
-                result = json.loads(rec.Result())
-                text = result.get("text", "").lower().strip()
+                alternatives = _alternatives(json.loads(rec.Result()))
+                text = alternatives[0][0]
                 if not text:
                     continue
 
                 now = time.time()
+                last_activity = now
 
                 # # --- Handle control commands ---
                 # if text == "next":
@@ -125,49 +220,67 @@ def run_voice_capture():
                 # print("Buffer so far:", " ".join(chip_buffer))
                 # print("-" * 40)
                 # --- Handle control and input words ---
-                if text in ["next", "stop"]:
-                    # Combine the current phrase when "next" or "stop" is spoken
-                    if current_phrase:
-                        combined = combine_letters_and_digits(" ".join(current_phrase))
-                        chip_buffer.append(combined)
-                        current_phrase = []
-
-                    if text == "next":
+                # Letters/digits (every alternative, up to a command word) go to the catalog decoder
+                command = next((tok for tok in text.split() if tok in COMMANDS), None)
+                spoken = [(_before_command(alt), conf) for alt, conf in alternatives]
+                if spoken[0][0]:
+                    current_phrase.append(spoken[0][0])
+                    decoder.add_alternatives(spoken)
+                    match = decoder.committed()
+                    if match:
+                        # Prefix is unambiguous: no need to spell the rest or say "next"
+                        _finish_part(decoder, chip_buffer, current_phrase, match)
+                    else:
+                        name, confidence = decoder.best()
+                        print(f"🔎 Best match so far: {name} ({confidence:.2f})")
+
+                if command == "next":
+                    _finish_part(decoder, chip_buffer, current_phrase)
+                    if chip_buffer and chip_buffer[-1] != ",":
                         chip_buffer.append(",")
-                        print("Next chip.")
-                        print("-" * 40)
-                        continue
-
-                    elif text == "stop":
-                        print("Stopping capture.")
-                        print("-" * 40)
-                        break
-                else:
-                    # Accumulate normal letters/digits
-                    current_phrase.append(text)
+                    print("Next chip.")
+                    print("-" * 40)
+                    continue
+
+                elif command == "stop":
+                    _finish_part(decoder, chip_buffer, current_phrase)
+                    print("Stopping capture.")
+                    print("-" * 40)
+                    break
 
                 # Debugging / display (optional)
                 print("Heard:", text)
                 print("Partial phrase:", " ".join(current_phrase))
                 print("Buffer so far:", " ".join(chip_buffer))
                 print("-" * 40)
+                if on_update:
+                    on_update(_display(chip_buffer, decoder.spoken()))
+            else:
+                partial = json.loads(rec.PartialResult()).get("partial", "")
+                if partial:
+                    # Still speaking: keep the silence timeout from firing mid-word
+                    last_activity = time.time()
+                    if on_update:
+                        on_update(_display(chip_buffer, decoder.spoken() + part_decoder.tokens_to_symbols(partial)))
 
     # finalize leftover phrase
     # Ensures that the voice input is not cutoff my the timeout counter.
-    if current_phrase:
-        combined = combine_letters_and_digits(" ".join(current_phrase))
-        chip_buffer.append(combined)
+    _finish_part(decoder, chip_buffer, current_phrase)
 
-    final_string = " ".join(chip_buffer).replace(" ,", ",")
+    final_string = " ".join(chip_buffer).replace(" ,", ",").strip(" ,")
+    if on_update:
+        on_update(final_string)
     print(f"Final detected chips: {final_string}")
 
     # === Save recognized chips for the GUI ===
-    try:
-        with open(SPEECH_FILE, "w") as f:
-            f.write(final_string.strip() + "\n")
-        print(f"Saved recognized chips to {SPEECH_FILE}")
-    except Exception as e:
-        print(f"Could not save to {SPEECH_FILE}: {e}")
+    if save_to_file:
+        try:
+            os.makedirs(SAVE_FOLDER, exist_ok=True)
+            with open(SPEECH_FILE, "w") as f:
+                f.write(final_string.strip() + "\n")
+            print(f"Saved recognized chips to {SPEECH_FILE}")
+        except Exception as e:
+            print(f"Could not save to {SPEECH_FILE}: {e}")
     print("-" * 40)
     return final_string
 
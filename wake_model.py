@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# Wake-word ("Hey Dan") TFLite model loading and inference.
+# - Float or post-training-quantized int8 model (WAKE_MODEL_VARIANT=float|int8).
+# - Explicit interpreter thread count (WAKE_NUM_THREADS) so the listener does not
+#   compete with OCR / GStreamer for every core.
+# - XNNPACK on or off (WAKE_XNNPACK=1|0). XNNPACK is the interpreter's default CPU
+#   delegate, so it is switched via the op resolver type rather than load_delegate().
+# - int8 models are fed / read through their quantization parameters, so callers
+#   always pass float MFCCs and get a float probability back.
+# quantize_saved_model() builds the int8 variant from the float SavedModel using
+# MFCC windows of recorded clips as the representative dataset.
+import os
+import time
+import numpy as np
+
+try:
+    from tflite_runtime.interpreter import Interpreter
+    try:
+        from tflite_runtime.interpreter import OpResolverType
+    except ImportError:
+        OpResolverType = None
+except ImportError:
+    import tensorflow as tf
+    Interpreter = tf.lite.Interpreter
+    OpResolverType = getattr(tf.lite.experimental, "OpResolverType", None)
+
+MODEL_DIR         = "/home/scalepi/Desktop/tflite_model"
+FLOAT_MODEL_PATH  = os.path.join(MODEL_DIR, "hey_dan_model.tflite")
+INT8_MODEL_PATH   = os.path.join(MODEL_DIR, "hey_dan_model_int8.tflite")
+SAVED_MODEL_DIR   = os.path.join(MODEL_DIR, "hey_dan_saved_model")
+
+WAKE_MODEL_VARIANT = os.environ.get("WAKE_MODEL_VARIANT", "float")
+WAKE_NUM_THREADS   = int(os.environ.get("WAKE_NUM_THREADS", "2"))
+WAKE_XNNPACK       = os.environ.get("WAKE_XNNPACK", "1") == "1"
+WAKE_CLASS_INDEX   = 1      # output [not wake, wake]
+
+
+def model_path(variant=WAKE_MODEL_VARIANT):
+    return INT8_MODEL_PATH if variant == "int8" else FLOAT_MODEL_PATH
+
+
+class WakeWordModel:
+    """ One TFLite interpreter plus the (de)quantization of its input and output."""
+
+    def __init__(self, path=None, num_threads=WAKE_NUM_THREADS, use_xnnpack=WAKE_XNNPACK):
+        self.path = path or model_path()
+        self.num_threads = num_threads
+        self.use_xnnpack = use_xnnpack
+        kwargs = {"model_path": self.path, "num_threads": num_threads}
+        if OpResolverType is not None:
+            kwargs["experimental_op_resolver_type"] = (
+                OpResolverType.AUTO if use_xnnpack else OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES)
+        elif not use_xnnpack:
+            print("⚠️ This TFLite build cannot switch XNNPACK off; using its default")
+        self.interpreter = Interpreter(**kwargs)
+        self.interpreter.allocate_tensors()
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self.input_scale, self.input_zero = self.input.get("quantization", (0.0, 0))
+        self.output_scale, self.output_zero = self.output.get("quantization", (0.0, 0))
+
+    def describe(self):
+        return (f"{os.path.basename(self.path)} ({np.dtype(self.input['dtype']).name} input, "
+                f"{self.num_threads} threads, XNNPACK {'on' if self.use_xnnpack else 'off'})")
+
+    def _quantize(self, features):
+        dtype = self.input["dtype"]
+        if dtype == np.float32:
+            return features.astype(np.float32)
+        info = np.iinfo(dtype)
+        q = np.round(features / self.input_scale + self.input_zero)
+        return np.clip(q, info.min, info.max).astype(dtype)
+
+    def _dequantize(self, values):
+        if self.output["dtype"] == np.float32:
+            return values
+        return (values.astype(np.float32) - self.output_zero) * self.output_scale
+
+    def predict(self, features):
+        """Wake-word probability for one (1, 32, 63, 1) float MFCC window."""
+        self.interpreter.set_tensor(self.input["index"], self._quantize(features))
+        self.interpreter.invoke()
+        return float(self._dequantize(self.interpreter.get_tensor(self.output["index"]))[0][WAKE_CLASS_INDEX])
+
+    def time_invoke(self, features, repeats=50):
+        """Median and p95 invoke() latency in ms (after one warm-up run)."""
+        self.predict(features)
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            self.predict(features)
+            times.append((time.perf_counter() - start) * 1e3)
+        return float(np.median(times)), float(np.percentile(times, 95))
+
+
+def quantize_saved_model(saved_model_dir, feature_windows, out_path=INT8_MODEL_PATH):
+    """Post-training full-integer quantization (int8 in/out) of the float SavedModel.
+    feature_windows: iterable of (1, 32, 63, 1) float32 MFCC windows from real recordings."""
+    import tensorflow as tf
+    windows = [np.asarray(w, dtype=np.float32) for w in feature_windows]
+
+    def representative_dataset():
+        for window in windows:
+            yield [window]
+
+    converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_dir)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.int8
+    converter.inference_output_type = tf.int8
+    with open(out_path, "wb") as f:
+        f.write(converter.convert())
+    print(f"✅ Wrote int8 wake model ({len(windows)} calibration windows): {out_path}")
+    return out_path